@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+class UserCache:
+    """
+    A thread-safe, in-process LRU cache of user objects whose entries expire
+    after ``ttl`` seconds.
+
+    Entries are dropped by the signals in accounts.signals whenever a user
+    is saved or deleted in this process. Other processes, and writes that
+    send no signal such as ``QuerySet.update()``, are only noticed once the
+    entry expires, so the TTL bounds how long a disabled account or changed
+    password can keep using a valid token.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @property
+    def max_size(self):
+        return self._max_size if self._max_size is not None else settings.AUTH_USER_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.AUTH_USER_CACHE_TTL
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(user_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return _copy_user(entry[1])
+
+    def set(self, user_id, user):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, _copy_user(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _copy_user(user):
+    # requests get their own instance, so changes to request.user never leak into the cache
+    clone = user.__class__.__new__(user.__class__)
+    clone.__dict__ = user.__getstate__()
+    return clone
+
+
+user_cache = UserCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that takes the token's user from ``user_cache`` and
+    only queries the database on a miss.
+
+    The active flag and, with CHECK_REVOKE_TOKEN, the password hash are
+    still checked on every request, against the cached copy.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+            return user
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.revocation import purge_revoked_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens that have expired, which no longer need to be remembered'
+
+    def handle(self, *args, **options):
+        count = purge_revoked_tokens()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired revoked token(s)'))
@@ -16,3 +16,11 @@ class CustomUser(AbstractUser):
         help_text='Specific permissions for this user.',
         verbose_name='user permissions',
     )
+
+class RevokedToken(models.Model):
+    """A refresh token that may not be used again, kept until it expires (see accounts.revocation)"""
+    jti = models.CharField(max_length=64, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,159 @@
+"""
+Revoked refresh tokens.
+
+With ROTATE_REFRESH_TOKENS and BLACKLIST_AFTER_ROTATION every refresh
+revokes the token it was given. Only revoked tokens are stored, as one
+row with a unique jti each, and purge_revoked_tokens deletes a row once
+its token has expired, so the table never holds more than a refresh
+token lifetime's worth of refreshes. simplejwt's token_blacklist app
+instead stores every token ever issued.
+
+Checks first consult an in-process Bloom filter of the revoked jtis: a
+jti that is not in it was not revoked, so only the few tokens that may
+have been cost a query. The filter is built from the table by the first
+check and picks up tokens revoked by other processes every
+REVOKED_TOKEN_SYNC_SECONDS. Revoking inserts into the
+unique jti column, so a token is rotated at most once even when two
+requests race with it or this process' filter is behind.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """
+    A Bloom filter of strings with about ``error_rate`` false positives at
+    ``capacity`` items. It uses the built-in, per-process salted hash, so
+    it cannot be shared with other processes.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # double hashing: k positions from the two halves of one 64-bit hash
+        value = hash(item) & 0xFFFFFFFFFFFFFFFF
+        first, step = value & 0xFFFFFFFF, (value >> 32) | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        bits = self.bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """
+    The revoked jtis of this process' view of the RevokedToken table.
+
+    The filter is built from the table on first use. When more jtis were
+    added than it was sized for, a filter twice the size is built on a
+    background thread while the old one stays in use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._loading = False
+        self.filter_hits = self.queries = 0
+
+    def load(self, capacity=None):
+        """Build a filter of every unexpired revoked jti and start using it"""
+        rows = RevokedToken.objects.filter(expires_at__gt=timezone.now()).order_by('id').values_list('id', 'jti')
+        live = rows.count()
+        bloom = BloomFilter(capacity or max(settings.REVOKED_TOKEN_FILTER_CAPACITY, 2 * live))
+        last_id = 0
+        for last_id, jti in rows.iterator(chunk_size=10000):
+            bloom.add(jti)
+        with self._lock:
+            # rows added while this ran are picked up by the next sync
+            self._filter, self._last_id = bloom, max(last_id, self._last_id)
+            self._synced_at = time.monotonic()
+            self._loading = False
+        return bloom
+
+    def _load_in_background(self):
+        try:
+            self.load()
+        finally:
+            self._loading = False
+            close_old_connections()
+
+    def _current_filter(self):
+        """The filter, synced if due"""
+        if self._filter is None:
+            return self.load()
+        with self._lock:
+            bloom = self._filter
+            needs_load = bloom.count > bloom.capacity and not self._loading
+            if needs_load:
+                self._loading = True
+            due = time.monotonic() - self._synced_at >= settings.REVOKED_TOKEN_SYNC_SECONDS
+            if due:
+                self._synced_at = time.monotonic()
+                last_id = self._last_id
+        if needs_load:
+            threading.Thread(target=self._load_in_background, daemon=True).start()
+        if due:
+            new = list(RevokedToken.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'jti'))
+            with self._lock:
+                for pk, jti in new:
+                    self._filter.add(jti)
+                    self._last_id = max(self._last_id, pk)
+        return bloom
+
+    def is_revoked(self, jti):
+        if jti not in self._current_filter():
+            self.filter_hits += 1
+            return False
+        self.queries += 1
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke(self, jti, expires_at):
+        """Revoke a token; False if it already was"""
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._filter, self._last_id, self._synced_at = None, 0, 0.0
+            self.filter_hits = self.queries = 0
+
+
+revocations = RevocationList()
+
+
+def purge_revoked_tokens(now=None, batch_size=10000):
+    """Delete the rows of revoked tokens that have expired anyway, in batches; returns how many"""
+    expired = RevokedToken.objects.filter(expires_at__lte=now or timezone.now())
+    deleted = 0
+    while True:
+        ids = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += RevokedToken.objects.filter(pk__in=ids).delete()[0]
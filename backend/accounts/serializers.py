@@ -1,5 +1,10 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
 from django.contrib.auth import get_user_model
+from .revocation import revocations
 
 User = get_user_model()
 
@@ -23,3 +28,23 @@ class RegisterSerializer(serializers.ModelSerializer):
             password=validated_data['password'],
             is_active=True
         )
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh that honours and records revocations in accounts.revocation instead of simplejwt's token_blacklist app"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        jti = refresh[api_settings.JTI_CLAIM]
+        if revocations.is_revoked(jti):
+            raise TokenError('Token is blacklisted')
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            # the insert is what guarantees one use: a concurrent refresh with the same token fails here
+            if api_settings.BLACKLIST_AFTER_ROTATION and not revocations.revoke(jti, datetime_from_epoch(refresh['exp'])):
+                raise TokenError('Token is blacklisted')
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
@@ -0,0 +1,272 @@
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from api.cache import get_cache
+
+from .authentication import UserCache, user_cache
+from .models import RevokedToken
+from .revocation import BloomFilter, revocations
+from .throttling import CacheBuckets, IPBucketThrottle, local_buckets, reset_throttle_stats, throttle_stats
+
+User = get_user_model()
+
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        get_cache().clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(username='athlete', password='pass12345')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_user_is_loaded_once(self):
+        # the user, then the stats row
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/stats/').status_code, 200)
+        # the log page only; the user comes from the cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/workout-logs/').status_code, 200)
+        self.assertEqual((user_cache.hits, user_cache.misses), (1, 1))
+
+    def test_save_invalidates(self):
+        self.client.get('/api/stats/')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/stats/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'user_inactive')
+
+    def test_queryset_updates_apply_once_the_entry_expires(self):
+        self.client.get('/api/stats/')
+        # update() sends no post_save, so the cached user stays valid for the TTL
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/stats/').status_code, 200)
+
+        expired = time.monotonic() + settings.AUTH_USER_CACHE_TTL + 1
+        with mock.patch('accounts.authentication.time.monotonic', return_value=expired):
+            response = self.client.get('/api/stats/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'user_inactive')
+
+    def test_request_user_is_a_copy(self):
+        self.client.get('/api/stats/')
+        user_cache.get(self.user.pk).username = 'changed'
+        self.assertEqual(user_cache.get(self.user.pk).username, 'athlete')
+
+
+class UserCacheTests(TestCase):
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = UserCache(max_size=2, ttl=60)
+        users = [User(pk=pk, username=f'user{pk}') for pk in (1, 2, 3)]
+        cache.set(1, users[0])
+        cache.set(2, users[1])
+        cache.get(1)
+        cache.set(3, users[2])
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1).username, 'user1')
+
+    def test_entries_expire(self):
+        cache = UserCache(max_size=2, ttl=60)
+        cache.set(1, User(pk=1))
+        with mock.patch('accounts.authentication.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(cache.get(1))
+        self.assertEqual(len(cache), 0)
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        local_buckets.clear()
+        caches['default'].clear()
+        reset_throttle_stats()
+        self.user = User.objects.create_user(username='athlete', password='pass12345')
+
+    def login(self, username='athlete', address='10.0.0.1'):
+        return self.client.post(
+            '/api/auth/token/', {'username': username, 'password': 'wrong'}, REMOTE_ADDR=address,
+        ).status_code
+
+    @throttle_rates(login_ip='3/min')
+    def test_token_issuance_is_throttled_per_address(self):
+        # a fixed clock, so the time spent hashing passwords does not refill the bucket
+        with mock.patch('accounts.throttling.time.monotonic', return_value=1000.0):
+            self.assertEqual([self.login() for _ in range(3)], [401, 401, 401])
+            response = self.client.post('/api/auth/token/', {'username': 'athlete', 'password': 'wrong'}, REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '20')
+            self.assertEqual(self.login(address='10.0.0.2'), 401)
+        self.assertEqual(throttle_stats(), {('login_ip', 'allowed'): 4, ('login_ip', 'throttled'): 1})
+
+    @throttle_rates(register_ip='2/hour')
+    def test_forged_forwarded_for_does_not_reset_the_address_bucket(self):
+        statuses = [
+            self.client.post(
+                '/api/auth/register/', {'username': f'new{n}', 'password': 'pass12345'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'203.0.113.{n}',
+            ).status_code
+            for n in range(3)
+        ]
+        self.assertEqual(statuses, [201, 201, 429])
+
+    @throttle_rates(register_ip='1/hour')
+    def test_forwarded_for_is_trusted_behind_configured_proxies(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            statuses = [
+                self.client.post(
+                    '/api/auth/register/', {'username': f'new{n}', 'password': 'pass12345'},
+                    REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'203.0.113.{n}',
+                ).status_code
+                for n in range(2)
+            ]
+        self.assertEqual(statuses, [201, 201])
+
+    @throttle_rates(login_user='2/min')
+    def test_token_issuance_is_throttled_per_username_across_addresses(self):
+        self.assertEqual([self.login(address=f'10.0.0.{n}') for n in range(3)], [401, 401, 429])
+        self.assertEqual(self.login(username='Athlete ', address='10.0.0.9'), 429)
+        self.assertEqual(self.login(username='someone-else'), 401)
+
+    @throttle_rates(register_ip='2/hour')
+    def test_registration_is_throttled(self):
+        statuses = [
+            self.client.post('/api/auth/register/', {'username': f'new{n}', 'password': 'pass12345'}).status_code
+            for n in range(3)
+        ]
+        self.assertEqual(statuses, [201, 201, 429])
+        self.assertEqual(User.objects.count(), 3)
+
+    @throttle_rates(bulk_user='2/min')
+    def test_bulk_writes_are_throttled_per_user(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        statuses = [client.post('/api/workout-logs/bulk/', [], format='json').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        client.force_authenticate(other)
+        self.assertEqual(client.post('/api/workout-logs/bulk/', [], format='json').status_code, 200)
+
+    @throttle_rates(login_ip='2/s')
+    def test_buckets_refill(self):
+        with mock.patch('accounts.throttling.time.monotonic', return_value=1000.0):
+            self.assertEqual([self.login() for _ in range(3)], [401, 401, 429])
+        with mock.patch('accounts.throttling.time.monotonic', return_value=1000.5):
+            self.assertEqual([self.login() for _ in range(2)], [401, 429])
+
+    def test_metrics_expose_the_counters(self):
+        with throttle_rates(login_ip='1/min'):
+            self.login()
+            self.login()
+        with self.settings(METRICS_TOKEN='secret'):
+            body = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn('fittrack_throttle_decisions_total{scope="login_ip",decision="throttled"} 1', body)
+
+    def test_limit_holds_under_concurrent_load(self):
+        request = APIRequestFactory().post('/api/auth/token/', REMOTE_ADDR='10.0.0.1')
+        view = mock.Mock(throttle_scope='login')
+
+        for alias in ('', 'default'):
+            with self.subTest(alias=alias or 'process'), throttle_rates(login_ip='50/min'), \
+                    self.settings(THROTTLE_CACHE_ALIAS=alias), mock.patch.object(CacheBuckets, 'LOCK_WAIT', 5):
+                local_buckets.clear()
+                caches['default'].clear()
+                allowed = []
+
+                def hammer():
+                    throttle = IPBucketThrottle()
+                    allowed.extend(throttle.allow_request(request, view) for _ in range(20))
+
+                threads = [threading.Thread(target=hammer) for _ in range(8)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(len(allowed), 160)
+                self.assertEqual(sum(allowed), 50)
+
+
+class RevocationTests(TestCase):
+
+    def setUp(self):
+        revocations.clear()
+        self.user = User.objects.create_user(username='athlete', password='pass12345')
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': str(token)})
+
+    def test_refresh_rotates_and_revokes_the_used_token(self):
+        token = RefreshToken.for_user(self.user)
+        response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], str(token))
+        self.assertEqual(RevokedToken.objects.get().jti, token['jti'])
+
+        replay = self.refresh(token)
+        self.assertEqual(replay.status_code, 401)
+        self.assertEqual(self.refresh(response.data['refresh']).status_code, 200)
+
+    def test_filter_answers_for_tokens_that_were_not_revoked(self):
+        revocations.load()
+        revocations.revoke('revoked', timezone.now() + timedelta(days=1))
+        with self.assertNumQueries(0):
+            self.assertFalse(revocations.is_revoked('never-revoked'))
+        with self.assertNumQueries(1):
+            self.assertTrue(revocations.is_revoked('revoked'))
+        self.assertEqual((revocations.filter_hits, revocations.queries), (1, 1))
+
+    def test_revoking_twice_fails(self):
+        expires = timezone.now() + timedelta(days=1)
+        self.assertTrue(revocations.revoke('jti', expires))
+        self.assertFalse(revocations.revoke('jti', expires))
+
+    @override_settings(REVOKED_TOKEN_SYNC_SECONDS=5)
+    def test_tokens_revoked_by_other_processes_are_synced(self):
+        revocations.load()
+        # another process revoked it
+        RevokedToken.objects.create(jti='elsewhere', expires_at=timezone.now() + timedelta(days=1))
+        self.assertFalse(revocations.is_revoked('elsewhere'))
+        with mock.patch('accounts.revocation.time.monotonic', return_value=time.monotonic() + 10):
+            self.assertTrue(revocations.is_revoked('elsewhere'))
+
+    def test_full_filter_is_rebuilt_larger(self):
+        revocations.load(capacity=2)
+        for n in range(3):
+            revocations.revoke(f'jti-{n}', timezone.now() + timedelta(days=1))
+        with mock.patch('accounts.revocation.threading.Thread') as thread:
+            revocations.is_revoked('jti-0')
+        thread.return_value.start.assert_called_once()
+        revocations.load()
+        self.assertTrue(all(revocations.is_revoked(f'jti-{n}') for n in range(3)))
+
+    def test_bloom_filter_error_rate(self):
+        bloom = BloomFilter(10000, error_rate=0.01)
+        for n in range(10000):
+            bloom.add(f'in-{n}')
+        self.assertTrue(all(f'in-{n}' in bloom for n in range(10000)))
+        false_positives = sum(f'out-{n}' in bloom for n in range(10000))
+        self.assertLess(false_positives, 200)
+
+    def test_purge_command(self):
+        RevokedToken.objects.create(jti='expired', expires_at=timezone.now() - timedelta(seconds=1))
+        RevokedToken.objects.create(jti='live', expires_at=timezone.now() + timedelta(days=1))
+        out = StringIO()
+        call_command('purge_revoked_tokens', stdout=out)
+        self.assertIn('Deleted 1', out.getvalue())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
@@ -0,0 +1,167 @@
+"""
+Token-bucket throttles for the endpoints that are expensive to call:
+token issuance and registration (password hashing) and bulk writes.
+
+A rate of ``N/period`` is a bucket of N tokens refilled at N per period,
+so a client can burst N requests and then keeps going at the sustained
+rate. Each view names a ``throttle_scope``; ``IPBucketThrottle`` keeps a
+bucket per ``<scope>_ip`` and client address, ``UserBucketThrottle`` per
+``<scope>_user`` and user (for anonymous requests, the username they
+sign in or register as). Scopes without a rate in DEFAULT_THROTTLE_RATES
+are not throttled. The client address is REMOTE_ADDR unless NUM_PROXIES
+says how many trusted proxies appended to X-Forwarded-For.
+
+Buckets live in this process unless THROTTLE_CACHE_ALIAS names a cache
+shared by all processes, such as Redis or Memcached.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """``'10/min'`` -> (capacity 10, refill 10 / 60 tokens per second)"""
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+def take(state, capacity, refill, now):
+    """
+    Take a token from a bucket in ``state`` (tokens, timestamp), None for a
+    full one. Returns (allowed, seconds until a token is available, new state).
+    """
+    tokens, stamp = state or (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - stamp) * refill)
+    if tokens >= 1:
+        return True, 0.0, (tokens - 1, now)
+    return False, (1 - tokens) / refill, (tokens, now)
+
+
+class LocalBuckets:
+    """Buckets in this process; the least recently used are dropped (refilled) past ``max_size``"""
+
+    def __init__(self, max_size=None):
+        self._max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return self._max_size if self._max_size is not None else settings.THROTTLE_LOCAL_MAX_KEYS
+
+    def take(self, key, capacity, refill):
+        with self._lock:
+            allowed, wait, self._buckets[key] = take(self._buckets.get(key), capacity, refill, time.monotonic())
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return allowed, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBuckets:
+    """
+    Buckets in a Django cache shared between processes. Updates of one bucket
+    are serialized by a lock taken with ``cache.add``, which is atomic on every
+    backend; a request that cannot get the lock within LOCK_WAIT is refused,
+    since that much contention on one bucket is a burst in itself.
+    """
+    LOCK_WAIT = 0.05
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, refill):
+        lock = f'throttle-lock:{key}'
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while not self.cache.add(lock, 1, timeout=1):
+            if time.monotonic() > deadline:
+                return False, 1 / refill
+            time.sleep(0.001)
+        try:
+            allowed, wait, state = take(self.cache.get(f'throttle:{key}'), capacity, refill, time.time())
+            # once it could have refilled, a missing bucket is the same as a full one
+            self.cache.set(f'throttle:{key}', state, timeout=int(capacity / refill) + 1)
+        finally:
+            self.cache.delete(lock)
+        return allowed, wait
+
+
+local_buckets = LocalBuckets()
+
+
+def get_buckets():
+    alias = settings.THROTTLE_CACHE_ALIAS
+    return CacheBuckets(alias) if alias else local_buckets
+
+
+def throttle_stats():
+    """Allowed and throttled requests per scope in this process since start-up (or the last reset)"""
+    with _counters_lock:
+        return dict(_counters)
+
+
+def reset_throttle_stats():
+    with _counters_lock:
+        _counters.clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """A bucket per ``<view.throttle_scope>_<kind>`` and ``get_ident_key``; None skips the throttle"""
+    kind = None
+
+    def get_ident_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = getattr(view, 'throttle_scope', None)
+        rate = scope and api_settings.DEFAULT_THROTTLE_RATES.get(f'{scope}_{self.kind}')
+        ident = rate and self.get_ident_key(request)
+        if not ident:
+            return True
+
+        scope = f'{scope}_{self.kind}'
+        allowed, wait = get_buckets().take(f'{scope}:{ident}', *parse_rate(rate))
+        with _counters_lock:
+            _counters[scope, 'allowed' if allowed else 'throttled'] += 1
+        if not allowed:
+            self.wait_seconds = wait
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPBucketThrottle(TokenBucketThrottle):
+    kind = 'ip'
+
+    def get_ident_key(self, request):
+        return self.get_ident(request)
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    """Per user; anonymous requests count against the username they sign in or register as"""
+    kind = 'user'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'id:{request.user.pk}'
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        return f'name:{username.strip().lower()}' if isinstance(username, str) and username.strip() else None
+
+
+BUCKET_THROTTLES = [IPBucketThrottle, UserBucketThrottle]
@@ -2,9 +2,10 @@ from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from rest_framework_simplejwt.views import TokenObtainPairView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth import get_user_model
-from .serializers import UserSerializer, RegisterSerializer
+from .serializers import RegisterSerializer, RotatingTokenRefreshSerializer, UserSerializer
+from .throttling import BUCKET_THROTTLES
 
 User = get_user_model()
 
@@ -12,9 +13,17 @@ class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
     serializer_class = RegisterSerializer
     permission_classes = [AllowAny]
+    # password hashing makes every call expensive
+    throttle_classes = BUCKET_THROTTLES
+    throttle_scope = 'register'
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     permission_classes = [AllowAny]
+    throttle_classes = BUCKET_THROTTLES
+    throttle_scope = 'login'
+
+class RotatingTokenRefreshView(TokenRefreshView):
+    serializer_class = RotatingTokenRefreshSerializer
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Trunc
+
+from .models import WorkoutExercise, WorkoutLog
+
+PERIODS = ('day', 'week', 'month')
+
+
+def workout_series(user, period, start, end):
+    """
+    Bucket a user's logs between ``start`` and ``end`` (inclusive) by ``period``.
+
+    The logs are truncated and grouped in the database once, by bucket and
+    plan, and the sets x reps volume of each plan's exercises is read in a
+    second query. Per-exercise volume is then the log count of each
+    (bucket, plan) group times the plan's volume for that exercise, so the
+    work done outside the database is proportional to the number of
+    buckets, not the number of logs. Only buckets with activity are returned.
+    """
+    bucket = F('date') if period == 'day' else Trunc('date', period)
+    groups = list(
+        WorkoutLog.objects.filter(user=user, date__gte=start, date__lte=end)
+        .annotate(bucket=bucket)
+        .values_list('bucket', 'workout_plan')
+        .annotate(logs=Count('id'), duration=Sum('duration'))
+        .order_by('bucket')
+    )
+
+    plan_exercises = defaultdict(list)
+    volumes = (
+        WorkoutExercise.objects.filter(workout_plan__in={plan_id for _, plan_id, _, _ in groups})
+        .values_list('workout_plan', 'exercise', 'exercise__name')
+        .annotate(volume=Sum(F('sets') * F('reps')))
+        .order_by()
+    )
+    for plan_id, exercise_id, name, volume in volumes:
+        plan_exercises[plan_id].append((exercise_id, name, volume))
+
+    series = {}
+    exercises = {}
+    for day, plan_id, logs, duration in groups:
+        totals = series.setdefault(day, {'bucket': day, 'workouts': 0, 'duration': 0})
+        totals['workouts'] += logs
+        totals['duration'] += duration or 0
+        for exercise_id, name, volume in plan_exercises[plan_id]:
+            exercise = exercises.setdefault(exercise_id, {'exercise': exercise_id, 'name': name, 'series': {}})
+            exercise['series'][day] = exercise['series'].get(day, 0) + logs * volume
+
+    exercises = sorted(exercises.values(), key=lambda exercise: (exercise['name'], exercise['exercise']))
+    for exercise in exercises:
+        exercise['series'] = [{'bucket': day, 'volume': volume} for day, volume in exercise['series'].items()]
+
+    return {
+        'period': period,
+        'start': start,
+        'end': end,
+        'series': list(series.values()),
+        'exercises': exercises,
+    }
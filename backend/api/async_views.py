@@ -0,0 +1,129 @@
+"""
+Native async variants of the read-heavy endpoints, for ASGI deployments.
+
+Django's async ORM still runs every query of a request on one thread, so
+two awaited queries run back-to-back. ``gather_reads`` hands independent
+reads to worker threads instead, each with its own database connection,
+so they run at the same time. These views use it to overlap the JWT user
+lookup with the data query, which only needs the user id from the token.
+
+The responses match the synchronous endpoints, minus the response cache.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from accounts.authentication import CachedJWTAuthentication
+
+from .mixins import optimize_queryset
+from .models import WorkoutLog, WorkoutPlan, WorkoutStats
+from .pagination import WorkoutLogPagination, WorkoutPlanPagination
+from .serializers import WorkoutLogSerializer, WorkoutPlanSerializer
+
+authentication = CachedJWTAuthentication()
+
+
+def _with_own_connection(func):
+    # a worker thread keeps its connection between calls, subject to CONN_MAX_AGE and health checks
+    @functools.wraps(func)
+    def run():
+        close_old_connections()
+        try:
+            return func()
+        finally:
+            close_old_connections()
+    return run
+
+
+async def gather_reads(*funcs):
+    """Run independent, read-only ORM callables concurrently, each on a worker thread and connection"""
+    return await asyncio.gather(*(
+        sync_to_async(_with_own_connection(func), thread_sensitive=False)() for func in funcs
+    ))
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+def get_validated_token(request):
+    """Validate the bearer token without touching the database"""
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise exceptions.NotAuthenticated()
+    return authentication.get_validated_token(raw_token)
+
+
+def get_user_id(token):
+    try:
+        return token[jwt_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+
+
+def async_api_view(view):
+    """Allow GET only and render API exceptions the way DRF's default handler does"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            if request.method != 'GET':
+                raise exceptions.MethodNotAllowed(request.method)
+            return render(await view(request, *args, **kwargs))
+        except exceptions.APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = render(data, exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response['WWW-Authenticate'] = authentication.authenticate_header(request)
+            elif isinstance(exc, exceptions.MethodNotAllowed):
+                response['Allow'] = 'GET'
+            return response
+    return wrapper
+
+
+async def list_page(request, queryset, serializer_class, pagination_class):
+    """One keyset page of the token user's rows, fetched alongside the user lookup"""
+    token = get_validated_token(request)
+    request = Request(request)
+    paginator = pagination_class()
+    queryset = optimize_queryset(queryset.filter(user_id=get_user_id(token)), serializer_class)
+    page_queryset = paginator.get_page_queryset(queryset, request)
+
+    _, results = await gather_reads(lambda: authentication.get_user(token), lambda: list(page_queryset))
+    page = paginator.paginate_results(results)
+    data = serializer_class(page, many=True, context={'request': request}).data
+    return paginator.get_paginated_response(data).data
+
+
+@async_api_view
+async def workout_stats(request):
+    """Async variant of api.views.workout_stats"""
+    token = get_validated_token(request)
+    user_id = get_user_id(token)
+    user, stats = await gather_reads(
+        lambda: authentication.get_user(token),
+        lambda: WorkoutStats.objects.filter(pk=user_id).first(),
+    )
+    stats = stats or WorkoutStats(user=user)
+    return stats.as_dict(timezone.now().date())
+
+
+@async_api_view
+async def workout_plans(request):
+    """Async variant of the workout plan list"""
+    return await list_page(request, WorkoutPlan.objects.all(), WorkoutPlanSerializer, WorkoutPlanPagination)
+
+
+@async_api_view
+async def workout_logs(request):
+    """Async variant of the workout log list"""
+    return await list_page(request, WorkoutLog.objects.all(), WorkoutLogSerializer, WorkoutLogPagination)
@@ -0,0 +1,758 @@
+"""
+Benchmark scenarios run by ``manage.py benchmark``.
+
+Each scenario is a function registered with ``@scenario`` that takes a
+``size`` argument, builds its own data in the throwaway database the
+command sets up, and returns a dict of measurements.
+"""
+import importlib.util
+import itertools
+import json
+import logging
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection, connections
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from accounts.authentication import CachedJWTAuthentication, user_cache
+from accounts.models import RevokedToken
+from accounts.revocation import purge_revoked_tokens, revocations
+
+from .cache import get_cache
+from .jobs import Worker, claim, enqueue, run_job
+from .load import ACUTE_DAYS, CHRONIC_DAYS, rebuild_training_load, training_load_series
+from .mixins import optimize_queryset
+from .models import Coaching, Exercise, Job, PersonalRecord, WorkoutExercise, WorkoutLog, WorkoutPlan
+from .representation import ValuesRepresentation
+from .search import search_exercises
+from .serializers import WorkoutLogSerializer, WorkoutPlanSerializer
+from .synthetic import exercise_names, generate
+
+User = get_user_model()
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+@contextmanager
+def timed(results, key):
+    start = time.perf_counter()
+    yield
+    results[key] = round(time.perf_counter() - start, 4)
+
+
+def median_ms(func, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 2)
+
+
+def make_user(username):
+    return User.objects.create_user(username=username, password='benchmark-pass')
+
+
+def jwt_client(user):
+    """An API client that authenticates with a real access token, as production clients do"""
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+@scenario('bulk_ingest')
+def bulk_ingest(size=1000):
+    """Create ``size`` logs one POST at a time, then the same number through the bulk endpoint"""
+    user = make_user('bench-ingest')
+    plan = WorkoutPlan.objects.create(user=user, title='Benchmark plan')
+    client = jwt_client(user)
+    results = {'size': size}
+
+    with timed(results, 'one_by_one_s'):
+        for i in range(size):
+            response = client.post(
+                '/api/workout-logs/',
+                {'workout_plan': plan.pk, 'duration': 30 + i % 30},
+                format='json',
+            )
+            assert response.status_code == 201, response.data
+
+    payload = [
+        {'client_key': f'bench-{i}', 'workout_plan': plan.pk, 'duration': 30 + i % 30}
+        for i in range(size)
+    ]
+    with timed(results, 'bulk_s'):
+        response = client.post('/api/workout-logs/bulk/', payload, format='json')
+        assert response.data['created'] == size, response.data
+
+    assert WorkoutLog.objects.filter(user=user).count() == 2 * size
+    results['speedup'] = round(results['one_by_one_s'] / results['bulk_s'], 1)
+    return results
+
+
+@scenario('scoped_list')
+def scoped_list(size=1000):
+    """List one user's 100 logs while the global table grows from ``size`` to 100x ``size`` rows"""
+    user = make_user('bench-scoped')
+    plan = WorkoutPlan.objects.create(user=user, title='Benchmark plan')
+    start = date(2020, 1, 1)
+    WorkoutLog.objects.bulk_create(
+        WorkoutLog(user=user, workout_plan=plan, date=start + timedelta(days=i)) for i in range(100)
+    )
+    client = jwt_client(user)
+    results = {'own_logs': 100}
+
+    filler_users = [make_user(f'bench-filler-{i}') for i in range(10)]
+    filler_plans = [WorkoutPlan.objects.create(user=other, title='Filler') for other in filler_users]
+    total = 0
+    for global_size in (size, 10 * size, 100 * size):
+        filler = (filler_plans[i % len(filler_plans)] for i in range(global_size - total))
+        WorkoutLog.objects.bulk_create(
+            (WorkoutLog(user_id=other.user_id, workout_plan=other, date=start) for other in filler),
+            batch_size=5000,
+        )
+        total = global_size
+        results[f'plans_ms_at_{global_size}'] = median_ms(lambda: client.get('/api/workout-plans/'))
+        results[f'logs_ms_at_{global_size}'] = median_ms(lambda: client.get('/api/workout-logs/'))
+    return results
+
+
+@scenario('analytics')
+def analytics(size=1000):
+    """Bucket five years of daily logs over a 10-exercise plan, uncached (``size`` is not used)"""
+    user = make_user('bench-analytics')
+    plan = WorkoutPlan.objects.create(user=user, title='Benchmark plan')
+    WorkoutExercise.objects.bulk_create(
+        WorkoutExercise(workout_plan=plan, exercise=Exercise.objects.create(name=f'Bench exercise {i}'))
+        for i in range(10)
+    )
+    start = date.today() - timedelta(days=5 * 365)
+    WorkoutLog.objects.bulk_create(
+        WorkoutLog(user=user, workout_plan=plan, date=start + timedelta(days=i), duration=45) for i in range(5 * 365)
+    )
+    client = jwt_client(user)
+    results = {'logs': 5 * 365}
+
+    def uncached(url):
+        get_cache().clear()
+        assert client.get(url).status_code == 200
+
+    for period in ('day', 'week', 'month'):
+        url = f'/api/analytics/?period={period}&start={start}'
+        results[f'{period}_ms'] = median_ms(lambda: uncached(url), repeat=10)
+    return results
+
+
+def scan_training_load(user_ids, start, end):
+    """Training load computed on request by iterating every log of every athlete, for comparison"""
+    result = {}
+    for user_id in user_ids:
+        daily = {}
+        for day, duration, intensity in WorkoutLog.objects.filter(user_id=user_id).values_list('date', 'duration', 'intensity'):
+            daily[day] = daily.get(day, 0) + duration * intensity
+        series, day = [], start
+        while day <= end:
+            acute = sum(daily.get(day - timedelta(days=n), 0) for n in range(ACUTE_DAYS)) / ACUTE_DAYS
+            chronic = sum(daily.get(day - timedelta(days=n), 0) for n in range(CHRONIC_DAYS)) / CHRONIC_DAYS
+            series.append((day, acute, chronic))
+            day += timedelta(days=1)
+        result[user_id] = series
+    return result
+
+
+@scenario('training_load')
+def training_load(size=1000, athletes=200):
+    """
+    Rolling 7/28-day load of ``athletes`` synthetic athletes with a year of
+    history each, scanned from the logs on every request and read from the
+    daily load arrays, over 28 days and over ``size`` days (at most 366)
+    """
+    counts = generate(users=athletes, days=365, prefix='bench-load')
+    user_ids = list(User.objects.filter(username__startswith='bench-load-').values_list('pk', flat=True))
+    results = {'athletes': len(user_ids), 'logs': counts['logs']}
+    with timed(results, 'backfill_s'):
+        rebuild_training_load()
+
+    end = date.today()
+    for label, days in (('28d', 28), ('long', min(size, 366))):
+        start = end - timedelta(days=days - 1)
+        results[f'scan_{label}_ms'] = median_ms(lambda: scan_training_load(user_ids, start, end), repeat=3)
+
+        def uncached():
+            get_cache().clear()
+            training_load_series(user_ids, start, end)
+
+        with CaptureQueriesContext(connection) as queries:
+            results[f'arrays_{label}_ms'] = median_ms(uncached, repeat=5)
+        results[f'arrays_{label}_queries'] = len(queries) // 5
+        results[f'cached_{label}_ms'] = median_ms(lambda: training_load_series(user_ids, start, end), repeat=5)
+
+    # incremental upkeep: a log write adds its load to one day of one array
+    plan = WorkoutPlan.objects.filter(user_id=user_ids[0]).first()
+    results['log_write_ms'] = median_ms(
+        lambda: WorkoutLog.objects.create(user_id=user_ids[0], workout_plan=plan, duration=60, intensity=7), repeat=20,
+    )
+    results['speedup'] = round(results['scan_28d_ms'] / results['arrays_28d_ms'], 1)
+    return results
+
+
+@scenario('coach_stats')
+def coach_stats(size=1000):
+    """
+    Stats of rosters of up to ``size`` athletes (at most MAX_ATHLETES_PER_REQUEST),
+    uncached, in one batch call against one stats call per athlete
+    """
+    roster = min(size, settings.MAX_ATHLETES_PER_REQUEST)
+    generate(users=roster, days=90, prefix='bench-coach')
+    athletes = list(User.objects.filter(username__startswith='bench-coach-').order_by('pk').values_list('pk', flat=True))
+    coach = make_user('bench-coach')
+    Coaching.objects.bulk_create([Coaching(coach=coach, athlete_id=pk) for pk in athletes])
+    client = APIClient()
+    client.force_authenticate(coach)
+    results = {'athletes': roster}
+
+    def batch(url):
+        get_cache().clear()
+        assert client.get(url).status_code == 200
+
+    counts = sorted({count for count in (1, 10, 50, 200) if count < roster} | {roster})
+    for count in counts:
+        url = f'/api/stats/athletes/?athletes={",".join(map(str, athletes[:count]))}'
+        with CaptureQueriesContext(connection) as queries:
+            batch(url)
+        results[f'batch_{count}_queries'] = len(queries)
+        results[f'batch_{count}_ms'] = median_ms(lambda: batch(url), repeat=10)
+    # the coaching check and the stats rows, whatever the roster size
+    assert {results[f'batch_{count}_queries'] for count in counts} == {2}, results
+    results['cached_ms'] = median_ms(lambda: client.get(url), repeat=10)
+
+    # the dashboard without the batch endpoint: every athlete's own stats call
+    clients = []
+    for pk in athletes:
+        clients.append(APIClient())
+        clients[-1].force_authenticate(User(pk=pk))
+
+    def one_by_one():
+        get_cache().clear()
+        for athlete_client in clients:
+            assert athlete_client.get('/api/stats/').status_code == 200
+
+    with CaptureQueriesContext(connection) as queries:
+        one_by_one()
+    results['per_athlete_queries'] = len(queries)
+    results['per_athlete_ms'] = median_ms(one_by_one, repeat=3)
+    results['speedup'] = round(results['per_athlete_ms'] / results[f'batch_{roster}_ms'], 1)
+    return results
+
+
+@scenario('auth')
+def auth(size=1000):
+    """Authenticate ``size`` bearer-token requests with and without the in-process user cache"""
+    user = make_user('bench-auth')
+    request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    user_cache.clear()
+    results = {'requests': size}
+
+    for label, authenticator in (('db_lookup', JWTAuthentication()), ('cached', CachedJWTAuthentication())):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(size):
+                authenticator.authenticate(Request(request))
+            elapsed = time.perf_counter() - start
+        results[f'{label}_us'] = round(elapsed / size * 1e6, 1)
+        results[f'{label}_queries'] = len(queries)
+    results['speedup'] = round(results['db_lookup_us'] / results['cached_us'], 1)
+    return results
+
+
+@scenario('token_refresh')
+def token_refresh(size=1000, repeat=50):
+    """
+    Rotate refresh tokens with ``size * 1000`` revoked tokens on record, half
+    of them expired (``--size 10000`` for ten million), and purge them
+    """
+    tokens = size * 1000
+    now = int(time.time())
+    # one INSERT ... SELECT, since the ORM would take minutes at this size
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+            INSERT INTO {RevokedToken._meta.db_table} (jti, expires_at)
+            SELECT printf('%%032x', i), datetime(%s + (CASE WHEN i %% 2 THEN 86400 ELSE -86400 END), 'unixepoch') FROM n
+            ''',
+            [tokens, now],
+        )
+        cursor.execute('PRAGMA page_count')
+        pages = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        page_size = cursor.fetchone()[0]
+    results = {'tokens': tokens, 'database_mib': round(pages * page_size / 2 ** 20, 1)}
+
+    revocations.clear()
+    with timed(results, 'load_s'):
+        bloom = revocations.load()
+    results['filter_mib'] = round(len(bloom.bits) / 2 ** 20, 1)
+
+    user = make_user('bench-refresh')
+    client = APIClient()
+    fresh = [str(RefreshToken.for_user(user)) for _ in range(repeat)]
+    results['refresh_ms'] = median_ms(lambda: client.post('/api/auth/token/refresh/', {'refresh': fresh.pop()}), repeat)
+    replayed = str(RefreshToken.for_user(user))
+    client.post('/api/auth/token/refresh/', {'refresh': replayed})
+    # every replay is refused, and logged as such
+    logging.disable(logging.WARNING)
+    try:
+        assert client.post('/api/auth/token/refresh/', {'refresh': replayed}).status_code == 401
+        results['replay_ms'] = median_ms(lambda: client.post('/api/auth/token/refresh/', {'refresh': replayed}), repeat)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    # a check the filter answers against one that has to ask the database
+    checks = min(tokens // 2, 1000)
+    start = time.perf_counter()
+    assert not any(revocations.is_revoked(f'fresh-{n}') for n in range(checks))
+    results['check_filter_us'] = round((time.perf_counter() - start) / checks * 1e6, 1)
+    start = time.perf_counter()
+    assert all(RevokedToken.objects.filter(jti=f'{n:032x}').exists() for n in range(1, 2 * checks, 2))
+    results['check_db_us'] = round((time.perf_counter() - start) / checks * 1e6, 1)
+    results['false_positive_rate'] = round(sum(f'unrevoked-{n}' in bloom for n in range(100000)) / 100000, 4)
+
+    with timed(results, 'purge_s'):
+        results['purged'] = purge_revoked_tokens()
+    assert results['purged'] == tokens // 2, results['purged']
+    revocations.clear()
+    return results
+
+
+@scenario('serialization')
+def serialization(size=1000):
+    """Serialize ``size`` and 10x ``size`` logs and plans with DRF serializers and from values() rows"""
+    from rest_framework import serializers
+
+    class NestedPlanLogSerializer(serializers.ModelSerializer):
+        workout_plan = WorkoutPlanSerializer(read_only=True)
+
+        class Meta:
+            model = WorkoutLog
+            fields = ['id', 'workout_plan', 'date', 'duration', 'notes']
+
+    user = make_user('bench-serialization')
+    exercises = Exercise.objects.bulk_create(Exercise(name=f'Bench serialization {i}') for i in range(5))
+    results = {}
+    for rows in (size, 10 * size):
+        WorkoutLog.objects.filter(user=user).delete()
+        WorkoutPlan.objects.filter(user=user).delete()
+        plans = WorkoutPlan.objects.bulk_create(WorkoutPlan(user=user, title=f'Plan {i}') for i in range(rows // 10))
+        WorkoutExercise.objects.bulk_create(
+            WorkoutExercise(workout_plan=plan, exercise=exercise) for plan in plans for exercise in exercises
+        )
+        WorkoutLog.objects.bulk_create(
+            (WorkoutLog(user=user, workout_plan=plans[i % len(plans)], duration=45) for i in range(rows)),
+            batch_size=5000,
+        )
+        for label, serializer_class, model in (
+            ('logs', WorkoutLogSerializer, WorkoutLog),
+            ('plans', WorkoutPlanSerializer, WorkoutPlan),
+            ('nested_logs', NestedPlanLogSerializer, WorkoutLog),
+        ):
+            queryset = model.objects.filter(user=user).order_by('-id')
+            representation = ValuesRepresentation(serializer_class)
+            count = queryset.count()
+            drf_ms = median_ms(lambda: serializer_class(optimize_queryset(queryset, serializer_class), many=True).data, repeat=3)
+            values_ms = median_ms(
+                lambda: representation.to_representation(list(queryset.values(*representation.value_names))),
+                repeat=3,
+            )
+            results[f'{label}_{count}'] = {'drf_ms': drf_ms, 'values_ms': values_ms, 'speedup': round(drf_ms / values_ms, 1)}
+    return results
+
+
+@scenario('exercise_search')
+def exercise_search(size=1000):
+    """Search a catalog of 100x ``size`` exercises by prefix, exact name and with a typo"""
+    Exercise.objects.bulk_create(
+        (Exercise(name=name) for name in exercise_names(100 * size)), batch_size=5000, ignore_conflicts=True,
+    )
+    results = {'exercises': Exercise.objects.count()}
+    for label, query in (
+        ('short_prefix', 'de'),
+        ('word_prefixes', 'dumb bench pr'),
+        ('exact', 'Paused Cable Row'),
+        ('typo', 'pasued cabel row'),
+        ('no_match', 'zxqv'),
+    ):
+        assert label == 'no_match' or search_exercises(query), query
+        results[f'{label}_ms'] = median_ms(lambda: search_exercises(query), repeat=20)
+    return results
+
+
+# Django's stock SQLite behaviour, for comparison with the fittrack.sqlite3 tuning
+DEFAULT_SQLITE_SETTINGS = {
+    'SQLITE_PRAGMAS': {'journal_mode': 'delete', 'synchronous': 'full'},
+    'SQLITE_IMMEDIATE_TRANSACTIONS': False,
+}
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+@scenario('concurrency')
+def concurrency(size=1000, writers=4, readers=4):
+    """``writers`` threads create ``size`` logs between them while ``readers`` threads page the history"""
+    user = make_user('bench-concurrency')
+    plan = WorkoutPlan.objects.create(user=user, title='Benchmark plan')
+    results = {'writes': size, 'writers': writers, 'readers': readers}
+
+    tuned = {name: getattr(settings, name) for name in DEFAULT_SQLITE_SETTINGS}
+    for label, sqlite_settings in (('default', DEFAULT_SQLITE_SETTINGS), ('tuned', tuned)):
+        counts = {'reads': 0, 'write_errors': 0, 'read_errors': 0}
+        lock = threading.Lock()
+        writing = threading.Event()
+        writing.set()
+
+        def write(worker):
+            for _ in range(size // writers):
+                try:
+                    WorkoutLog.objects.create(user=user, workout_plan=plan, duration=30)
+                except OperationalError:
+                    with lock:
+                        counts['write_errors'] += 1
+            connections.close_all()
+
+        def read(worker):
+            while writing.is_set():
+                try:
+                    list(WorkoutLog.objects.filter(user=user).order_by('-date', '-id')[:20])
+                    with lock:
+                        counts['reads'] += 1
+                except OperationalError:
+                    with lock:
+                        counts['read_errors'] += 1
+            connections.close_all()
+
+        with override_settings(**sqlite_settings):
+            connections.close_all()
+            start = time.perf_counter()
+            reader_threads = run_threads(read, readers)
+            for thread in run_threads(write, writers):
+                thread.join()
+            elapsed = time.perf_counter() - start
+            writing.clear()
+            for thread in reader_threads:
+                thread.join()
+            connections.close_all()
+
+        results[f'{label}_writes_per_s'] = round(size / elapsed, 1)
+        results[f'{label}_reads_per_s'] = round(counts['reads'] / elapsed, 1)
+        results[f'{label}_write_errors'] = counts['write_errors']
+        results[f'{label}_read_errors'] = counts['read_errors']
+    return results
+
+
+@scenario('job_queue')
+def job_queue(size=1000, workers=4):
+    """Queue ``size`` no-op jobs, then drain them with one worker and with ``workers`` worker threads"""
+    results = {'jobs': size, 'workers': workers}
+    with timed(results, 'enqueue_s'):
+        for i in range(size):
+            enqueue('ping', n=i)
+    # pending duplicates are absorbed instead of queued again
+    enqueue('ping', n=0)
+    assert Job.objects.filter(status=Job.PENDING).count() == size
+
+    with timed(results, 'one_worker_s'):
+        assert Worker(name='bench-0').run(burst=True) == size
+    results['one_worker_jobs_per_s'] = round(size / results['one_worker_s'], 1)
+
+    for i in range(size):
+        enqueue('ping', n=size + i)
+    processed = []
+
+    def drain(worker):
+        processed.append(Worker(name=f'bench-{worker}').run(burst=True))
+        connections.close_all()
+
+    start = time.perf_counter()
+    for thread in run_threads(drain, workers):
+        thread.join()
+    elapsed = time.perf_counter() - start
+    # every job ran exactly once, whichever worker claimed it
+    assert sum(processed) == size and not Job.objects.exclude(status=Job.DONE).exists(), processed
+    results['many_workers_jobs_per_s'] = round(size / elapsed, 1)
+    return results
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def iter_routes(resolver=None, namespace=None):
+    """(view name, URLconf module) of every URL pattern reachable from the root URLconf"""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            inner = ':'.join(filter(None, (namespace, pattern.namespace))) or None
+            yield from iter_routes(pattern, inner)
+        else:
+            name = f'{namespace}:{pattern.name}' if namespace else pattern.name
+            yield name, resolver.urlconf_name
+
+
+def unmounted_urlconfs():
+    """``<app>.urls`` modules of the project's own apps that the root URLconf does not include"""
+    # include() of a module gives its name (or the module); include() of a pattern list gives the list
+    mounted = {getattr(urlconf, '__name__', urlconf) for _, urlconf in iter_routes() if not isinstance(urlconf, list)}
+    return sorted(
+        f'{config.name}.urls' for config in apps.get_app_configs()
+        if config.path.startswith(str(settings.BASE_DIR))
+        and f'{config.name}.urls' not in mounted and importlib.util.find_spec(f'{config.name}.urls') is not None
+    )
+
+
+class RouteFixture:
+    """A synthetic population and the heaviest user of it, whose data every route request touches"""
+
+    def __init__(self, size):
+        self.population = generate(users=max(2, size // 100), prefix='bench-routes')
+        self.user = (
+            User.objects.filter(username__startswith='bench-routes-')
+            .annotate(logs=Count('api_workout_logs')).order_by('-logs').first()
+        )
+        self.plan = WorkoutPlan.objects.filter(user=self.user).order_by('pk').first()
+        self.log = WorkoutLog.objects.filter(user=self.user).order_by('-date', '-id').first()
+        self.record = PersonalRecord.objects.filter(user=self.user).order_by('pk').first()
+        self.exercise_ids = list(
+            WorkoutExercise.objects.filter(workout_plan=self.plan).values_list('exercise', flat=True)
+        )
+        self.names = list(Exercise.objects.filter(pk__in=self.exercise_ids).values_list('name', flat=True))
+        # the heaviest user coaches the whole population
+        self.athletes = list(User.objects.filter(username__startswith='bench-routes-').values_list('pk', flat=True))
+        Coaching.objects.bulk_create([Coaching(coach=self.user, athlete_id=pk) for pk in self.athletes if pk != self.user.pk])
+        staff = User.objects.create_user(username='bench-routes-staff', password='benchmark-pass', is_staff=True)
+        metrics = APIClient()
+        metrics.credentials(HTTP_AUTHORIZATION=f'Bearer {METRICS_TOKEN}')
+        self.clients = {'user': jwt_client(self.user), 'staff': jwt_client(staff), 'anonymous': APIClient(), 'metrics': metrics}
+        self.counter = itertools.count()
+        enqueue('export_logs', user=self.user, format='csv')
+        self.export_job = run_job(claim('benchmark'))
+
+    def unique(self, prefix):
+        return f'{prefix}-{next(self.counter)}'
+
+    def sets(self):
+        return [{'exercise': pk, 'reps': 8, 'weight': 20 + i} for i, pk in enumerate(self.exercise_ids)]
+
+    def new_plan(self):
+        return WorkoutPlan.objects.create(user=self.user, title=self.unique('Benchmark plan'))
+
+    def new_log(self):
+        return WorkoutLog.objects.create(user=self.user, workout_plan=self.plan, duration=45)
+
+
+METRICS_TOKEN = 'benchmark-metrics-token'
+
+# The requests made of each named route. A request is (method, build), where
+# build returns the reverse() kwargs, query string, body and client to use;
+# it runs before the clock starts, so it may create the rows a request consumes.
+ROUTE_REQUESTS = {
+    'index': [('GET', lambda f: {'client': 'anonymous'})],
+    'register': [('POST', lambda f: {
+        'client': 'anonymous', 'body': {'username': f.unique('bench-register'), 'password': 'benchmark-pass'},
+    })],
+    'token_obtain_pair': [('POST', lambda f: {
+        'client': 'anonymous', 'body': {'username': f.user.username, 'password': 'fittrack-pass'},
+    })],
+    'token_refresh': [('POST', lambda f: {'client': 'anonymous', 'body': {'refresh': str(RefreshToken.for_user(f.user))}})],
+    'workout-stats': [('GET', lambda f: {})],
+    'athlete-stats': [('GET', lambda f: {'query': f'athletes={",".join(map(str, f.athletes))}'})],
+    'workout-analytics': [('GET', lambda f: {})],
+    'workout-sync': [('GET', lambda f: {})],
+    'training-load': [('GET', lambda f: {'query': f'athletes={",".join(map(str, f.athletes))}'})],
+    'response-cache-stats': [('GET', lambda f: {'client': 'staff'})],
+    'metrics': [('GET', lambda f: {'client': 'metrics'})],
+    'async-workout-stats': [('GET', lambda f: {})],
+    'async-workout-plans': [('GET', lambda f: {})],
+    'async-workout-logs': [('GET', lambda f: {})],
+    'api-root': [('GET', lambda f: {})],
+    'workoutplan-list': [
+        ('GET', lambda f: {}),
+        ('POST', lambda f: {'body': {'title': f.unique('Benchmark plan'), 'exercises': [{'name': name} for name in f.names]}}),
+    ],
+    'workoutplan-detail': [
+        ('GET', lambda f: {'kwargs': {'pk': f.plan.pk}}),
+        ('PATCH', lambda f: {'kwargs': {'pk': f.plan.pk}, 'body': {'description': f.unique('Renamed')}}),
+        ('DELETE', lambda f: {'kwargs': {'pk': f.new_plan().pk}}),
+    ],
+    'exercise-list': [
+        ('GET', lambda f: {}),
+        ('POST', lambda f: {'client': 'staff', 'body': {'name': f.unique('Benchmark exercise')}}),
+    ],
+    'exercise-search': [('GET', lambda f: {'query': 'q=barb be'})],
+    'exercise-detail': [('GET', lambda f: {'kwargs': {'pk': f.exercise_ids[0]}})],
+    'workoutlog-list': [
+        ('GET', lambda f: {}),
+        ('POST', lambda f: {'body': {'workout_plan': f.plan.pk, 'duration': 45, 'sets': f.sets()}}),
+    ],
+    'workoutlog-bulk': [('POST', lambda f: {'body': [
+        {'workout_plan': f.plan.pk, 'duration': 45, 'sets': f.sets()} for _ in range(50)
+    ]})],
+    'workoutlog-export': [('GET', lambda f: {})],
+    'workoutlog-detail': [
+        ('GET', lambda f: {'kwargs': {'pk': f.log.pk}}),
+        ('PATCH', lambda f: {'kwargs': {'pk': f.log.pk}, 'body': {'notes': f.unique('Edited')}}),
+        ('DELETE', lambda f: {'kwargs': {'pk': f.new_log().pk}}),
+    ],
+    'personalrecord-list': [('GET', lambda f: {})],
+    'personalrecord-detail': [('GET', lambda f: {'kwargs': {'pk': f.record.pk}})],
+    'job-list': [
+        ('GET', lambda f: {}),
+        ('POST', lambda f: {'body': {'task': 'recompute_stats'}}),
+    ],
+    'job-detail': [('GET', lambda f: {'kwargs': {'pk': f.export_job.pk}})],
+    'job-download': [('GET', lambda f: {'kwargs': {'pk': f.export_job.pk}})],
+}
+
+
+def request_route(fixture, name, method, build):
+    """Make one request of a route; returns (status, seconds, queries)"""
+    spec = build(fixture)
+    url = reverse(name, kwargs=spec.get('kwargs'))
+    if spec.get('query'):
+        url = f'{url}?{spec["query"]}'
+    # every sample pays for the full request, not a response cache hit (of any user's data)
+    get_cache().clear()
+    client = fixture.clients[spec.get('client', 'user')]
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = client.generic(method, url, json.dumps(spec['body']) if 'body' in spec else '', 'application/json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        seconds = time.perf_counter() - start
+    return response.status_code, seconds, len(queries)
+
+
+@scenario('routes')
+def routes(size=1000, repeat=20, warmup=2):
+    """
+    Request every mounted route ``repeat`` times as the most active of ``size // 100``
+    synthetic users: latency percentiles, queries per request and peak traced memory.
+    The async views run their queries on worker threads, which are not counted.
+    """
+    # the throttles still run, but every request has to get through
+    rates = {scope: '1000000/s' for scope in settings.REST_FRAMEWORK.get('DEFAULT_THROTTLE_RATES', {})}
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}
+    with override_settings(METRICS_TOKEN=METRICS_TOKEN, REST_FRAMEWORK=rest_framework), \
+            tempfile.TemporaryDirectory() as export_dir, override_settings(JOB_EXPORT_DIR=export_dir):
+        fixture = RouteFixture(size)
+        results = {
+            'users': fixture.population['users'],
+            'subject_logs': fixture.user.logs,
+            'routes': {},
+            'uncovered': sorted({name for name, _ in iter_routes() if not name.startswith('admin:')} - set(ROUTE_REQUESTS)),
+            'unmounted': unmounted_urlconfs(),
+        }
+        for name, requests in ROUTE_REQUESTS.items():
+            for method, build in requests:
+                for _ in range(warmup):
+                    request_route(fixture, name, method, build)
+                samples = [request_route(fixture, name, method, build) for _ in range(repeat)]
+                statuses = {status for status, _, _ in samples}
+                assert all(status < 400 for status in statuses), (method, name, statuses)
+                latencies = [seconds * 1000 for _, seconds, _ in samples]
+
+                # tracing slows everything down, so memory is measured on a separate request
+                tracemalloc.start()
+                try:
+                    request_route(fixture, name, method, build)
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+
+                results['routes'][f'{method} {name}'] = {
+                    'status': max(statuses),
+                    'p50_ms': round(percentile(latencies, 0.5), 2),
+                    'p95_ms': round(percentile(latencies, 0.95), 2),
+                    'p99_ms': round(percentile(latencies, 0.99), 2),
+                    'queries': max(queries for _, _, queries in samples),
+                    'peak_kib': round(peak / 1024, 1),
+                }
+    return results
+
+
+def flatten(results, prefix=''):
+    """Numeric leaves of nested results, keyed by dotted path"""
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            yield from flatten(value, f'{path}.')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def metric_direction(path):
+    """1 if a larger value is worse, -1 if it is better, 0 for values that only describe the run"""
+    key = path.rsplit('.', 1)[-1]
+    if key.startswith('p9'):
+        # tail percentiles of a few dozen samples are mostly noise; compare medians
+        return 0
+    if key.endswith('per_s') or key == 'speedup':
+        return -1
+    if key.endswith(('_ms', '_s', 'queries', '_kib')):
+        return 1
+    return 0
+
+
+# timing changes smaller than this are noise, whatever the relative change
+NOISE_FLOOR_MS = 0.5
+
+
+def compare_results(baseline, current, tolerance=0.2):
+    """
+    Compare two runs' results, as {scenario: results}. Returns
+    (path, old, new, regressed) for every metric that moved by more than
+    ``tolerance``; query counts are exact, so any increase is a regression.
+    """
+    changes = []
+    for name in baseline.keys() & current.keys():
+        old_values = dict(flatten(baseline[name], f'{name}.'))
+        for path, new in flatten(current[name], f'{name}.'):
+            direction = metric_direction(path)
+            old = old_values.get(path)
+            if not direction or old is None or old == new:
+                continue
+            if path.endswith('queries'):
+                changes.append((path, old, new, new > old))
+                continue
+            floor = NOISE_FLOOR_MS if path.endswith('_ms') else NOISE_FLOOR_MS / 1000 if path.endswith('_s') else 0
+            if abs(new - old) <= max(tolerance * abs(old), floor):
+                continue
+            changes.append((path, old, new, (new - old) * direction > 0))
+    return sorted(changes)
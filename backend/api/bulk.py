@@ -0,0 +1,138 @@
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Exercise, WorkoutLog, WorkoutPlan, WorkoutSet
+from .records import apply_sets, set_tuples
+from .serializers import BulkWorkoutLogSerializer
+from .load import apply_load_batch
+from .stats import apply_log_batch
+
+_MISSING = object()
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class WorkoutLogIngest:
+    """
+    Validates and writes a batch of workout logs for one user.
+
+    Plan ownership is checked against a single lookup of the user's plan
+    ids, existing idempotency keys and the exercises of logged sets are
+    looked up once per chunk, and rows are written with bulk_create. Every
+    item gets a result entry with its index in the upload and a status of
+    created, duplicate or error.
+    """
+
+    def __init__(self, user, chunk_size=500, max_items=10000):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.max_items = max_items
+        self.plan_ids = set(WorkoutPlan.objects.filter(user=user).values_list('pk', flat=True))
+        self.results = []
+        self.truncated = False
+
+    def run(self, items):
+        items = iter(items)
+        for chunk in chunked(enumerate(islice(items, self.max_items)), self.chunk_size):
+            self.ingest_chunk(chunk)
+        self.truncated = next(items, _MISSING) is not _MISSING
+        return self.summary()
+
+    def summary(self):
+        counts = {'created': 0, 'duplicate': 0, 'error': 0}
+        for result in self.results:
+            counts[result['status']] += 1
+        return {
+            'created': counts['created'],
+            'duplicates': counts['duplicate'],
+            'errors': counts['error'],
+            'truncated': self.truncated,
+            'results': sorted(self.results, key=lambda result: result['index']),
+        }
+
+    def validate(self, chunk):
+        valid = []
+        for index, item in chunk:
+            serializer = BulkWorkoutLogSerializer(data=item)
+            if not serializer.is_valid():
+                self.results.append({'index': index, 'status': 'error', 'errors': serializer.errors})
+            elif serializer.validated_data['workout_plan'] not in self.plan_ids:
+                errors = {'workout_plan': ['You can only log workouts for your own plans.']}
+                self.results.append({'index': index, 'status': 'error', 'errors': errors})
+            else:
+                valid.append((index, serializer.validated_data))
+
+        exercise_ids = {item['exercise'] for _, data in valid for item in data.get('sets', ())}
+        if exercise_ids:
+            known = set(Exercise.objects.filter(pk__in=exercise_ids).values_list('pk', flat=True))
+            checked = []
+            for index, data in valid:
+                missing = {item['exercise'] for item in data.get('sets', ())} - known
+                if missing:
+                    errors = {'sets': [f'Unknown exercise ids: {sorted(missing)}.']}
+                    self.results.append({'index': index, 'status': 'error', 'errors': errors})
+                else:
+                    checked.append((index, data))
+            valid = checked
+        return valid
+
+    def ingest_chunk(self, chunk):
+        valid = self.validate(chunk)
+        try:
+            self.write(valid)
+        except IntegrityError:
+            # a concurrent upload claimed one of our keys; the retry sees it as a duplicate
+            self.write(valid)
+
+    def write(self, valid):
+        keys = {data['client_key'] for _, data in valid if data.get('client_key')}
+        existing = dict(
+            WorkoutLog.objects.filter(user=self.user, client_key__in=keys).values_list('client_key', 'pk')
+        ) if keys else {}
+
+        results, pending, repeats, seen = [], [], [], {}
+        today = timezone.localdate()
+        for index, data in valid:
+            key = data.get('client_key') or None
+            if key in existing:
+                results.append({'index': index, 'status': 'duplicate', 'id': existing[key]})
+                continue
+            if key in seen:
+                repeats.append((index, seen[key]))
+                continue
+            log = WorkoutLog(
+                user=self.user,
+                workout_plan_id=data['workout_plan'],
+                date=data.get('date') or today,
+                duration=data['duration'],
+                intensity=data['intensity'],
+                notes=data['notes'],
+                client_key=key,
+            )
+            log.set_items = data.get('sets', ())
+            if key is not None:
+                seen[key] = log
+            pending.append((index, log))
+
+        with transaction.atomic():
+            WorkoutLog.objects.bulk_create([log for _, log in pending], batch_size=self.chunk_size)
+            apply_log_batch(self.user.pk, [(log.date, log.duration) for _, log in pending])
+            apply_load_batch(self.user.pk, [(log.date, log.duration, log.intensity) for _, log in pending])
+            sets = WorkoutSet.objects.bulk_create(
+                [
+                    WorkoutSet(log=log, user=self.user, exercise_id=item['exercise'], reps=item['reps'], weight=item['weight'])
+                    for _, log in pending for item in log.set_items
+                ],
+                batch_size=self.chunk_size,
+            )
+            apply_sets(self.user.pk, set_tuples(sets))
+
+        results.extend({'index': index, 'status': 'created', 'id': log.pk} for index, log in pending)
+        results.extend({'index': index, 'status': 'duplicate', 'id': log.pk} for index, log in repeats)
+        self.results.extend(results)
@@ -0,0 +1,170 @@
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def cache_stats():
+    """Hit/miss counters of this process since start-up (or the last reset)"""
+    with _counters_lock:
+        stats = {name: _counters[name] for name in ('hits', 'misses', 'not_modified', 'invalidations')}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    return stats
+
+
+def reset_cache_stats():
+    with _counters_lock:
+        _counters.clear()
+
+
+def _version_key(user_id):
+    return f'response-cache:version:{user_id}'
+
+
+def get_user_version(user_id):
+    """
+    The generation token embedded in every cached response key of a user.
+
+    A missing token (never set, or evicted) is replaced by a fresh one
+    rather than a fixed default, so eviction can only cause misses, never
+    resurrect entries from an older generation.
+    """
+    cache = get_cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def get_user_versions(user_ids):
+    """get_user_version of many users, in one cache round trip when they are all set"""
+    cache = get_cache()
+    keys = {_version_key(user_id): user_id for user_id in user_ids}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return {user_id: versions.get(key) or get_user_version(user_id) for key, user_id in keys.items()}
+
+
+def get_many_per_user(name, user_ids, build):
+    """
+    ``{user_id: value}`` of values cached per user under ``name``, in each
+    user's generation, so a write by one user only rebuilds their value.
+    ``build(user_ids)`` returns the values of the users that were not cached.
+    """
+    cache = get_cache()
+    versions = get_user_versions(user_ids)
+    keys = {user_id: f'{name}:{user_id}:{versions[user_id]}' for user_id in user_ids}
+    cached = cache.get_many(keys.values())
+    values = {user_id: cached[key] for user_id, key in keys.items() if key in cached}
+    missing = [user_id for user_id in user_ids if user_id not in values]
+    if missing:
+        fresh = build(missing)
+        cache.set_many({keys[user_id]: value for user_id, value in fresh.items()})
+        values.update(fresh)
+    return values
+
+
+def invalidate_user(user_id):
+    """Drop every cached response of a user by moving them to a new generation"""
+    def bump():
+        get_cache().set(_version_key(user_id), time.time_ns(), timeout=None)
+        count('invalidations')
+
+    bump()
+    # bump again once the write is visible, so a read racing the transaction cannot re-cache old data
+    transaction.on_commit(bump)
+
+
+def response_key(request):
+    path = hashlib.md5(f'{request.get_host()}{request.get_full_path()}'.encode()).hexdigest()
+    return f'response-cache:{request.user.pk}:{get_user_version(request.user.pk)}:{path}'
+
+
+def compute_etag(data):
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return '"%s"' % hashlib.md5(payload).hexdigest()
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')]
+
+
+def cached_response(request, build):
+    """
+    Serve a GET from the per-user response cache, falling back to ``build``.
+
+    Only successful responses are stored. Every response carries an ETag,
+    and a request whose If-None-Match matches gets an empty 304.
+    """
+    if request.method != 'GET' or not request.user.is_authenticated:
+        return build()
+
+    cache = get_cache()
+    key = response_key(request)
+    entry = cache.get(key)
+    if entry is None:
+        count('misses')
+        response = build()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        etag = compute_etag(response.data)
+        cache.set(key, (etag, response.data))
+    else:
+        count('hits')
+        etag, data = entry
+        response = Response(data)
+
+    if _etag_matches(request, etag):
+        count('not_modified')
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def cache_per_user(view_func):
+    """Cache a function-based DRF view with cached_response"""
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        return cached_response(request, lambda: view_func(request, *args, **kwargs))
+    return wrapper
+
+
+class ResponseCacheMixin:
+    """Cache list and retrieve responses per user, invalidated by the signals in api.signals"""
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(request, lambda: super(ResponseCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(request, lambda: super(ResponseCacheMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,51 @@
+from .models import Exercise, Tombstone, WorkoutExercise
+
+
+def resolve_exercises(items):
+    """
+    Map exercise names to Exercise rows, creating the missing ones in bulk.
+
+    ``items`` are dicts with a ``name`` and an optional ``description``,
+    which is only used for exercises that do not exist yet.
+    """
+    descriptions = {}
+    for item in items:
+        descriptions.setdefault(item['name'], item.get('description', ''))
+
+    def lookup(names):
+        # descending pk so the oldest row wins if a name was ever duplicated
+        return {exercise.name: exercise for exercise in Exercise.objects.filter(name__in=names).order_by('-pk')}
+
+    exercises = lookup(descriptions)
+    missing = [name for name in descriptions if name not in exercises]
+    if missing:
+        Exercise.objects.bulk_create(
+            [Exercise(name=name, description=descriptions[name]) for name in missing],
+            ignore_conflicts=True,
+        )
+        exercises.update(lookup(missing))
+    return exercises
+
+
+def set_plan_exercises(plan, items, replace=False):
+    """
+    Attach exercises to a plan with one name lookup and one bulk insert.
+
+    ``items`` are dicts with ``name`` and optional ``description``,
+    ``sets`` and ``reps``. With ``replace`` the plan's current exercises
+    are removed first. Call inside a transaction.
+    """
+    exercises = resolve_exercises(items)
+    if replace:
+        previous = WorkoutExercise.objects.filter(workout_plan=plan)
+        Tombstone.record(plan.user_id, Tombstone.PLAN_EXERCISE, list(previous.values_list('pk', flat=True)))
+        previous.delete()
+
+    rows = []
+    for item in items:
+        row = WorkoutExercise(workout_plan=plan, exercise=exercises[item['name']])
+        for field in ('sets', 'reps'):
+            if item.get(field) is not None:
+                setattr(row, field, item[field])
+        rows.append(row)
+    return WorkoutExercise.objects.bulk_create(rows)
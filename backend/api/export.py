@@ -0,0 +1,50 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .models import WorkoutLog
+
+EXPORT_FIELDS = ('id', 'date', 'workout_plan', 'plan_title', 'duration', 'intensity', 'notes', 'client_key')
+
+
+def export_rows(user, chunk_size=2000):
+    """A user's whole log history, oldest first, as flat dicts read from a server-side cursor"""
+    return (
+        WorkoutLog.objects.filter(user=user)
+        .order_by('date', 'id')
+        .annotate(plan_title=F('workout_plan__title'))
+        .values(*EXPORT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class _Echo:
+    """File-like object whose write() hands back the line csv.writer produced"""
+
+    def write(self, value):
+        return value
+
+
+def _batched(lines, lines_per_chunk):
+    # a few hundred lines per chunk keeps the number of writes to the socket down
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= lines_per_chunk:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_csv(rows, lines_per_chunk=500):
+    writer = csv.writer(_Echo())
+    lines = (writer.writerow([row[field] for field in EXPORT_FIELDS]) for row in rows)
+    yield writer.writerow(EXPORT_FIELDS)
+    yield from _batched(lines, lines_per_chunk)
+
+
+def stream_ndjson(rows, lines_per_chunk=500):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    yield from _batched((encoder.encode(row) + '\n' for row in rows), lines_per_chunk)
@@ -0,0 +1,205 @@
+import csv
+import hashlib
+import json
+import re
+
+from django.db import transaction
+
+from .bulk import WorkoutLogIngest, chunked
+from .cache import invalidate_user
+from .models import Exercise, WorkoutExercise, WorkoutPlan
+from .stats import apply_plan_batch
+
+IMPORT_KINDS = ('exercises', 'plans', 'logs')
+
+_WHITESPACE = re.compile(r'\s*')
+_SEPARATOR = re.compile(r'[\s,]*')
+
+
+def iter_json_items(stream, read_size=1 << 16):
+    """
+    Yield the objects of a JSON array, or of an NDJSON stream, while reading
+    ``stream`` in blocks, so the file is never held in memory as a whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof, in_array = '', 0, False, None
+    while True:
+        position = (_SEPARATOR if in_array else _WHITESPACE).match(buffer, position).end()
+        if position < len(buffer):
+            if in_array is None:
+                in_array = buffer[position] == '['
+                position += in_array
+                continue
+            if in_array and buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # an item that ends exactly at the buffer edge may continue in the next block
+                if end < len(buffer) or eof:
+                    yield item
+                    position = end
+                    continue
+        elif eof:
+            if in_array:
+                raise json.JSONDecodeError('Unterminated array', buffer, position)
+            return
+
+        block = stream.read(read_size)
+        eof = not block
+        buffer, position = buffer[position:] + block, 0
+
+
+def read_rows(stream, file_format):
+    """Rows of a CSV (with a header line) or JSON/NDJSON import file, as dicts"""
+    if file_format == 'csv':
+        return csv.DictReader(stream)
+    return iter_json_items(stream)
+
+
+def import_client_key(index, row):
+    """A stable idempotency key for a log row, so re-running an import never duplicates it"""
+    digest = hashlib.sha1(f'{index}:{json.dumps(row, sort_keys=True, default=str)}'.encode()).hexdigest()
+    return f'import:{digest[:40]}'
+
+
+class WorkoutImport:
+    """
+    Writes exercise, plan and log rows in chunks, one transaction per chunk.
+
+    The exercise catalog and the user's plans (and their exercises) are
+    loaded once and kept in memory, so names and titles resolve without
+    a query per row; only missing ones are created, with bulk_create.
+    Every kind of row is idempotent: known exercises, plans and
+    (plan, exercise) pairs are reused, and logs get a stable client_key,
+    so an interrupted import can be run again from any earlier point.
+
+    ``run`` consumes ``(index, row)`` pairs and yields the index of the
+    last row of each committed chunk, for the caller to checkpoint.
+    """
+
+    def __init__(self, user=None, chunk_size=1000):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.counts = {'rows': 0, 'created': 0, 'duplicates': 0, 'errors': 0}
+        self.errors = []
+        self.exercises = dict(Exercise.objects.values_list('name', 'pk'))
+        self.plans = {}
+        self.plan_exercises = set()
+        self.ingest = None
+        if user is not None:
+            # descending pk so the oldest plan wins when titles repeat
+            plans = WorkoutPlan.objects.filter(user=user).order_by('-pk').values_list('title', 'pk')
+            self.plans = dict(plans)
+            self.plan_exercises = set(
+                WorkoutExercise.objects.filter(workout_plan__user=user).values_list('workout_plan', 'exercise')
+            )
+
+    def error(self, index, message):
+        self.counts['errors'] += 1
+        self.errors.append((index, message))
+
+    def run(self, kind, rows):
+        handler = getattr(self, f'import_{kind}')
+        for chunk in chunked(rows, self.chunk_size):
+            valid = []
+            for index, row in chunk:
+                if isinstance(row, dict):
+                    valid.append((index, row))
+                else:
+                    self.error(index, 'expected an object')
+            with transaction.atomic():
+                handler(valid)
+            self.counts['rows'] += len(chunk)
+            yield chunk[-1][0]
+
+    def resolve_exercises(self, descriptions):
+        """Map exercise names to ids, creating the ones missing from the catalog"""
+        missing = {name: description for name, description in descriptions.items() if name not in self.exercises}
+        if missing:
+            Exercise.objects.bulk_create(
+                [Exercise(name=name, description=description) for name, description in missing.items()],
+                ignore_conflicts=True,
+            )
+            # ignore_conflicts leaves pks unset, and another process may have added some of the names
+            self.exercises.update(Exercise.objects.filter(name__in=missing).values_list('name', 'pk'))
+        return len(missing)
+
+    def resolve_plans(self, titles):
+        """Map plan titles to the user's plan ids, creating the missing plans"""
+        missing = list(dict.fromkeys(title for title in titles if title not in self.plans))
+        if missing:
+            created = WorkoutPlan.objects.bulk_create([WorkoutPlan(user=self.user, title=title) for title in missing])
+            self.plans.update((plan.title, plan.pk) for plan in created)
+            apply_plan_batch(self.user.pk, len(created))
+        return len(missing)
+
+    def import_exercises(self, chunk):
+        descriptions = {}
+        for index, row in chunk:
+            name = (row.get('name') or '').strip()
+            if not name or len(name) > 100:
+                self.error(index, 'name must be 1-100 characters')
+                continue
+            descriptions.setdefault(name, row.get('description') or '')
+        created = self.resolve_exercises(descriptions)
+        self.counts['created'] += created
+        self.counts['duplicates'] += len(descriptions) - created
+
+    def import_plans(self, chunk):
+        valid = []
+        for index, row in chunk:
+            title, name = (row.get('plan') or '').strip(), (row.get('exercise') or '').strip()
+            try:
+                sets, reps = int(row.get('sets') or 3), int(row.get('reps') or 10)
+            except (TypeError, ValueError):
+                self.error(index, 'sets and reps must be integers')
+                continue
+            if not title or not name or len(title) > 100 or len(name) > 100:
+                self.error(index, 'plan and exercise must be 1-100 characters')
+                continue
+            valid.append((title, name, sets, reps))
+
+        self.resolve_exercises({name: '' for _, name, _, _ in valid})
+        self.resolve_plans(title for title, *_ in valid)
+        rows = []
+        for title, name, sets, reps in valid:
+            pair = (self.plans[title], self.exercises[name])
+            if pair in self.plan_exercises:
+                self.counts['duplicates'] += 1
+                continue
+            self.plan_exercises.add(pair)
+            rows.append(WorkoutExercise(workout_plan_id=pair[0], exercise_id=pair[1], sets=sets, reps=reps))
+        WorkoutExercise.objects.bulk_create(rows)
+        if rows:
+            # bulk_create sends no signals, and existing plans may have gained exercises
+            invalidate_user(self.user.pk)
+        self.counts['created'] += len(rows)
+
+    def import_logs(self, chunk):
+        titles = [(row.get('plan') or '').strip() for _, row in chunk]
+        self.resolve_plans(title for title in titles if 0 < len(title) <= 100)
+
+        items = []
+        for (index, row), title in zip(chunk, titles):
+            if title not in self.plans:
+                self.error(index, 'plan must be 1-100 characters')
+                continue
+            item = {key: row[key] for key in ('date', 'duration', 'intensity', 'notes') if row.get(key) not in (None, '')}
+            item['workout_plan'] = self.plans[title]
+            item['client_key'] = row.get('client_key') or import_client_key(index, row)
+            items.append((index, item))
+
+        if self.ingest is None:
+            self.ingest = WorkoutLogIngest(self.user, chunk_size=self.chunk_size)
+        self.ingest.plan_ids.update(self.plans.values())
+        self.ingest.results = []
+        self.ingest.ingest_chunk(items)
+        for result in self.ingest.results:
+            if result['status'] == 'error':
+                self.error(result['index'], result['errors'])
+            else:
+                self.counts['created' if result['status'] == 'created' else 'duplicates'] += 1
@@ -0,0 +1,233 @@
+"""
+A database-backed job queue, so slow work runs outside the request cycle
+without an external broker.
+
+``enqueue`` adds a Job row; an identical job (same task, user and
+arguments) that is still pending absorbs the new one instead. Workers
+(``manage.py run_jobs``) claim the highest-priority due job with a
+conditional UPDATE, so any number of them can share the table: a job
+is only claimed by the worker whose UPDATE flips it from pending to
+running. A failing job is retried with exponential backoff until it has
+used up ``max_attempts``; a job whose worker died is requeued once it has
+been running for longer than JOB_TIMEOUT.
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import signal
+import socket
+import time
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_user
+from .export import export_rows, stream_csv, stream_ndjson
+from .load import rebuild_training_load
+from .models import Job
+from .records import rebuild_records
+from .stats import rebuild_stats
+
+logger = logging.getLogger(__name__)
+
+Task = namedtuple('Task', 'func priority max_attempts')
+
+TASKS = {}
+
+
+def task(name, priority=0, max_attempts=3):
+    """Register ``func(user_id, **args)`` as a task; it returns a JSON-serializable result"""
+    def register(func):
+        TASKS[name] = Task(func, priority, max_attempts)
+        return func
+    return register
+
+
+def dedup_key(name, user_id, args):
+    payload = json.dumps([name, user_id, args], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def enqueue(name, user=None, priority=None, **args):
+    """
+    Queue a task, or return the identical job that is already pending.
+    Returns (job, created). A higher ``priority`` is carried over to the
+    pending job.
+    """
+    spec = TASKS[name]
+    priority = spec.priority if priority is None else priority
+    user_id = getattr(user, 'pk', user)
+    key = dedup_key(name, user_id, args)
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                job = Job.objects.create(
+                    task=name, user_id=user_id, args=args, priority=priority,
+                    dedup_key=key, max_attempts=spec.max_attempts,
+                )
+            return job, True
+        except IntegrityError:
+            job = Job.objects.filter(dedup_key=key, status=Job.PENDING).first()
+            # otherwise a worker claimed it in the meantime, so a new job is needed after all
+            if job is not None:
+                if priority > job.priority:
+                    Job.objects.filter(pk=job.pk, status=Job.PENDING).update(priority=priority)
+                    job.priority = priority
+                return job, False
+    raise RuntimeError(f'Could not enqueue {name} for user {user_id}')
+
+
+def claim(worker, now=None):
+    """Mark the next due job as running for ``worker`` and return it, or None when there is none"""
+    now = now or timezone.now()
+    due = Job.objects.filter(status=Job.PENDING, run_after__lte=now).order_by('-priority', 'run_after', 'id')
+    # several candidates, so losing a race to another worker does not mean another round trip
+    for pk in due.values_list('pk', flat=True)[:10]:
+        claimed = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING, worker=worker, started_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def run_job(job):
+    """Run a claimed job and record its result, or schedule a retry, or mark it failed"""
+    spec = TASKS.get(job.task)
+    try:
+        if spec is None:
+            raise LookupError(f'Unknown task {job.task!r}')
+        result = spec.func(job.user_id, **job.args)
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %d', job.pk, job.task, job.attempts)
+        job.error = traceback.format_exc(limit=5)
+        if spec is not None and job.attempts < job.max_attempts:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+    else:
+        job.status, job.result, job.error = Job.DONE, result, ''
+        job.finished_at = timezone.now()
+    fields = ['status', 'result', 'error', 'run_after', 'finished_at']
+    if job.status != Job.PENDING:
+        job.save(update_fields=fields)
+        return job
+    try:
+        with transaction.atomic():
+            job.save(update_fields=fields)
+    except IntegrityError:
+        # an identical job was queued while this one ran, and covers the retry
+        job.status, job.finished_at = Job.FAILED, timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale(now=None):
+    """Give jobs whose worker disappeared mid-run back to the queue, or fail them when out of attempts"""
+    now = now or timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, started_at__lt=now - timedelta(seconds=settings.JOB_TIMEOUT))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, error='Timed out',
+    )
+    requeued = 0
+    for job in stale:
+        try:
+            with transaction.atomic():
+                requeued += Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(status=Job.PENDING, run_after=now)
+        except IntegrityError:
+            Job.objects.filter(pk=job.pk).update(status=Job.FAILED, finished_at=now, error='Timed out')
+            failed += 1
+    return requeued, failed
+
+
+def prune_jobs(now=None):
+    """Delete finished jobs, and the files they produced, after JOB_RETENTION_DAYS"""
+    cutoff = (now or timezone.now()) - timedelta(days=settings.JOB_RETENTION_DAYS)
+    old = Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff)
+    for result in old.filter(task='export_logs', status=Job.DONE).values_list('result', flat=True):
+        try:
+            os.remove(export_path(result['file']))
+        except (OSError, KeyError, TypeError):
+            pass
+    return old.delete()[0]
+
+
+class Worker:
+    """Claims and runs jobs one at a time until stopped (SIGINT/SIGTERM finish the current job first)"""
+
+    def __init__(self, name=None, sleep=1.0):
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.sleep = sleep
+        self.stopping = False
+        self.processed = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def run(self, burst=False, max_jobs=None):
+        """Work until stopped; with ``burst``, stop as soon as no job is due"""
+        requeue_stale()
+        prune_jobs()
+        while not self.stopping and (max_jobs is None or self.processed < max_jobs):
+            job = claim(self.name)
+            if job is None:
+                if burst:
+                    break
+                requeue_stale()
+                time.sleep(self.sleep)
+                continue
+            run_job(job)
+            self.processed += 1
+        return self.processed
+
+
+def export_path(filename):
+    return os.path.join(settings.JOB_EXPORT_DIR, filename)
+
+
+@task('recompute_stats', priority=10)
+def recompute_stats(user_id):
+    """Rebuild a user's stats row, training load and personal records from their logs and sets"""
+    rebuild_stats(user_id=user_id)
+    rebuild_training_load(user_id=user_id)
+    records = rebuild_records(user_id=user_id)
+    invalidate_user(user_id)
+    return {'records': records}
+
+
+@task('export_logs')
+def export_logs(user_id, format='csv'):
+    """Write a user's whole history to a file in JOB_EXPORT_DIR, streamed like the export endpoint"""
+    stream = stream_csv if format == 'csv' else stream_ndjson
+    os.makedirs(settings.JOB_EXPORT_DIR, exist_ok=True)
+    filename = f'workout-logs-{user_id}-{time.time_ns()}.{format}'
+    counter = itertools.count()
+    # zip() advances the counter once per row read, so it ends at the number of rows
+    rows = (row for row, _ in zip(export_rows(user_id), counter))
+    with open(export_path(filename), 'w', encoding='utf-8', newline='') as f:
+        for chunk in stream(rows):
+            f.write(chunk)
+    return {'file': filename, 'format': format, 'rows': next(counter)}
+
+
+@task('ping', priority=-10)
+def ping(user_id, **args):
+    """Does nothing; for checking that a worker is running, and for benchmarks"""
+    return args
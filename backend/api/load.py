@@ -0,0 +1,187 @@
+"""
+Rolling training load per athlete: the acute (7-day) and chronic (28-day)
+average daily load and their ratio, the acute:chronic workload ratio.
+
+A log's load is its duration times its intensity (session RPE). Every
+user's TrainingLoad row holds the load of each day since their first
+logged day as one packed array of doubles. Log writes add their load to
+their day, or take it away, next to the stats updates, so reading a
+series costs one row per athlete however long their history is. Any
+window is then a single prefix-sum pass over the days it covers. Arrays
+only cover the days of ``log_date_window``; older days are dropped as
+they leave it.
+"""
+import sys
+from array import array
+from datetime import date, timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .cache import get_many_per_user
+from .models import TrainingLoad, WorkoutLog
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+
+
+def unpack(data):
+    loads = array('d')
+    loads.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        loads.byteswap()
+    return loads
+
+
+def pack(loads):
+    """The little-endian bytes of an array('d'), so stored rows do not depend on the host"""
+    if sys.byteorder == 'big':
+        loads = array('d', loads)
+        loads.byteswap()
+    return loads.tobytes()
+
+
+def zeros(days):
+    return array('d', [0.0]) * days
+
+
+def log_date_window():
+    """The first and last day a log may be dated, which are also the days the load arrays cover"""
+    today = timezone.localdate()
+    return today - timedelta(days=settings.WORKOUT_LOG_MAX_AGE_DAYS), today + timedelta(days=1)
+
+
+def apply_load_batch(user_id, entries, sign=1, create=True):
+    """Add (sign=1) or remove (sign=-1) a batch of (date, duration, intensity) log entries from a user's loads"""
+    first, last = log_date_window()
+    deltas = {}
+    for day, duration, intensity in entries:
+        day = date.fromisoformat(str(day))
+        if first <= day <= last:
+            deltas[day] = deltas.get(day, 0) + sign * (duration or 0) * (intensity or 0)
+    deltas = {day: load for day, load in deltas.items() if load}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        row = TrainingLoad.objects.select_for_update().filter(user_id=user_id).first()
+        if row is None:
+            if not create:
+                return
+            row = TrainingLoad(user_id=user_id, start=min(deltas))
+        loads = unpack(row.loads)
+        # days age out of the window, and rows written before it was enforced may reach past its end
+        if row.start < first:
+            del loads[:(first - row.start).days]
+            row.start = first
+        del loads[(last - row.start).days + 1:]
+        if min(deltas) < row.start:
+            loads[:0] = zeros((row.start - min(deltas)).days)
+            row.start = min(deltas)
+        end = (max(deltas) - row.start).days + 1
+        if end > len(loads):
+            loads.extend(zeros(end - len(loads)))
+        for day, load in deltas.items():
+            index = (day - row.start).days
+            loads[index] = max(loads[index] + load, 0.0)
+        row.loads = pack(loads)
+        row.save(force_insert=row._state.adding)
+
+
+def compute_training_load(**filters):
+    """Build unsaved TrainingLoad rows for every user (matching ``filters``) with one grouped query over the logs"""
+    days = (
+        WorkoutLog.objects.filter(date__range=log_date_window(), **filters)
+        .values_list('user', 'date')
+        .annotate(load=Sum(F('duration') * F('intensity')))
+        .order_by('user', 'date')
+    )
+    arrays = {}
+    for user_id, day, load in days.iterator(chunk_size=10000):
+        start, loads = arrays.setdefault(user_id, (day, array('d')))
+        gap = (day - start).days - len(loads)
+        if gap:
+            loads.extend(zeros(gap))
+        loads.append(load or 0)
+    return {
+        user_id: TrainingLoad(user_id=user_id, start=start, loads=pack(loads))
+        for user_id, (start, loads) in arrays.items()
+    }
+
+
+def rebuild_training_load(**filters):
+    """Replace the whole training load table, or the rows of the users matching ``filters``, from the logs"""
+    live = compute_training_load(**filters)
+    with transaction.atomic():
+        TrainingLoad.objects.filter(**filters).delete()
+        TrainingLoad.objects.bulk_create(live.values(), batch_size=500)
+    return len(live)
+
+
+def trimmed(row, since):
+    """
+    (first day, loads) from ``since`` on, without leading and trailing days of
+    no load, which removed logs can leave behind
+    """
+    if row is None:
+        return None
+    loads, start = list(unpack(row.loads)), row.start
+    if start < since:
+        loads, start = loads[(since - start).days:], since
+    first = next((i for i, load in enumerate(loads) if load), len(loads))
+    last = len(loads) - next((i for i, load in enumerate(reversed(loads)) if load), len(loads))
+    return (start + timedelta(days=first), loads[first:last]) if first < last else None
+
+
+def find_stale_training_load():
+    """Return the ids of users whose stored daily loads disagree with their logs"""
+    live = compute_training_load()
+    stored = TrainingLoad.objects.in_bulk()
+    # rows not written since days left the window still hold them
+    since, _ = log_date_window()
+    return [
+        user_id for user_id in sorted(live.keys() | stored.keys())
+        if trimmed(live.get(user_id), since) != trimmed(stored.get(user_id), since)
+    ]
+
+
+def rolling_series(row, start, end):
+    """Load, acute and chronic average daily load and their ratio for every day from ``start`` to ``end``"""
+    days = (end - start).days + 1
+    # each day needs the CHRONIC_DAYS - 1 days before it
+    window_start = start - timedelta(days=CHRONIC_DAYS - 1)
+    window = [0.0] * (days + CHRONIC_DAYS - 1)
+    if row is not None:
+        loads = unpack(row.loads)
+        offset = (row.start - window_start).days
+        first, last = max(0, -offset), min(len(loads), len(window) - offset)
+        if first < last:
+            window[offset + first:offset + last] = loads[first:last]
+
+    totals = list(accumulate(window, initial=0.0))
+    series = []
+    for i in range(days):
+        # totals[end_index] is the sum of the window up to and including day i
+        end_index = i + CHRONIC_DAYS
+        acute = (totals[end_index] - totals[end_index - ACUTE_DAYS]) / ACUTE_DAYS
+        chronic = (totals[end_index] - totals[end_index - CHRONIC_DAYS]) / CHRONIC_DAYS
+        series.append({
+            'date': start + timedelta(days=i),
+            'load': window[end_index - 1],
+            'acute': round(acute, 2),
+            'chronic': round(chronic, 2),
+            'ratio': round(acute / chronic, 2) if chronic else None,
+        })
+    return series
+
+
+def training_load_series(user_ids, start, end):
+    """``{user_id: rolling_series}`` for many athletes, cached per athlete; uncached ones cost one query"""
+    def build(missing):
+        rows = TrainingLoad.objects.in_bulk(missing)
+        return {user_id: rolling_series(rows.get(user_id), start, end) for user_id in missing}
+
+    return get_many_per_user(f'training-load:{start}:{end}', user_ids, build)
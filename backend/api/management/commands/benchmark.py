@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from api.benchmarks import SCENARIOS, compare_results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Run benchmark scenarios against a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help=f'Scenarios to run (default: all of {", ".join(SCENARIOS)})')
+        parser.add_argument('--size', type=int, default=1000, help='Number of rows each scenario works with')
+        parser.add_argument('--output', help='Write the results, with the git revision and size, to this JSON file')
+        parser.add_argument('--compare', help='JSON file of an earlier --output run; fail on regressions against it')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Relative change of a timing or memory metric that counts as a regression (default: 0.2)',
+        )
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(SCENARIOS)
+        unknown = [name for name in names if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f'Unknown scenario(s): {", ".join(unknown)}')
+
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read {options["compare"]}: {exc}')
+            if baseline.get('size') != options['size']:
+                self.stderr.write(f'Baseline was run with --size {baseline.get("size")}, not {options["size"]}')
+
+        setup_test_environment()
+        report = {'revision': git_revision(), 'created': timezone.now().isoformat(), 'size': options['size'], 'results': {}}
+        with tempfile.TemporaryDirectory() as tmpdir:
+            if connection.vendor == 'sqlite':
+                # a real file rather than the in-memory test database, so locking and I/O are measured too
+                connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmpdir, 'benchmark.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                for name in names:
+                    results = SCENARIOS[name](size=options['size'])
+                    report['results'][name] = results
+                    self.stdout.write(f'{name}: {json.dumps(results)}')
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+                f.write('\n')
+
+        if baseline is not None:
+            changes = compare_results(baseline.get('results', {}), report['results'], options['tolerance'])
+            for path, old, new, regressed in changes:
+                label = self.style.ERROR('regressed') if regressed else self.style.SUCCESS('improved')
+                self.stdout.write(f'{path}: {old} -> {new} {label}')
+            regressions = sum(regressed for *_, regressed in changes)
+            if regressions:
+                raise CommandError(f'{regressions} regression(s) against {baseline.get("revision") or options["compare"]}')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {baseline.get("revision") or options["compare"]}'))
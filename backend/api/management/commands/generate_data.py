@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = (
+        'Create synthetic users with plans and a realistic, heavy-tailed workout history, '
+        'for benchmarks and local testing'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Number of users to create')
+        parser.add_argument('--days', type=int, default=365, help='Longest history a user gets, in days')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed generates the same data')
+        parser.add_argument('--prefix', default='athlete', help='Usernames are <prefix>-<n>')
+        parser.add_argument('--password', default='fittrack-pass', help='Password of every generated user')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['days'] < 1:
+            raise CommandError('--users and --days must be positive')
+        if get_user_model().objects.filter(username__startswith=f'{options["prefix"]}-').exists():
+            raise CommandError(f'Users named {options["prefix"]}-<n> already exist; pick another --prefix')
+
+        counts = generate(
+            users=options['users'], days=options['days'], seed=options['seed'],
+            prefix=options['prefix'], password=options['password'],
+        )
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{count} {name.replace("_", " ")}' for name, count in counts.items())))
@@ -0,0 +1,91 @@
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import IMPORT_KINDS, WorkoutImport, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Import exercises, plans (one row per plan exercise) or workout logs from a CSV or '
+        'JSON/NDJSON file, in chunked transactions that can be resumed after an interruption'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import, or - for standard input')
+        parser.add_argument('--kind', choices=IMPORT_KINDS, required=True, help=(
+            'exercises: name, description; plans: plan, exercise, sets, reps; '
+            'logs: plan, date, duration, intensity, notes, client_key'
+        ))
+        parser.add_argument('--user', help='Username that owns imported plans and logs')
+        parser.add_argument('--format', choices=('csv', 'json'), help='Input format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per transaction')
+        parser.add_argument('--resume', action='store_true', help='Skip the rows a previous run already committed')
+        parser.add_argument('--state', help='Checkpoint file (default: PATH.import-state)')
+
+    def handle(self, *args, **options):
+        kind, path = options['kind'], options['path']
+        user = None
+        if kind != 'exercises':
+            if not options['user']:
+                raise CommandError(f'--user is required to import {kind}')
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user named {options["user"]!r}')
+
+        file_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'json')
+        state_path = options['state'] or (None if path == '-' else f'{path}.import-state')
+        start = 0
+        if options['resume']:
+            if state_path is None:
+                raise CommandError('--resume needs --state when reading standard input')
+            start = self.read_state(state_path, kind)
+
+        importer = WorkoutImport(user=user, chunk_size=options['chunk_size'])
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        began = time.perf_counter()
+        try:
+            rows = islice(enumerate(read_rows(stream, file_format)), start, None)
+            for last_index in importer.run(kind, rows):
+                for index, message in importer.errors:
+                    self.stderr.write(f'row {index + 1}: {message}')
+                importer.errors.clear()
+                if state_path:
+                    self.write_state(state_path, kind, last_index + 1)
+        except (ValueError, csv.Error) as exc:
+            raise CommandError(f'{path}: {exc} (committed rows can be skipped with --resume)')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.perf_counter() - began
+
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+        counts = importer.counts
+        rate = counts['rows'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {counts["rows"]} {kind} row(s) in {elapsed:.2f}s ({rate:.0f} rows/s): '
+            f'{counts["created"]} created, {counts["duplicates"]} already present, {counts["errors"]} error(s)'
+        ))
+
+    def read_state(self, state_path, kind):
+        try:
+            with open(state_path) as state_file:
+                state = json.load(state_file)
+        except FileNotFoundError:
+            return 0
+        if state.get('kind') != kind:
+            raise CommandError(f'{state_path} belongs to a {state.get("kind")} import')
+        return state['rows']
+
+    def write_state(self, state_path, kind, rows):
+        with open(f'{state_path}.tmp', 'w') as state_file:
+            json.dump({'kind': kind, 'rows': rows}, state_file)
+        os.replace(f'{state_path}.tmp', state_path)
@@ -0,0 +1,98 @@
+import json
+import statistics
+import threading
+import time
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test a running server with concurrent keep-alive clients and report latency '
+        'percentiles and requests per second, e.g. to compare a WSGI and an ASGI (uvicorn) deployment'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Paths to request, e.g. /api/stats/ /api/async/stats/')
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the server under test')
+        parser.add_argument('--concurrency', type=int, default=32, help='Number of concurrent clients')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per path')
+        parser.add_argument('--warmup', type=int, default=100, help='Unmeasured requests per path')
+        parser.add_argument('--label', default='', help='Tag added to every result, e.g. wsgi or uvicorn')
+        auth = parser.add_mutually_exclusive_group(required=True)
+        auth.add_argument('--user', help='Username to mint an access token for (needs this database)')
+        auth.add_argument('--token', help='Access token to send')
+
+    def handle(self, *args, **options):
+        token = options['token']
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user named {options["user"]!r}')
+            token = str(AccessToken.for_user(user))
+
+        url = urlsplit(options['url'])
+        if url.scheme not in ('http', 'https'):
+            raise CommandError('--url must be an http(s) URL')
+        connect = HTTPSConnection if url.scheme == 'https' else HTTPConnection
+        headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/json'}
+
+        for path in options['paths']:
+            target = url.path.rstrip('/') + path
+            self.run(connect, url.netloc, target, headers, options['concurrency'], options['warmup'])
+            results = self.run(connect, url.netloc, target, headers, options['concurrency'], options['requests'])
+            self.stdout.write(json.dumps({'label': options['label'], 'path': path, **results}))
+
+    def run(self, connect, netloc, path, headers, concurrency, total):
+        """Issue ``total`` GETs from ``concurrency`` threads, each on its own keep-alive connection"""
+        latencies, errors = [], []
+        remaining = iter(range(total))
+        lock = threading.Lock()
+
+        def client():
+            connection = connect(netloc, timeout=30)
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        break
+                start = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except OSError:
+                    connection.close()
+                    connection = connect(netloc, timeout=30)
+                    ok = False
+                elapsed = time.perf_counter() - start
+                with lock:
+                    (latencies if ok else errors).append(elapsed)
+            connection.close()
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        if not latencies:
+            return {'requests': total, 'errors': len(errors)}
+        return {
+            'requests': total,
+            'errors': len(errors),
+            'concurrency': concurrency,
+            'rps': round(total / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'max_ms': round(max(latencies) * 1000, 2),
+        }
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Delete sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        count = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} tombstone(s)'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.records import find_stale_records, rebuild_records
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the personal records table from the logged sets, or check it against them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Compare the stored records with ones recomputed from the sets without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            mismatches = find_stale_records()
+            for user_id, exercise_id, stored, live in mismatches:
+                self.stderr.write(f'user {user_id}, exercise {exercise_id}: stored {stored} != live {live}')
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} stale personal record(s) found')
+            self.stdout.write(self.style.SUCCESS('Personal records match the logged sets'))
+            return
+
+        count = rebuild_records()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} personal record(s)'))
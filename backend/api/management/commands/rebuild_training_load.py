@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.load import find_stale_training_load, rebuild_training_load
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-user daily training load arrays from the logs, or check them against the logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Compare the stored daily loads with the logs without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            stale = find_stale_training_load()
+            for user_id in stale:
+                self.stderr.write(f'user {user_id}: stored daily loads differ from the logs')
+            if stale:
+                raise CommandError(f'{len(stale)} stale training load row(s) found')
+            self.stdout.write(self.style.SUCCESS('Training load matches the logs'))
+            return
+
+        count = rebuild_training_load()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt training load for {count} user(s)'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.stats import find_stale_stats, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized per-user workout stats table, or check it against the live aggregates'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Compare the stored stats with the live aggregates without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            mismatches = find_stale_stats()
+            for user_id, stored, live in mismatches:
+                self.stderr.write(f'user {user_id}: stored {stored} != live {live}')
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} stale stats row(s) found')
+            self.stdout.write(self.style.SUCCESS('Workout stats match the live aggregates'))
+            return
+
+        count = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt workout stats for {count} user(s)'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background jobs (stats recomputation, history exports) until stopped; '
+        'start as many workers as needed, they share the queue'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due instead of waiting for more')
+        parser.add_argument('--max-jobs', type=int, help='Exit after running this many jobs')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait between polls of an empty queue')
+        parser.add_argument('--name', help='Worker name recorded on its jobs (default: host:pid)')
+
+    def handle(self, *args, **options):
+        worker = Worker(name=options['name'], sleep=options['sleep'])
+        worker.install_signal_handlers()
+        processed = worker.run(burst=options['burst'], max_jobs=options['max_jobs'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s)'))
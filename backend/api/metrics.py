@@ -0,0 +1,297 @@
+"""
+Request instrumentation: per-view latency histograms, database query
+counts and time, and time spent serializing, for every request.
+
+``MetricsMiddleware`` measures each request, sync or async, adds a
+``Server-Timing`` header and logs the SQL of requests that run more than
+METRICS_QUERY_LOG_THRESHOLD queries. Serialization is the time spent in
+the ``to_representation`` of serializers built on ``TimedSerializerMixin``
+and of ``ValuesRepresentation``. The totals live in ``registry``, in this
+process only: each worker of a multi-process server reports its own, so
+scrape the workers separately or sum the series in Prometheus.
+"""
+import bisect
+import contextvars
+import functools
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from rest_framework.permissions import BasePermission
+
+from accounts.throttling import throttle_stats
+
+logger = logging.getLogger(__name__)
+
+# methods outside this set are counted as OTHER, so clients cannot add label series at will
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+
+# Prometheus' default latency buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus exposes one"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+class RequestMetrics:
+    """What one request spent on queries and serialization"""
+
+    def __init__(self, keep_statements=False):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        # the SQL is only kept when it may be logged
+        self.statements = [] if keep_statements else None
+        self._serializer_depth = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_seconds += time.perf_counter() - start
+            self.queries += 1
+            if self.statements is not None:
+                self.statements.append(sql)
+
+    def server_timing(self, total_seconds):
+        return ', '.join((
+            f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serializer_seconds * 1000:.1f}',
+            f'total;dur={total_seconds * 1000:.1f}',
+        ))
+
+
+# the request being measured; sync_to_async copies it into the thread running a sync view
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection, counting the query against the request being measured"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics.record_query(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    """
+    Wrap ``connection``'s queries with ``record_query``. Connections belong to
+    the thread that opened them, which under ASGI is not the event loop the
+    middleware runs in, so every connection is wrapped when it is created.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class ViewMetrics:
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.responses = defaultdict(int)
+
+
+class MetricsRegistry:
+    """Thread-safe totals per (view name, method), rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(ViewMetrics)
+
+    def record(self, view, method, status, seconds, request_metrics):
+        with self._lock:
+            metrics = self._views[view, method]
+            metrics.latency.observe(seconds)
+            metrics.queries += request_metrics.queries
+            metrics.query_seconds += request_metrics.query_seconds
+            metrics.serializer_seconds += request_metrics.serializer_seconds
+            metrics.responses[status] += 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = [
+                '# HELP fittrack_http_request_duration_seconds Request latency by view.',
+                '# TYPE fittrack_http_request_duration_seconds histogram',
+            ]
+            for (view, method), metrics in views:
+                labels = f'view="{_escape(view)}",method="{method}"'
+                for bound, count in metrics.latency.cumulative():
+                    lines.append(f'fittrack_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'fittrack_http_request_duration_seconds_sum{{{labels}}} {metrics.latency.sum}')
+                lines.append(f'fittrack_http_request_duration_seconds_count{{{labels}}} {metrics.latency.count}')
+
+            lines += [
+                '# HELP fittrack_http_responses_total Responses by view and status code.',
+                '# TYPE fittrack_http_responses_total counter',
+            ]
+            for (view, method), metrics in views:
+                for status, count in sorted(metrics.responses.items()):
+                    lines.append(
+                        f'fittrack_http_responses_total{{view="{_escape(view)}",method="{method}",status="{status}"}} {count}'
+                    )
+
+            for name, attribute, help_text in (
+                ('fittrack_db_queries_total', 'queries', 'Database queries run by requests, by view.'),
+                ('fittrack_db_query_duration_seconds_total', 'query_seconds', 'Time spent in database queries, by view.'),
+                ('fittrack_serializer_duration_seconds_total', 'serializer_seconds', 'Time spent serializing, by view.'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for (view, method), metrics in views:
+                    lines.append(f'{name}{{view="{_escape(view)}",method="{method}"}} {getattr(metrics, attribute)}')
+
+        lines += [
+            '# HELP fittrack_throttle_decisions_total Requests allowed or refused by the token-bucket throttles, by scope.',
+            '# TYPE fittrack_throttle_decisions_total counter',
+        ]
+        for (scope, decision), count in sorted(throttle_stats().items()):
+            lines.append(f'fittrack_throttle_decisions_total{{scope="{scope}",decision="{decision}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+@contextmanager
+def serializer_timer():
+    """Count the enclosed time as serialization; nested timers only count once"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics._serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._serializer_depth -= 1
+        if not metrics._serializer_depth:
+            metrics.serializer_seconds += time.perf_counter() - start
+
+
+def timed_serialization(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _current.get() is None:
+            return func(*args, **kwargs)
+        with serializer_timer():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+class TimedSerializerMixin:
+    """Count a serializer's ``to_representation`` as serialization; nested serializers run inside their parent's"""
+
+    @timed_serialization
+    def to_representation(self, instance):
+        return super().to_representation(instance)
+
+
+class MetricsMiddleware:
+    """
+    Measure every request: latency, queries (on all database aliases) and
+    serializer time. Queries of a streamed response body run after the
+    middleware returns and are not counted. Under ASGI it runs in the event
+    loop, so async views are reached without a thread hop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        metrics = RequestMetrics(keep_statements=bool(settings.METRICS_QUERY_LOG_THRESHOLD))
+        start = time.perf_counter()
+        with self.measure(metrics):
+            response = self.get_response(request)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        metrics = RequestMetrics(keep_statements=bool(settings.METRICS_QUERY_LOG_THRESHOLD))
+        start = time.perf_counter()
+        with self.measure(metrics):
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics, time.perf_counter() - start)
+
+    @staticmethod
+    @contextmanager
+    def measure(metrics):
+        # queries are counted by record_query, on whichever thread runs them
+        token = _current.set(metrics)
+        try:
+            yield
+        finally:
+            _current.reset(token)
+
+    @staticmethod
+    def finish(request, response, metrics, seconds):
+        match = request.resolver_match
+        # unresolved paths share one label, so scanners cannot grow the series without bound
+        view = match.view_name if match is not None else 'unmatched'
+        method = request.method if request.method in METHODS else 'OTHER'
+        registry.record(view, method, response.status_code, seconds, metrics)
+        response['Server-Timing'] = metrics.server_timing(seconds)
+
+        threshold = settings.METRICS_QUERY_LOG_THRESHOLD
+        if threshold and metrics.queries > threshold:
+            logger.warning(
+                '%s %s ran %d queries (threshold %d):\n%s',
+                request.method, request.get_full_path(), metrics.queries, threshold, '\n'.join(metrics.statements),
+            )
+        return response
+
+
+class HasMetricsToken(BasePermission):
+    """Scrapers authenticate with ``Authorization: Bearer <METRICS_TOKEN>``; no token configured means no access"""
+
+    def has_permission(self, request, view):
+        token = settings.METRICS_TOKEN
+        supplied = request.META.get('HTTP_AUTHORIZATION', '')
+        return bool(token) and hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode())
+
@@ -0,0 +1,54 @@
+# Generated by Django 5.0 on 2026-10-18 20:09
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+def backfill_stats(apps, schema_editor):
+    WorkoutLog = apps.get_model('api', 'WorkoutLog')
+    WorkoutPlan = apps.get_model('api', 'WorkoutPlan')
+    WorkoutStats = apps.get_model('api', 'WorkoutStats')
+
+    rows = {}
+    for row in WorkoutLog.objects.values('user').annotate(count=Count('id'), duration=Sum('duration')).order_by():
+        rows[row['user']] = WorkoutStats(user_id=row['user'], total_workouts=row['count'], total_duration=row['duration'] or 0)
+    for row in WorkoutPlan.objects.values('user').annotate(count=Count('id')).order_by():
+        rows.setdefault(row['user'], WorkoutStats(user_id=row['user'])).total_plans = row['count']
+    week_start = timezone.now().date() - timedelta(days=7)
+    recent = WorkoutLog.objects.filter(date__gte=week_start).values('user', 'date').annotate(count=Count('id')).order_by()
+    for row in recent:
+        rows[row['user']].recent_days[row['date'].isoformat()] = row['count']
+    WorkoutStats.objects.bulk_create(rows.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkoutStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workout_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_workouts', models.PositiveIntegerField(default=0)),
+                ('total_plans', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.PositiveBigIntegerField(default=0)),
+                ('recent_days', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='workoutlog',
+            name='duration',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0 on 2026-10-18 20:11
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_workout_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutlog',
+            name='client_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='workoutlog',
+            name='date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.AddConstraint(
+            model_name='workoutlog',
+            constraint=models.UniqueConstraint(fields=('user', 'client_key'), name='unique_workout_log_client_key'),
+        ),
+    ]
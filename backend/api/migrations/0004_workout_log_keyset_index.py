@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 20:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_workout_log_client_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='workoutlog',
+            index=models.Index(fields=['user', 'date', 'id'], name='workoutlog_user_date_id'),
+        ),
+    ]
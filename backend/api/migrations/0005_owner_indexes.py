@@ -0,0 +1,38 @@
+# Generated by Django 5.0 on 2026-10-18 20:16
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_exercises(apps, schema_editor):
+    """Point plans at the oldest exercise of each name and drop the copies, so the unique index can be built"""
+    Exercise = apps.get_model('api', 'Exercise')
+    WorkoutExercise = apps.get_model('api', 'WorkoutExercise')
+
+    duplicates = Exercise.objects.values('name').annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+    for row in duplicates:
+        copies = Exercise.objects.filter(name=row['name']).exclude(pk=row['keep'])
+        WorkoutExercise.objects.filter(exercise__in=copies).update(exercise_id=row['keep'])
+        copies.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_workout_log_keyset_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_exercises, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='exercise',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='workoutplan',
+            index=models.Index(fields=['user', 'title'], name='workoutplan_user_title'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# A full-text index over api_exercise.name, kept in sync by triggers so that
+# bulk_create, queryset updates and raw SQL are covered as well as save().
+# SQLite only (FTS5); api.search falls back to plain lookups elsewhere.
+TABLE = 'api_exercise_fts'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    # words, accents folded, with prefix indexes for 2- and 3-character prefixes
+    schema_editor.execute(f"""
+        CREATE VIRTUAL TABLE {TABLE} USING fts5(
+            name, content = 'api_exercise', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+    """)
+    # the distinct indexed words, for correcting misspelled query words
+    schema_editor.execute(f'CREATE VIRTUAL TABLE {TABLE}_vocab USING fts5vocab({TABLE}, row)')
+    schema_editor.execute(f"""
+        CREATE TRIGGER {TABLE}_insert AFTER INSERT ON api_exercise BEGIN
+            INSERT INTO {TABLE} (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    schema_editor.execute(f"""
+        CREATE TRIGGER {TABLE}_delete AFTER DELETE ON api_exercise BEGIN
+            INSERT INTO {TABLE} ({TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+        END
+    """)
+    schema_editor.execute(f"""
+        CREATE TRIGGER {TABLE}_update AFTER UPDATE OF name ON api_exercise BEGIN
+            INSERT INTO {TABLE} ({TABLE}, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO {TABLE} (rowid, name) VALUES (new.id, new.name);
+        END
+    """)
+    schema_editor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('rebuild')")
+    # SQLite's LIKE is case-insensitive, so only a NOCASE index turns a name prefix into a range scan
+    schema_editor.execute('CREATE INDEX api_exercise_name_nocase ON api_exercise (name COLLATE NOCASE)')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for event in ('insert', 'delete', 'update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {TABLE}_{event}')
+    schema_editor.execute('DROP INDEX IF EXISTS api_exercise_name_nocase')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}_vocab')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_owner_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
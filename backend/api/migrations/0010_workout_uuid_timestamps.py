@@ -0,0 +1,68 @@
+# Generated by Django 5.0 on 2026-10-18 23:12
+
+import uuid
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_keys(apps, schema_editor):
+    # existing rows get a UUID each, and their last change as the best known creation time
+    for name in ('WorkoutPlan', 'WorkoutLog'):
+        model = apps.get_model('api', name)
+        rows = list(model.objects.only('id', 'updated_at'))
+        for row in rows:
+            row.uuid = uuid.uuid4()
+            row.created_at = row.updated_at
+        model.objects.bulk_update(rows, ['uuid', 'created_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutlog',
+            name='uuid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='workoutlog',
+            name='created_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='workoutplan',
+            name='uuid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='workoutplan',
+            name='created_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='workoutlog',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='workoutlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='workoutplan',
+            name='uuid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='workoutplan',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
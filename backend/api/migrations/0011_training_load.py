@@ -0,0 +1,73 @@
+# Generated by Django 5.0 on 2026-10-18 21:27
+
+import sys
+from array import array
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_training_load(apps, schema_editor):
+    # every existing log counts at the default intensity of 5
+    WorkoutLog = apps.get_model('api', 'WorkoutLog')
+    TrainingLoad = apps.get_model('api', 'TrainingLoad')
+
+    arrays = {}
+    days = (
+        WorkoutLog.objects.values_list('user', 'date')
+        .annotate(load=Sum(F('duration') * F('intensity')))
+        .order_by('user', 'date')
+    )
+    for user_id, day, load in days.iterator(chunk_size=10000):
+        start, loads = arrays.setdefault(user_id, (day, array('d')))
+        loads.extend(array('d', [0.0]) * ((day - start).days - len(loads)))
+        loads.append(load or 0)
+    rows = []
+    for user_id, (start, loads) in arrays.items():
+        if sys.byteorder == 'big':
+            loads.byteswap()
+        rows.append(TrainingLoad(user_id=user_id, start=start, loads=loads.tobytes()))
+    TrainingLoad.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_workout_uuid_timestamps'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingLoad',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='training_load', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('start', models.DateField()),
+                ('loads', models.BinaryField(default=bytes)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='workoutlog',
+            name='intensity',
+            field=models.PositiveSmallIntegerField(default=5, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10)]),
+        ),
+        migrations.CreateModel(
+            name='Coaching',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coaches', to=settings.AUTH_USER_MODEL)),
+                ('coach', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coached_athletes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='coaching',
+            constraint=models.UniqueConstraint(fields=('coach', 'athlete'), name='unique_coaching'),
+        ),
+        migrations.RunPython(backfill_training_load, migrations.RunPython.noop),
+    ]
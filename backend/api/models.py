@@ -1,10 +1,14 @@
+import uuid
+from datetime import timedelta
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
 class Exercise(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
 
     def __str__(self):
@@ -15,6 +19,17 @@ class WorkoutPlan(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True)
     exercises = models.ManyToManyField(Exercise, through='WorkoutExercise')
+    # the public key of the plan for clients that address rows by UUID; joins and keysets use id
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'title'], name='workoutplan_user_title'),
+            # backs the (updated_at, id) keyset of delta sync
+            models.Index(fields=['user', 'updated_at', 'id'], name='workoutplan_user_updated'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
@@ -24,6 +39,7 @@ class WorkoutExercise(models.Model):
     exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
     sets = models.IntegerField(default=3)
     reps = models.IntegerField(default=10)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.exercise.name} ({self.sets}x{self.reps})"
@@ -31,8 +47,197 @@ class WorkoutExercise(models.Model):
 class WorkoutLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_workout_logs')
     workout_plan = models.ForeignKey(WorkoutPlan, on_delete=models.CASCADE)
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=timezone.localdate)
+    duration = models.PositiveIntegerField(default=0)
+    # session RPE: how hard the whole workout felt, from 1 (very easy) to 10 (maximal)
+    intensity = models.PositiveSmallIntegerField(default=5, validators=[MinValueValidator(1), MaxValueValidator(10)])
     notes = models.TextField(blank=True)
+    # idempotency key supplied by syncing clients, unique per user
+    client_key = models.CharField(max_length=64, null=True, blank=True)
+    uuid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_key'], name='unique_workout_log_client_key'),
+        ]
+        indexes = [
+            # backs the (date, id) keyset pagination of a user's history
+            models.Index(fields=['user', 'date', 'id'], name='workoutlog_user_date_id'),
+            # backs the (updated_at, id) keyset of delta sync
+            models.Index(fields=['user', 'updated_at', 'id'], name='workoutlog_user_updated'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.workout_plan.title} on {self.date}"
+
+class WorkoutSet(models.Model):
+    """One performed set of an exercise within a workout log"""
+    log = models.ForeignKey(WorkoutLog, on_delete=models.CASCADE, related_name='sets')
+    # copied from the log, so a user's sets of one exercise are a single index range
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_workout_sets')
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    reps = models.PositiveIntegerField()
+    weight = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'exercise'], name='workoutset_user_exercise'),
+        ]
+
+    def __str__(self):
+        return f"{self.exercise_id}: {self.reps} x {self.weight}"
+
+class PersonalRecord(models.Model):
+    """A user's best performances of one exercise, kept up to date by api.records"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='personal_records')
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    max_weight = models.FloatField(default=0)
+    estimated_1rm = models.FloatField(default=0)
+    # the most weight x reps moved in the exercise within a single workout log
+    best_volume = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'exercise'], name='unique_personal_record'),
+        ]
+
+    def __str__(self):
+        return f"Records of user {self.user_id} for exercise {self.exercise_id}"
+
+class Tombstone(models.Model):
+    """Records a deleted plan, plan exercise or log so syncing clients can drop their copy"""
+    PLAN = 'plan'
+    PLAN_EXERCISE = 'plan_exercise'
+    LOG = 'log'
+    KINDS = [(PLAN, 'Workout plan'), (PLAN_EXERCISE, 'Plan exercise'), (LOG, 'Workout log')]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tombstones')
+    kind = models.CharField(max_length=16, choices=KINDS)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'], name='tombstone_user_deleted'),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.kind} {self.object_id}"
+
+    @classmethod
+    def record(cls, user_id, kind, ids):
+        """Leave tombstones for deleted rows of one kind"""
+        now = timezone.now()
+        cls.objects.bulk_create([cls(user_id=user_id, kind=kind, object_id=pk, deleted_at=now) for pk in ids])
+
+class WorkoutStats(models.Model):
+    """Per-user workout totals, kept up to date by the signals in api.signals"""
+    WEEK_DAYS = 7
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='workout_stats')
+    total_workouts = models.PositiveIntegerField(default=0)
+    total_plans = models.PositiveIntegerField(default=0)
+    total_duration = models.PositiveBigIntegerField(default=0)
+    # workout counts keyed by ISO date, pruned to the trailing week window
+    recent_days = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for user {self.user_id}"
+
+    @classmethod
+    def week_start(cls, today):
+        return today - timedelta(days=cls.WEEK_DAYS)
+
+    def weekly_workouts(self, today):
+        start = self.week_start(today).isoformat()
+        return sum(count for day, count in self.recent_days.items() if day >= start)
+
+    def as_dict(self, today):
+        average = self.total_duration / self.total_workouts if self.total_workouts else 0
+        return {
+            'total_workouts': self.total_workouts,
+            'total_plans': self.total_plans,
+            'weekly_workouts': self.weekly_workouts(today),
+            'average_duration': round(average, 2),
+            'total_duration': self.total_duration,
+        }
+
+class TrainingLoad(models.Model):
+    """A user's daily training load (duration x intensity of their logs), kept up to date by api.load"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='training_load')
+    # the day of loads[0]; the array runs to the last day with a log
+    start = models.DateField()
+    # one little-endian float64 per day, see api.load.pack
+    loads = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Training load of user {self.user_id}"
+
+class Coaching(models.Model):
+    """Lets ``coach`` read the training data of ``athlete``"""
+    coach = models.ForeignKey(User, on_delete=models.CASCADE, related_name='coached_athletes')
+    athlete = models.ForeignKey(User, on_delete=models.CASCADE, related_name='coaches')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['coach', 'athlete'], name='unique_coaching'),
+        ]
+
+    def __str__(self):
+        return f"{self.coach_id} coaches {self.athlete_id}"
+
+    @classmethod
+    def forbidden_athletes(cls, user, athlete_ids):
+        """The ids of ``athlete_ids`` that ``user`` may not read: not themselves and not coached by them"""
+        others = set(athlete_ids) - {user.pk}
+        if not others:
+            return set()
+        return others - set(cls.objects.filter(coach=user, athlete__in=others).values_list('athlete_id', flat=True))
+
+class Job(models.Model):
+    """A unit of background work, queued by api.jobs.enqueue and run by ``manage.py run_jobs``"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    task = models.CharField(max_length=64)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='api_jobs')
+    args = models.JSONField(default=dict)
+    # higher runs first
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUSES, default=PENDING)
+    # identical pending jobs share one row; a running job no longer absorbs new ones
+    dedup_key = models.CharField(max_length=40, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'], condition=models.Q(status='pending'), name='unique_pending_job',
+            ),
+        ]
+        indexes = [
+            # the worker's next-job lookup, in the order jobs are claimed
+            models.Index(fields=['status', '-priority', 'run_after', 'id'], name='job_queue'),
+            models.Index(fields=['user', 'created_at'], name='job_user_created'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} job {self.pk} ({self.status})"
@@ -0,0 +1,179 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a composite, unique ordering.
+
+    Pages are selected with a row-value comparison against the last item
+    seen instead of an OFFSET, and no COUNT(*) is issued, so deep pages
+    cost the same as the first one. ``?cursor=`` walks towards older rows
+    in display order. ``?newer_than=`` takes the ``newer`` token of an
+    earlier response and returns only the rows added after it, oldest
+    first, which is what a client needs for a delta refresh.
+
+    ``newer_than`` seeks on ``newer_ordering``, the insertion order, not on
+    the display order: a row added with an old ``date`` sorts deep into the
+    history but is still added after the token. A listing's ``newer``
+    token is the newest row of its page, so a refresh may repeat rows the
+    client saw on later pages but never misses one.
+
+    The last field in ``ordering`` must be unique (normally the primary
+    key) so every row has a distinct position.
+    """
+    ordering = ('-id',)
+    newer_ordering = ('id',)
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    newer_query_param = 'newer_than'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_results(list(self.get_page_queryset(queryset, request)))
+
+    def get_page_queryset(self, queryset, request):
+        """The sliced queryset for the requested page, one row longer than the page to detect more"""
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.newer_mode = self.newer_query_param in request.query_params
+
+        if self.newer_mode:
+            ordering = self.newer_ordering
+            position = self.decode_cursor(request.query_params[self.newer_query_param], ordering)
+        else:
+            ordering = self.ordering
+            position = self.decode_cursor(request.query_params.get(self.cursor_query_param), ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        self.seek_ordering = ordering
+        self.position = position
+        return queryset[:self.page_size + 1]
+
+    def paginate_results(self, results):
+        """Record the page and its cursors from the evaluated rows of get_page_queryset"""
+        position = self.position
+        self.page = results[:self.page_size]
+        self.has_more = len(results) > self.page_size
+
+        if self.newer_mode:
+            self.newer_position = self.get_position(self.page[-1], self.newer_ordering) if self.page else position
+        else:
+            # the page is in display order, which need not follow insertion
+            self.newer_position = max(
+                (self.get_position(row, self.newer_ordering) for row in self.page), default=None,
+            )
+        self.next_position = self.get_position(self.page[-1], self.seek_ordering) if self.has_more else None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'newer': self.encode_cursor(self.newer_position),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'newer': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        param = self.newer_query_param if self.newer_mode else self.cursor_query_param
+        url = remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(url, param, self.encode_cursor(self.next_position))
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    @staticmethod
+    def seek_filter(ordering, position):
+        """Build ``(a, b, c) < (x, y, z)``-style filtering out of plain comparisons"""
+        condition = Q()
+        equal = Q()
+        for order, value in zip(ordering, position):
+            name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    @staticmethod
+    def get_position(instance, ordering):
+        # rows may also be values() dicts, see api.representation
+        if isinstance(instance, dict):
+            return [instance[order.lstrip('-')] for order in ordering]
+        return [getattr(instance, order.lstrip('-')) for order in ordering]
+
+    def encode_cursor(self, position):
+        if position is None:
+            return None
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, encoded, ordering):
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            return [
+                self.model._meta.get_field(order.lstrip('-')).to_python(value)
+                for order, value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, UnicodeDecodeError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': schema_type},
+            }
+            for name, description, schema_type in (
+                (self.cursor_query_param, 'Cursor for the next (older) page.', 'string'),
+                (self.newer_query_param, 'Return only rows added after this `newer` token.', 'string'),
+                (self.page_size_query_param, 'Number of results to return per page.', 'integer'),
+            )
+        ]
+
+
+class WorkoutLogPagination(KeysetPagination):
+    ordering = ('-date', '-id')
+
+
+class WorkoutPlanPagination(KeysetPagination):
+    ordering = ('-id',)
@@ -0,0 +1,33 @@
+import codecs
+import json
+
+from django.conf import settings
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """
+    Parses newline-delimited JSON lazily, one object per line.
+
+    The parsed data is a generator, so a large upload is never held in
+    memory as a whole. Lines that are not valid JSON are yielded as the
+    raw string, leaving it to per-item validation to report them.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if stream is None:
+            return iter(())
+        return self.iter_items(codecs.getreader(encoding)(stream))
+
+    def iter_items(self, lines):
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
@@ -0,0 +1,169 @@
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Max, Sum, When
+from django.utils import timezone
+
+from .models import PersonalRecord, WorkoutSet
+
+RECORD_FIELDS = ('max_weight', 'estimated_1rm', 'best_volume')
+
+
+def estimate_1rm(weight, reps):
+    """Epley's one-rep max estimate; a single rep is its own maximum"""
+    return weight if reps == 1 else weight * (1 + reps / 30)
+
+
+def summarize_sets(sets):
+    """
+    The best (max_weight, estimated_1rm, best_volume) of each exercise among
+    ``sets``, given as (log_id, exercise_id, reps, weight) tuples. Sets with
+    no reps count for nothing.
+    """
+    volumes = defaultdict(float)
+    best = {}
+    for log_id, exercise_id, reps, weight in sets:
+        if not reps:
+            continue
+        volumes[log_id, exercise_id] += weight * reps
+        current = best.get(exercise_id, (0.0, 0.0, 0.0))
+        best[exercise_id] = (max(current[0], weight), max(current[1], estimate_1rm(weight, reps)), current[2])
+    for (_, exercise_id), volume in volumes.items():
+        max_weight, one_rep_max, best_volume = best[exercise_id]
+        best[exercise_id] = (max_weight, one_rep_max, max(best_volume, volume))
+    return best
+
+
+def set_tuples(sets):
+    return [(row.log_id, row.exercise_id, row.reps, row.weight) for row in sets]
+
+
+def apply_sets(user_id, sets):
+    """
+    Raise a user's records with newly written sets: one locking read of the
+    touched records and one write each for changed and new rows, however
+    long the history is. Call with the sets of whole logs, inside the
+    transaction that writes them.
+    """
+    summary = summarize_sets(sets)
+    if not summary:
+        return
+    with transaction.atomic():
+        records = {
+            record.exercise_id: record
+            for record in PersonalRecord.objects.select_for_update().filter(user_id=user_id, exercise_id__in=summary)
+        }
+        changed, created, now = [], [], timezone.now()
+        for exercise_id, values in summary.items():
+            record = records.get(exercise_id)
+            if record is None:
+                created.append(PersonalRecord(user_id=user_id, exercise_id=exercise_id, **dict(zip(RECORD_FIELDS, values))))
+                continue
+            raised = False
+            for field, value in zip(RECORD_FIELDS, values):
+                if value > getattr(record, field):
+                    setattr(record, field, value)
+                    raised = True
+            if raised:
+                record.updated_at = now
+                changed.append(record)
+        if changed:
+            PersonalRecord.objects.bulk_update(changed, RECORD_FIELDS + ('updated_at',))
+        if created:
+            PersonalRecord.objects.bulk_create(created)
+
+
+def _holds(value, record):
+    # volumes summed in SQL and in Python may differ in the last bits
+    return value >= record or math.isclose(value, record)
+
+
+def retract_sets(user_id, sets):
+    """
+    Account for deleted sets. Records are maxima, so they cannot be lowered
+    incrementally: each exercise whose record one of the sets held (or tied)
+    is recomputed from the user's remaining sets, and the rest are left
+    alone. Call after the sets are deleted.
+    """
+    summary = summarize_sets(sets)
+    if not summary:
+        return
+    with transaction.atomic():
+        records = PersonalRecord.objects.select_for_update().filter(user_id=user_id, exercise_id__in=summary)
+        stale = [
+            record for record in records
+            if any(_holds(value, getattr(record, field)) for field, value in zip(RECORD_FIELDS, summary[record.exercise_id]))
+        ]
+        if not stale:
+            return
+        live = compute_records(user_id=user_id, exercise_id__in=[record.exercise_id for record in stale])
+        changed, removed, now = [], [], timezone.now()
+        for record in stale:
+            values = live.get((user_id, record.exercise_id))
+            if values is None:
+                removed.append(record.pk)
+                continue
+            for field, value in zip(RECORD_FIELDS, values):
+                setattr(record, field, value)
+            record.updated_at = now
+            changed.append(record)
+        if changed:
+            PersonalRecord.objects.bulk_update(changed, RECORD_FIELDS + ('updated_at',))
+        if removed:
+            PersonalRecord.objects.filter(pk__in=removed).delete()
+
+
+def compute_records(**filters):
+    """
+    Records from the raw sets matching ``filters``, keyed by (user_id, exercise_id).
+    Sets are aggregated per log in the database, so only one row per
+    (log, exercise) pair is read.
+    """
+    one_rep_max = Case(When(reps=1, then=F('weight')), default=F('weight') * (1 + F('reps') / 30.0))
+    rows = (
+        WorkoutSet.objects.filter(reps__gt=0, **filters)
+        .values('user', 'exercise', 'log')
+        .annotate(max_weight=Max('weight'), one_rep_max=Max(one_rep_max), volume=Sum(F('weight') * F('reps')))
+        .order_by()
+    )
+    records = {}
+    for row in rows:
+        key = (row['user'], row['exercise'])
+        current = records.get(key, (0.0, 0.0, 0.0))
+        records[key] = (
+            max(current[0], row['max_weight']), max(current[1], row['one_rep_max']), max(current[2], row['volume']),
+        )
+    return records
+
+
+def rebuild_records(**filters):
+    """Replace the whole records table, or the records matching ``filters``, with rows recomputed from the raw sets"""
+    live = compute_records(**filters)
+    with transaction.atomic():
+        PersonalRecord.objects.filter(**filters).delete()
+        PersonalRecord.objects.bulk_create(
+            [
+                PersonalRecord(user_id=user_id, exercise_id=exercise_id, **dict(zip(RECORD_FIELDS, values)))
+                for (user_id, exercise_id), values in live.items()
+            ],
+            batch_size=500,
+        )
+    return len(live)
+
+
+def find_stale_records():
+    """Return (user_id, exercise_id, stored, live) for every record that disagrees with the raw sets"""
+    live = compute_records()
+    stored = {
+        (row[0], row[1]): row[2:]
+        for row in PersonalRecord.objects.values_list('user', 'exercise', *RECORD_FIELDS)
+    }
+    empty = (0.0, 0.0, 0.0)
+
+    mismatches = []
+    for key in sorted(live.keys() | stored.keys()):
+        expected, actual = live.get(key, empty), stored.get(key, empty)
+        if key not in live or key not in stored or not all(map(math.isclose, expected, actual)):
+            mismatches.append((*key, dict(zip(RECORD_FIELDS, actual)), dict(zip(RECORD_FIELDS, expected))))
+    return mismatches
@@ -0,0 +1,37 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Only selects the export format through content negotiation (Accept or
+    ?format=); the views return a StreamingHttpResponse that is never rendered.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # error responses (e.g. 401) still go through the negotiated renderer
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data or '').encode(self.charset)
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Passes the text exposition format of api.metrics through as is"""
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # error responses (e.g. 403) still go through this renderer
+        if isinstance(data, dict):
+            data = data.get('detail', data)
+        return str(data).encode(self.charset)
@@ -0,0 +1,142 @@
+import functools
+
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from .metrics import timed_serialization
+
+
+class ValuesRepresentation:
+    """
+    The read side of a ModelSerializer, built from ``values()`` rows.
+
+    Serializing model instances runs DRF's per-field machinery
+    (get_attribute, PKOnlyObject, SkipField checks) for every field of
+    every row. This reads only the columns the serializer declares and
+    applies each field's own ``to_representation`` to them, so the output
+    is the same dicts, in the same field order, that the serializer returns.
+
+    Supported fields are model fields, PrimaryKeyRelatedFields, nested
+    serializers on a forward relation and ``many=True`` serializers on a
+    reverse foreign key. Nested rows are fetched with one query per
+    relation. A nested object shared by many rows, like the plan of a
+    run of logs, is fetched and built once and the dict is reused.
+    Anything else raises TypeError; see ``get_values_representation``.
+    """
+
+    def __init__(self, serializer):
+        if isinstance(serializer, type):
+            serializer = serializer()
+        self.model = serializer.Meta.model
+        self.pk_name = self.model._meta.pk.attname
+        self.value_names = [self.pk_name]
+        self.getters = []
+        self.nested = []
+        self.lists = []
+
+        reverse = {rel.get_accessor_name(): rel for rel in self.model._meta.related_objects}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            source = field.source
+            if source == '*' or '.' in source:
+                raise TypeError(f'{name}: only direct model attributes are supported')
+
+            if isinstance(field, serializers.ListSerializer) and source in reverse:
+                child = ValuesRepresentation(field.child)
+                key = reverse[source].field.attname
+                child.value_names.append(key)
+                self.lists.append((name, key, child))
+                self.getters.append((name, self._list_getter(name, self.pk_name)))
+            elif isinstance(field, serializers.BaseSerializer):
+                model_field = self.model._meta.get_field(source)
+                if not (model_field.many_to_one or model_field.one_to_one) or not model_field.concrete:
+                    raise TypeError(f'{name}: nested serializers need a forward relation')
+                self.nested.append((name, model_field.attname, ValuesRepresentation(field)))
+                self.value_names.append(model_field.attname)
+                self.getters.append((name, self._nested_getter(name, model_field.attname)))
+            elif isinstance(field, PrimaryKeyRelatedField) and field.use_pk_only_optimization():
+                attname = self.model._meta.get_field(source).attname
+                self.value_names.append(attname)
+                self.getters.append((name, self._pk_getter(attname)))
+            elif isinstance(field, serializers.Field) and not isinstance(field, serializers.RelatedField):
+                model_field = self.model._meta.get_field(source)
+                if model_field.is_relation:
+                    raise TypeError(f'{name}: relations need a PrimaryKeyRelatedField or a nested serializer')
+                self.value_names.append(model_field.attname)
+                self.getters.append((name, self._field_getter(model_field.attname, field.to_representation)))
+            else:
+                raise TypeError(f'{name}: {type(field).__name__} is not supported')
+        self.value_names = list(dict.fromkeys(self.value_names))
+
+    # getters take the row and the nested objects fetched for the current call, so one
+    # (cached) instance can serve concurrent requests
+
+    @staticmethod
+    def _field_getter(key, to_representation):
+        def get(row, related):
+            value = row[key]
+            return None if value is None else to_representation(value)
+        return get
+
+    @staticmethod
+    def _pk_getter(key):
+        return lambda row, related: row[key]
+
+    @staticmethod
+    def _nested_getter(name, key):
+        return lambda row, related: related[name].get(row[key])
+
+    @staticmethod
+    def _list_getter(name, pk_name):
+        return lambda row, related: related[name].get(row[pk_name], [])
+
+    @timed_serialization
+    def to_representation(self, rows):
+        """Serialize a list of ``values(*self.value_names)`` rows"""
+        related = {}
+        for name, key, representation in self.nested:
+            related[name] = representation.fetch({row[key] for row in rows} - {None})
+        for name, key, representation in self.lists:
+            pks = [row[self.pk_name] for row in rows]
+            child_rows = list(
+                representation.model._default_manager.filter(**{f'{key}__in': pks}).values(*representation.value_names)
+            )
+            children = related[name] = {}
+            for child_row, child in zip(child_rows, representation.to_representation(child_rows)):
+                children.setdefault(child_row[key], []).append(child)
+        return [{name: get(row, related) for name, get in self.getters} for row in rows]
+
+    def fetch(self, pks):
+        """Build the representations of the given primary keys, keyed by pk"""
+        rows = list(self.model._default_manager.filter(pk__in=pks).values(*self.value_names))
+        return {row[self.pk_name]: item for row, item in zip(rows, self.to_representation(rows))}
+
+
+@functools.lru_cache(maxsize=None)
+def get_values_representation(serializer_class):
+    """The ValuesRepresentation of a serializer class, or None if it has fields values() cannot serve"""
+    try:
+        return ValuesRepresentation(serializer_class)
+    except TypeError:
+        return None
+
+
+class ValuesListMixin:
+    """
+    Serve ``list`` from values() rows through ValuesRepresentation, falling
+    back to the serializer when it declares fields that are not supported.
+    """
+
+    def list(self, request, *args, **kwargs):
+        representation = get_values_representation(self.get_serializer_class())
+        if representation is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.select_related(None).prefetch_related(None).values(*representation.value_names)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(representation.to_representation(page))
+        return Response(representation.to_representation(list(queryset)))
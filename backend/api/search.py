@@ -0,0 +1,144 @@
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models.functions import Collate
+
+from .models import Exercise
+
+WORD = re.compile(r'\w+')
+
+# the minimum trigram similarity for a spelling correction; below pg_trgm's 0.3, as a
+# single swapped pair of letters already costs a short word most of its trigrams
+SIMILARITY_THRESHOLD = 0.25
+# how many corrections are tried for a misspelled word
+CORRECTIONS = 3
+# word-prefix matches read per search and ranked in Python; ranking every match of a
+# short prefix in SQL (bm25) costs tens of milliseconds on a large catalog
+CANDIDATES = 200
+
+
+def fold(text):
+    """Lower-case ``text`` and strip its accents, as the unicode61 tokenizer does"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def trigrams(text):
+    """The trigrams of a lower-cased, space-padded string, as pg_trgm builds them for each word"""
+    grams = set()
+    for word in WORD.findall(text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(left, right):
+    left, right = trigrams(left), trigrams(right)
+    return len(left & right) / len(left | right) if left or right else 0.0
+
+
+def _quote(term):
+    return '"%s"' % term.replace('"', '""')
+
+
+def name_prefix_matches(query, limit):
+    """Exercises whose name starts with ``query``, an exact name first; a range scan of the NOCASE index"""
+    return list(Exercise.objects.filter(name__istartswith=query).order_by(Collate('name', 'nocase'))[:limit])
+
+
+def word_prefix_matches(words, limit, exclude=()):
+    """
+    Exercises with a word starting with each of ``words``, shortest names first.
+
+    An item of ``words`` may also be a list of whole words, any of which
+    will do. Only the first CANDIDATES matches, in id order, are ranked.
+    """
+    terms = [
+        '(%s)' % ' OR '.join(_quote(term) for term in word) if isinstance(word, list) else _quote(word) + '*'
+        for word in words
+    ]
+    candidates = Exercise.objects.raw(
+        'SELECT e.id, e.name, e.description FROM api_exercise_fts f '
+        'JOIN api_exercise e ON e.id = f.rowid '
+        'WHERE api_exercise_fts MATCH %s LIMIT %s',
+        [' AND '.join(terms), CANDIDATES],
+    )
+    matches = sorted(
+        (exercise for exercise in candidates if exercise.pk not in exclude),
+        key=lambda exercise: (len(exercise.name), exercise.name),
+    )
+    return matches[:limit]
+
+
+def corrections(word):
+    """
+    Indexed words that ``word`` is likely a misspelling of, most similar first,
+    or None if it already is the prefix of an indexed word.
+
+    Only words with the same first letter are considered, which keeps the
+    vocabulary scan small.
+    """
+    word = fold(word)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT term FROM api_exercise_fts_vocab WHERE term >= %s AND term < %s',
+            [word[0], chr(ord(word[0]) + 1)],
+        )
+        terms = [term for term, in cursor.fetchall()]
+    if any(term.startswith(word) for term in terms):
+        return None
+    scored = sorted(
+        ((score, term) for term in terms if (score := similarity(word, term)) >= SIMILARITY_THRESHOLD),
+        key=lambda item: (-item[0], item[1]),
+    )
+    return [term for _, term in scored[:CORRECTIONS]]
+
+
+def fuzzy_matches(words, limit, exclude=()):
+    """Word-prefix matches with each misspelled word of three or more letters replaced by its corrections"""
+    corrected, changed = [], False
+    for word in words:
+        alternatives = corrections(word) if len(word) >= 3 else None
+        if alternatives == []:
+            return []
+        changed |= alternatives is not None
+        corrected.append(word if alternatives is None else alternatives)
+    return word_prefix_matches(corrected, limit, exclude) if changed else []
+
+
+def search_exercises(query, limit=10):
+    """
+    Ranked exercise search for autocompletion: names starting with the query
+    (an exact name first), then names with a word starting with each query
+    word, then the same with misspelled words corrected by trigram similarity
+    against the indexed words.
+
+    Uses the FTS5 tables of migration 0006 on SQLite. Other databases get
+    an unindexed name prefix/substring lookup without typo tolerance.
+    """
+    query = ' '.join(query.split())
+    words = WORD.findall(query)
+    if not words:
+        return []
+    if connection.vendor != 'sqlite':
+        return fallback_matches(query, limit)
+
+    results = name_prefix_matches(query, limit)
+    for tier in (word_prefix_matches, fuzzy_matches):
+        if len(results) >= limit:
+            break
+        results += tier(words, limit - len(results), exclude={exercise.pk for exercise in results})
+    return results
+
+
+def fallback_matches(query, limit):
+    results = list(Exercise.objects.filter(name__istartswith=query).order_by('name')[:limit])
+    if len(results) < limit:
+        others = Exercise.objects.filter(name__icontains=query).exclude(pk__in=[exercise.pk for exercise in results])
+        results += list(others.order_by('name')[:limit - len(results)])
+    lowered = query.lower()
+    results.sort(key=lambda exercise: (
+        exercise.name.lower() != lowered, not exercise.name.lower().startswith(lowered), len(exercise.name), exercise.name,
+    ))
+    return results
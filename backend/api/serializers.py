@@ -1,24 +1,233 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Exercise, WorkoutPlan, WorkoutExercise, WorkoutLog
+from .analytics import PERIODS
+from .exercises import set_plan_exercises
+from .load import log_date_window
+from .metrics import TimedSerializerMixin
+from .models import Exercise, Job, PersonalRecord, WorkoutPlan, WorkoutExercise, WorkoutLog, WorkoutSet
+from .records import apply_sets, retract_sets, set_tuples
+
+class TimedModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """A ModelSerializer whose representations count as serialization time in the request metrics"""
 
-class ExerciseSerializer(serializers.ModelSerializer):
+class ExerciseSerializer(TimedModelSerializer):
     class Meta:
         model = Exercise
         fields = '__all__'
 
-class WorkoutExerciseSerializer(serializers.ModelSerializer):
+class WorkoutExerciseSerializer(TimedModelSerializer):
+    # exercises are written by name and resolved (or created) in bulk by the plan serializer
+    name = serializers.CharField(max_length=100, write_only=True)
+    description = serializers.CharField(write_only=True, required=False, allow_blank=True)
+
     class Meta:
         model = WorkoutExercise
         fields = '__all__'
+        read_only_fields = ['workout_plan', 'exercise']
 
-class WorkoutPlanSerializer(serializers.ModelSerializer):
-    exercises = WorkoutExerciseSerializer(source='workoutexercise_set', many=True, read_only=True)
+class WorkoutPlanSerializer(TimedModelSerializer):
+    exercises = WorkoutExerciseSerializer(source='workoutexercise_set', many=True, required=False)
 
     class Meta:
         model = WorkoutPlan
-        fields = ['id', 'title', 'description', 'exercises']
+        fields = ['id', 'uuid', 'title', 'description', 'exercises', 'created_at', 'updated_at']
+
+    def create(self, validated_data):
+        exercises_data = validated_data.pop('workoutexercise_set', [])
+        with transaction.atomic():
+            plan = super().create(validated_data)
+            set_plan_exercises(plan, exercises_data)
+        return plan
+
+    def update(self, instance, validated_data):
+        exercises_data = validated_data.pop('workoutexercise_set', None)
+        with transaction.atomic():
+            plan = super().update(instance, validated_data)
+            if exercises_data is not None:
+                set_plan_exercises(plan, exercises_data, replace=True)
+        return plan
+
+class ExerciseIdField(serializers.PrimaryKeyRelatedField):
+    """Takes an exercise id as is; the log serializer and bulk ingest check all ids with one query"""
+
+    def to_internal_value(self, data):
+        try:
+            return int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+class WorkoutSetSerializer(TimedModelSerializer):
+    exercise = ExerciseIdField(queryset=Exercise.objects.all())
+    weight = serializers.FloatField(min_value=0, required=False, default=0)
+
+    class Meta:
+        model = WorkoutSet
+        fields = ['id', 'exercise', 'reps', 'weight']
+
+def validate_log_date(value):
+    # far-off dates would stretch the user's daily training load array to cover them
+    first, last = log_date_window()
+    if not first <= value <= last:
+        raise serializers.ValidationError(f"Date must be between {first} and {last}.")
+
+class WorkoutLogSerializer(TimedModelSerializer):
+    sets = WorkoutSetSerializer(many=True, required=False)
 
-class WorkoutLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = WorkoutLog
         fields = '__all__'
+        read_only_fields = ['user', 'client_key']
+
+    def validate_workout_plan(self, value):
+        if value.user_id != self.context['request'].user.pk:
+            raise serializers.ValidationError("You can only log workouts for your own plans.")
+        return value
+
+    def validate_date(self, value):
+        validate_log_date(value)
+        return value
+
+    def validate_sets(self, value):
+        ids = {item['exercise'] for item in value}
+        missing = ids and ids - set(Exercise.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Unknown exercise ids: {sorted(missing)}.")
+        return value
+
+    def write_sets(self, log, items):
+        sets = WorkoutSet.objects.bulk_create(
+            WorkoutSet(log=log, user_id=log.user_id, exercise_id=item['exercise'], reps=item['reps'], weight=item['weight'])
+            for item in items
+        )
+        apply_sets(log.user_id, set_tuples(sets))
+
+    def create(self, validated_data):
+        sets_data = validated_data.pop('sets', [])
+        with transaction.atomic():
+            log = super().create(validated_data)
+            self.write_sets(log, sets_data)
+        return log
+
+    def update(self, instance, validated_data):
+        sets_data = validated_data.pop('sets', None)
+        with transaction.atomic():
+            log = super().update(instance, validated_data)
+            if sets_data is not None:
+                previous = set_tuples(log.sets.all())
+                WorkoutSet.objects.filter(log=log).delete()
+                retract_sets(log.user_id, previous)
+                self.write_sets(log, sets_data)
+        return log
+
+class BulkWorkoutLogSerializer(serializers.Serializer):
+    """Validates one item of a bulk log upload without touching the database"""
+    client_key = serializers.CharField(max_length=64, required=False, allow_null=True)
+    workout_plan = serializers.IntegerField()
+    date = serializers.DateField(required=False, validators=[validate_log_date])
+    duration = serializers.IntegerField(min_value=0, required=False, default=0)
+    intensity = serializers.IntegerField(min_value=1, max_value=10, required=False, default=5)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+    sets = WorkoutSetSerializer(many=True, required=False)
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """Query parameters of the analytics endpoint; the range defaults to the last year"""
+    period = serializers.ChoiceField(choices=PERIODS, default='week')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        attrs['end'] = attrs.get('end') or timezone.localdate()
+        attrs['start'] = attrs.get('start') or attrs['end'] - timedelta(days=365)
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("start must not be after end.")
+        return attrs
+
+class AthleteIdsField(serializers.CharField):
+    """Comma-separated user ids, as a list without repeats; empty for the requesting user alone"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('allow_blank', True)
+        kwargs.setdefault('default', '')
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        value = super().to_internal_value(data)
+        try:
+            ids = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+        except ValueError:
+            raise serializers.ValidationError("Expected comma-separated user ids.")
+        if len(ids) > settings.MAX_ATHLETES_PER_REQUEST:
+            raise serializers.ValidationError(f"At most {settings.MAX_ATHLETES_PER_REQUEST} athletes per request.")
+        return ids
+
+class AthleteStatsQuerySerializer(serializers.Serializer):
+    """Query parameters of the batch stats endpoint"""
+    athletes = AthleteIdsField()
+
+class TrainingLoadQuerySerializer(serializers.Serializer):
+    """Query parameters of the training load endpoint; athletes default to the user, the range to the last 28 days"""
+    athletes = AthleteIdsField()
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        attrs['end'] = attrs.get('end') or timezone.localdate()
+        attrs['start'] = attrs.get('start') or attrs['end'] - timedelta(days=27)
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("start must not be after end.")
+        if (attrs['end'] - attrs['start']).days >= settings.TRAINING_LOAD_MAX_DAYS:
+            raise serializers.ValidationError(f"The range may span at most {settings.TRAINING_LOAD_MAX_DAYS} days.")
+        return attrs
+
+class ExerciseSearchQuerySerializer(serializers.Serializer):
+    """Query parameters of the exercise search endpoint"""
+    q = serializers.CharField(max_length=100, trim_whitespace=True)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+class PersonalRecordSerializer(TimedModelSerializer):
+    exercise = ExerciseSerializer(read_only=True)
+
+    class Meta:
+        model = PersonalRecord
+        fields = ['id', 'exercise', 'max_weight', 'estimated_1rm', 'best_volume', 'updated_at']
+
+class WorkoutPlanSyncSerializer(TimedModelSerializer):
+    """A plan without its exercises, which sync sends as their own feed"""
+    class Meta:
+        model = WorkoutPlan
+        fields = ['id', 'title', 'description', 'updated_at']
+
+class WorkoutExerciseSyncSerializer(TimedModelSerializer):
+    exercise = ExerciseSerializer(read_only=True)
+
+    class Meta:
+        model = WorkoutExercise
+        fields = ['id', 'workout_plan', 'exercise', 'sets', 'reps', 'updated_at']
+
+class SyncQuerySerializer(serializers.Serializer):
+    """Query parameters of the sync endpoint"""
+    since = serializers.CharField(required=False, allow_blank=True, default='')
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=500)
+
+class JobSerializer(TimedModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'task', 'status', 'attempts', 'result', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+class JobRequestSerializer(serializers.Serializer):
+    """The jobs a user can queue through the API"""
+    task = serializers.ChoiceField(choices=['recompute_stats', 'export_logs'])
+    format = serializers.ChoiceField(choices=['csv', 'ndjson'], required=False)
+
+    def validate(self, attrs):
+        if attrs['task'] == 'export_logs':
+            attrs.setdefault('format', 'csv')
+        elif 'format' in attrs:
+            raise serializers.ValidationError({'format': ['Only exports take a format.']})
+        return attrs
@@ -0,0 +1,178 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import invalidate_user
+from .load import apply_load_batch
+from .metrics import install_query_recorder
+from .models import Exercise, Tombstone, WorkoutExercise, WorkoutLog, WorkoutPlan, WorkoutSet, WorkoutStats
+from .records import retract_sets, set_tuples
+from .stats import apply_log_delta, apply_plan_delta
+
+# ids of the users whose deletion is cascading in this thread
+_deleting_users = threading.local()
+
+
+def is_being_deleted(user_id):
+    return user_id in getattr(_deleting_users, 'ids', ())
+
+
+@receiver(connection_created)
+def record_request_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+@receiver(pre_save, sender=WorkoutLog)
+def remember_previous_log(sender, instance, raw=False, **kwargs):
+    """Keep the stored values so post_save can move the log between stats buckets"""
+    instance._stats_previous = instance._load_previous = None
+    if instance.pk and not raw:
+        previous = (
+            WorkoutLog.objects.filter(pk=instance.pk).values_list('user_id', 'date', 'duration', 'intensity').first()
+        )
+        if previous is not None:
+            instance._stats_previous, instance._load_previous = previous[:3], previous
+
+
+@receiver(post_save, sender=WorkoutLog)
+def update_stats_on_log_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_stats_previous', None)
+    current = (instance.user_id, instance.date, instance.duration)
+    if previous == current:
+        return
+    if previous is not None:
+        apply_log_delta(*previous, sign=-1, create=False)
+    apply_log_delta(*current, sign=1)
+
+
+@receiver(post_delete, sender=WorkoutLog)
+def update_stats_on_log_delete(sender, instance, **kwargs):
+    apply_log_delta(instance.user_id, instance.date, instance.duration, sign=-1, create=False)
+
+
+@receiver(post_save, sender=WorkoutLog)
+def update_training_load_on_log_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_load_previous', None)
+    current = (instance.user_id, instance.date, instance.duration, instance.intensity)
+    if previous == current:
+        return
+    if previous is not None:
+        apply_load_batch(previous[0], [previous[1:]], sign=-1, create=False)
+    apply_load_batch(current[0], [current[1:]])
+
+
+@receiver(post_delete, sender=WorkoutLog)
+def update_training_load_on_log_delete(sender, instance, **kwargs):
+    apply_load_batch(instance.user_id, [(instance.date, instance.duration, instance.intensity)], sign=-1, create=False)
+
+
+def deletes(origin, model):
+    """Whether a delete started from ``model`` rows (an instance or a queryset) rather than cascading to them"""
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+@receiver(pre_delete, sender=WorkoutLog)
+def remember_deleted_sets(sender, instance, origin=None, **kwargs):
+    # every pre_delete of a (cascading) delete runs before any row is removed. Logs deleted
+    # with their plan have their sets read once per plan, and a deleted user's records go too
+    if deletes(origin, WorkoutLog):
+        instance._deleted_sets = set_tuples(instance.sets.all())
+
+
+@receiver(post_delete, sender=WorkoutLog)
+def update_records_on_log_delete(sender, instance, **kwargs):
+    retract_sets(instance.user_id, getattr(instance, '_deleted_sets', ()))
+
+
+@receiver(pre_delete, sender=WorkoutPlan)
+def remember_deleted_plan_sets(sender, instance, origin=None, **kwargs):
+    if deletes(origin, WorkoutPlan):
+        instance._deleted_sets = defaultdict(list)
+        for row in WorkoutSet.objects.filter(log__workout_plan=instance):
+            instance._deleted_sets[row.user_id].extend(set_tuples([row]))
+
+
+@receiver(post_delete, sender=WorkoutPlan)
+def update_records_on_plan_delete(sender, instance, **kwargs):
+    # the plan's logs and their sets are removed before the plan
+    for user_id, sets in getattr(instance, '_deleted_sets', {}).items():
+        retract_sets(user_id, sets)
+
+
+@receiver(post_save, sender=WorkoutPlan)
+def update_stats_on_plan_save(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        apply_plan_delta(instance.user_id, sign=1)
+
+
+@receiver(post_delete, sender=WorkoutPlan)
+def update_stats_on_plan_delete(sender, instance, **kwargs):
+    apply_plan_delta(instance.user_id, sign=-1, create=False)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def stop_tombstones_of_deleted_user(sender, instance, **kwargs):
+    # a deleted user has no clients left to sync. The user's pre_delete runs after those of
+    # their plans, so tombstones those wrote are dropped here; the post_deletes that follow skip theirs
+    _deleting_users.ids = getattr(_deleting_users, 'ids', frozenset()) | {instance.pk}
+    Tombstone.objects.filter(user_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_deleted_user(sender, instance, **kwargs):
+    _deleting_users.ids = getattr(_deleting_users, 'ids', frozenset()) - {instance.pk}
+
+
+@receiver(post_delete, sender=WorkoutLog)
+def record_log_tombstone(sender, instance, **kwargs):
+    if not is_being_deleted(instance.user_id):
+        Tombstone.record(instance.user_id, Tombstone.LOG, [instance.pk])
+
+
+@receiver(pre_delete, sender=WorkoutPlan)
+def record_plan_exercise_tombstones(sender, instance, **kwargs):
+    # plan exercises have no delete signals, so the cascade removes them without fetching them
+    ids = WorkoutExercise.objects.filter(workout_plan=instance).values_list('pk', flat=True)
+    Tombstone.record(instance.user_id, Tombstone.PLAN_EXERCISE, list(ids))
+
+
+@receiver(pre_delete, sender=Exercise)
+def record_exercise_cascade(sender, instance, **kwargs):
+    # the exercise's plan exercises and sets go without signals too. Their owners get
+    # tombstones, and logs that lose sets get a newer updated_at so sync sends them again
+    plan_exercises = defaultdict(list)
+    for pk, user_id in WorkoutExercise.objects.filter(exercise=instance).values_list('pk', 'workout_plan__user'):
+        plan_exercises[user_id].append(pk)
+    for user_id, ids in plan_exercises.items():
+        Tombstone.record(user_id, Tombstone.PLAN_EXERCISE, ids)
+    logs = WorkoutLog.objects.filter(pk__in=WorkoutSet.objects.filter(exercise=instance).values('log'))
+    log_owners = set(logs.values_list('user', flat=True).distinct())
+    logs.update(updated_at=timezone.now())
+    for user_id in plan_exercises.keys() | log_owners:
+        invalidate_user(user_id)
+
+
+@receiver(post_delete, sender=WorkoutPlan)
+def record_plan_tombstone(sender, instance, **kwargs):
+    if not is_being_deleted(instance.user_id):
+        Tombstone.record(instance.user_id, Tombstone.PLAN, [instance.pk])
+
+
+@receiver(post_save, sender=WorkoutPlan)
+@receiver(post_delete, sender=WorkoutPlan)
+@receiver(post_save, sender=WorkoutLog)
+@receiver(post_delete, sender=WorkoutLog)
+@receiver(post_save, sender=WorkoutStats)
+def invalidate_cached_responses(sender, instance, raw=False, **kwargs):
+    # WorkoutStats is saved by every log write, including bulk ones that skip model signals
+    if not raw:
+        invalidate_user(instance.user_id)
@@ -0,0 +1,125 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .cache import get_many_per_user
+from .models import WorkoutLog, WorkoutPlan, WorkoutStats
+
+
+def apply_log_batch(user_id, entries, sign=1, create=True):
+    """Add (sign=1) or remove (sign=-1) a batch of (date, duration) log entries from a user's stats row"""
+    week_start = WorkoutStats.week_start(timezone.now().date()).isoformat()
+    workouts, duration, days = 0, 0, defaultdict(int)
+    for date, log_duration in entries:
+        workouts += 1
+        duration += log_duration or 0
+        day = str(date)
+        if day >= week_start:
+            days[day] += 1
+    if not workouts:
+        return
+
+    with transaction.atomic():
+        stats = WorkoutStats.objects.select_for_update().filter(user_id=user_id).first()
+        if stats is None:
+            if not create:
+                return
+            stats = WorkoutStats(user_id=user_id)
+
+        stats.total_workouts = max(stats.total_workouts + sign * workouts, 0)
+        stats.total_duration = max(stats.total_duration + sign * duration, 0)
+
+        recent_days = {day: count for day, count in stats.recent_days.items() if day >= week_start}
+        for day, count in days.items():
+            count = recent_days.get(day, 0) + sign * count
+            if count > 0:
+                recent_days[day] = count
+            else:
+                recent_days.pop(day, None)
+        stats.recent_days = recent_days
+        stats.save(force_insert=stats._state.adding)
+
+
+def apply_log_delta(user_id, date, duration, sign, create=True):
+    """Add (sign=1) or remove (sign=-1) one workout log from a user's stats row"""
+    apply_log_batch(user_id, [(date, duration)], sign=sign, create=create)
+
+
+def apply_plan_batch(user_id, count, sign=1, create=True):
+    """Add (sign=1) or remove (sign=-1) ``count`` workout plans from a user's stats row"""
+    if not count:
+        return
+    with transaction.atomic():
+        stats = WorkoutStats.objects.select_for_update().filter(user_id=user_id).first()
+        if stats is None:
+            if not create:
+                return
+            stats = WorkoutStats(user_id=user_id)
+        stats.total_plans = max(stats.total_plans + sign * count, 0)
+        stats.save(force_insert=stats._state.adding)
+
+
+def apply_plan_delta(user_id, sign, create=True):
+    """Add (sign=1) or remove (sign=-1) one workout plan from a user's stats row"""
+    apply_plan_batch(user_id, 1, sign=sign, create=create)
+
+
+def batch_stats(user_ids, today=None):
+    """
+    ``{user_id: stats dict}`` of many users, cached per user. The uncached
+    ones are read in one query from their stats rows, which are the
+    per-user aggregates of the logs kept up to date on every write.
+    """
+    today = today or timezone.now().date()
+
+    def build(missing):
+        rows = WorkoutStats.objects.in_bulk(missing)
+        return {user_id: rows.get(user_id, WorkoutStats(user_id=user_id)).as_dict(today) for user_id in missing}
+
+    # weekly_workouts depends on the day as well
+    return get_many_per_user(f'stats:{today}', user_ids, build)
+
+
+def compute_live_stats(today=None, **filters):
+    """Build unsaved WorkoutStats rows for every user (matching ``filters``) from the live log and plan tables"""
+    today = today or timezone.now().date()
+    week_start = WorkoutStats.week_start(today)
+    rows = defaultdict(lambda: {'total_workouts': 0, 'total_plans': 0, 'total_duration': 0, 'recent_days': {}})
+    logs, plans = WorkoutLog.objects.filter(**filters), WorkoutPlan.objects.filter(**filters)
+
+    for row in logs.values('user').annotate(count=Count('id'), duration=Sum('duration')).order_by():
+        rows[row['user']].update(total_workouts=row['count'], total_duration=row['duration'] or 0)
+    for row in plans.values('user').annotate(count=Count('id')).order_by():
+        rows[row['user']]['total_plans'] = row['count']
+    recent = logs.filter(date__gte=week_start).values('user', 'date').annotate(count=Count('id')).order_by()
+    for row in recent:
+        rows[row['user']]['recent_days'][row['date'].isoformat()] = row['count']
+
+    return {user_id: WorkoutStats(user_id=user_id, **values) for user_id, values in rows.items()}
+
+
+def rebuild_stats(**filters):
+    """Replace the whole stats table, or the rows of the users matching ``filters``, with freshly computed rows"""
+    live = compute_live_stats(**filters)
+    with transaction.atomic():
+        WorkoutStats.objects.filter(**filters).delete()
+        WorkoutStats.objects.bulk_create(live.values(), batch_size=500)
+    return len(live)
+
+
+def find_stale_stats(today=None):
+    """Return (user_id, stored, live) for every user whose stats row disagrees with the live aggregates"""
+    today = today or timezone.now().date()
+    live = compute_live_stats(today)
+    stored = {stats.user_id: stats for stats in WorkoutStats.objects.all()}
+    empty = WorkoutStats().as_dict(today)
+
+    mismatches = []
+    for user_id in sorted(live.keys() | stored.keys()):
+        expected = live[user_id].as_dict(today) if user_id in live else empty
+        actual = stored[user_id].as_dict(today) if user_id in stored else empty
+        if expected != actual:
+            mismatches.append((user_id, actual, expected))
+    return mismatches
@@ -0,0 +1,125 @@
+"""
+Delta sync of a user's plans, plan exercises and logs.
+
+Every synced row carries ``updated_at`` and every deletion leaves a
+Tombstone. A sync response holds the rows changed and deleted after the
+client's watermark, in (timestamp, id) keyset order per feed, and a new
+watermark to send next time.
+
+A row's timestamp is taken before its transaction commits, so a slow
+transaction can make a row visible after rows with later timestamps.
+A watermark therefore never moves past ``SYNC_SETTLE_SECONDS`` ago: the
+newest rows are sent again by the next sync, and clients upsert by id.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Tombstone, WorkoutExercise, WorkoutLog, WorkoutPlan
+from .representation import get_values_representation
+from .serializers import WorkoutExerciseSyncSerializer, WorkoutLogSerializer, WorkoutPlanSyncSerializer
+
+Feed = namedtuple('Feed', 'name get_queryset time_field serializer_class')
+
+FEEDS = (
+    Feed('plans', lambda user: WorkoutPlan.objects.filter(user=user), 'updated_at', WorkoutPlanSyncSerializer),
+    Feed(
+        'plan_exercises', lambda user: WorkoutExercise.objects.filter(workout_plan__user=user),
+        'updated_at', WorkoutExerciseSyncSerializer,
+    ),
+    Feed('logs', lambda user: WorkoutLog.objects.filter(user=user), 'updated_at', WorkoutLogSerializer),
+    Feed('deleted', lambda user: Tombstone.objects.filter(user=user), 'deleted_at', None),
+)
+
+DELETED_KEYS = {Tombstone.PLAN: 'plans', Tombstone.PLAN_EXERCISE: 'plan_exercises', Tombstone.LOG: 'logs'}
+
+
+def prune_tombstones(now=None):
+    """Drop tombstones past the retention period; clients with older watermarks get a full snapshot"""
+    cutoff = (now or timezone.now()) - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    return Tombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
+
+
+def encode_watermark(positions):
+    data = {name: [moment.isoformat(), pk] for name, (moment, pk) in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode()
+
+
+def decode_watermark(token):
+    if not token:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode()))
+        positions = {name: (datetime.fromisoformat(moment), int(pk)) for name, (moment, pk) in data.items()}
+    except (binascii.Error, UnicodeError, ValueError, TypeError, AttributeError):
+        raise ValidationError({'since': ['Invalid watermark.']})
+    if set(positions) != {feed.name for feed in FEEDS} or any(timezone.is_naive(moment) for moment, _ in positions.values()):
+        raise ValidationError({'since': ['Invalid watermark.']})
+    return positions
+
+
+def changes_since(user, since=None, limit=500):
+    """
+    The user's rows changed since the ``since`` watermark, at most ``limit``
+    per feed, and the watermark to continue from. Without a watermark, or
+    with one older than the tombstone retention, the response is a full
+    snapshot (``reset``) that replaces the client's copy.
+    """
+    now = timezone.now()
+    positions = decode_watermark(since)
+    retention = now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    if positions is not None and min(moment for moment, _ in positions.values()) < retention:
+        positions = None
+    reset = positions is None
+    settled = (now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS), 0)
+
+    data = {'reset': reset}
+    watermark, has_more = {}, False
+    for feed in FEEDS:
+        position = positions[feed.name] if positions else None
+        if reset and feed.name == 'deleted':
+            # a snapshot has nothing to delete
+            rows = []
+        else:
+            rows = fetch_feed(feed, user, position, limit)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            has_more = True
+            # rows of the settle window are sent again by the next page too
+            watermark[feed.name] = min((rows[-1][feed.time_field], rows[-1]['id']), settled)
+        else:
+            watermark[feed.name] = max(position or settled, settled)
+        data[feed.name] = rows
+
+    for feed in FEEDS[:-1]:
+        representation = get_values_representation(feed.serializer_class)
+        data[feed.name] = representation.to_representation(data[feed.name])
+    deleted = {key: [] for key in DELETED_KEYS.values()}
+    for tombstone in data['deleted']:
+        deleted[DELETED_KEYS[tombstone['kind']]].append(tombstone['object_id'])
+    data['deleted'] = deleted
+
+    data['watermark'] = encode_watermark(watermark)
+    data['has_more'] = has_more
+    return data
+
+
+def fetch_feed(feed, user, position, limit):
+    """Up to ``limit + 1`` value rows of a feed after ``position``, in (timestamp, id) order"""
+    queryset = feed.get_queryset(user)
+    if position is not None:
+        moment, pk = position
+        queryset = queryset.filter(Q(**{f'{feed.time_field}__gt': moment}) | Q(**{feed.time_field: moment, 'id__gt': pk}))
+    if feed.serializer_class is None:
+        names = ['id', 'kind', 'object_id', feed.time_field]
+    else:
+        names = get_values_representation(feed.serializer_class).value_names
+        names = list(dict.fromkeys([*names, feed.time_field]))
+    return list(queryset.order_by(feed.time_field, 'id').values(*names)[:limit + 1])
@@ -0,0 +1,132 @@
+"""
+Synthetic users, plans and workout history for benchmarks and local testing.
+
+``generate`` is deterministic for a given seed. Activity is heavy-tailed,
+as in real fitness apps: most users log a workout or two a week for a few
+months, a few train almost daily for the whole period. Weights progress
+slowly with noise, so personal records move like real ones. Rows are
+bulk inserted, which skips the signals, so the stats, training load and
+records tables are rebuilt at the end.
+"""
+import math
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .load import rebuild_training_load
+from .models import Exercise, WorkoutExercise, WorkoutLog, WorkoutPlan, WorkoutSet
+from .records import rebuild_records
+from .stats import rebuild_stats
+
+User = get_user_model()
+
+# equipment x variant x movement, combined into the exercise catalog
+EXERCISE_WORDS = (
+    ('Barbell', 'Dumbbell', 'Kettlebell', 'Cable', 'Machine', 'Band', 'Smith', 'Landmine', 'Trap Bar', 'Bodyweight'),
+    ('Incline', 'Decline', 'Flat', 'Seated', 'Standing', 'Single-Arm', 'Single-Leg', 'Paused', 'Tempo', 'Deficit'),
+    ('Bench Press', 'Squat', 'Deadlift', 'Row', 'Curl', 'Lunge', 'Shoulder Press', 'Fly', 'Pullover', 'Shrug'),
+)
+
+PLAN_TITLES = ('Push', 'Pull', 'Legs', 'Upper', 'Lower', 'Full Body', 'Strength', 'Hypertrophy', 'Conditioning', 'Core')
+NOTES = ('', '', '', '', 'Felt strong', 'Short on time', 'New gym', 'Back a bit sore', 'Great pump', 'Deload week')
+REP_TARGETS = (5, 6, 8, 10, 12, 15)
+
+
+def exercise_names(count):
+    """The first ``count`` names of the catalog; past 1000 a number keeps them unique"""
+    equipment, variants, movements = EXERCISE_WORDS
+    return [
+        f'{variants[i // 100 % 10]} {equipment[i // 10 % 10]} {movements[i % 10]}' + (f' {i // 1000}' if i >= 1000 else '')
+        for i in range(count)
+    ]
+
+
+def generate(users=10, days=365, seed=0, prefix='athlete', catalog=150, password='fittrack-pass', today=None):
+    """
+    Create ``users`` users named ``<prefix>-<n>`` with plans and up to
+    ``days`` days of logged workouts each. Returns the number of rows
+    created per model.
+    """
+    rng = random.Random(seed)
+    today = today or timezone.localdate()
+    counts = dict.fromkeys(('users', 'plans', 'plan_exercises', 'logs', 'sets'), 0)
+
+    with transaction.atomic():
+        names = exercise_names(catalog)
+        Exercise.objects.bulk_create([Exercise(name=name) for name in names], ignore_conflicts=True)
+        exercise_ids = list(Exercise.objects.filter(name__in=names).order_by('pk').values_list('pk', flat=True))
+
+        # hashing once keeps generation fast; every user gets the same password
+        password_hash = make_password(password)
+        created = User.objects.bulk_create(
+            [User(username=f'{prefix}-{n}', password=password_hash) for n in range(users)]
+        )
+        counts['users'] = len(created)
+        for user in created:
+            for model, rows in generate_user(rng, user, exercise_ids, days, today).items():
+                counts[model] += rows
+
+    rebuild_stats()
+    rebuild_training_load()
+    rebuild_records()
+    return counts
+
+
+def generate_user(rng, user, exercise_ids, days, today):
+    # sessions per week are lognormal: a median of two, with a long tail of daily trainers
+    sessions_per_week = min(rng.lognormvariate(math.log(2), 0.6), 7)
+    active_days = max(1, int(days * rng.betavariate(2, 1)))
+    start = today - timedelta(days=active_days - 1)
+
+    plans = WorkoutPlan.objects.bulk_create([
+        WorkoutPlan(user=user, title=f'{rng.choice(PLAN_TITLES)} {n + 1}', description=rng.choice(NOTES))
+        for n in range(1 + min(int(rng.expovariate(1 / 2)), 11))
+    ])
+    plan_exercises = {}
+    rows = []
+    for plan in plans:
+        plan_exercises[plan.pk] = [
+            WorkoutExercise(
+                workout_plan=plan, exercise_id=exercise_id, sets=rng.randint(3, 5), reps=rng.choice(REP_TARGETS),
+            )
+            for exercise_id in rng.sample(exercise_ids, rng.randint(4, 8))
+        ]
+        rows += plan_exercises[plan.pk]
+    WorkoutExercise.objects.bulk_create(rows)
+
+    # starting weights per exercise, progressing a little every week
+    strength = {row.exercise_id: rng.uniform(10, 100) for row in rows}
+    progression = rng.uniform(0.002, 0.015)
+    # users mostly stick to their first plans
+    plan_weights = [1 / (n + 1) for n in range(len(plans))]
+
+    logs, planned = [], []
+    for offset in range(active_days):
+        if rng.random() >= sessions_per_week / 7:
+            continue
+        plan = rng.choices(plans, plan_weights)[0]
+        logs.append(WorkoutLog(
+            user=user, workout_plan=plan, date=start + timedelta(days=offset),
+            duration=max(10, min(180, int(rng.gauss(55, 15)))), intensity=max(1, min(10, round(rng.gauss(6, 1.5)))),
+            notes=rng.choice(NOTES),
+        ))
+        planned.append((offset, plan_exercises[plan.pk]))
+    WorkoutLog.objects.bulk_create(logs, batch_size=500)
+
+    sets = []
+    for log, (offset, exercises) in zip(logs, planned):
+        for row in exercises:
+            target = strength[row.exercise_id] * (1 + progression) ** (offset / 7)
+            for _ in range(row.sets):
+                sets.append(WorkoutSet(
+                    log=log, user=user, exercise_id=row.exercise_id,
+                    reps=max(1, row.reps + rng.randint(-2, 1)),
+                    weight=round(target * rng.uniform(0.95, 1.05) / 2.5) * 2.5,
+                ))
+    WorkoutSet.objects.bulk_create(sets, batch_size=1000)
+
+    return {'plans': len(plans), 'plan_exercises': len(rows), 'logs': len(logs), 'sets': len(sets)}
@@ -1,3 +1,1379 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import tracemalloc
+from datetime import timedelta
+from io import StringIO
+from itertools import islice
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .benchmarks import ROUTE_REQUESTS, compare_results, routes
+from .cache import cache_stats, get_cache, reset_cache_stats
+from .imports import iter_json_items
+from .jobs import TASKS, Task, Worker, claim, enqueue, requeue_stale, run_job
+from .load import find_stale_training_load, rolling_series
+from .metrics import MetricsMiddleware, registry
+from .models import Coaching, Exercise, Job, PersonalRecord, Tombstone, TrainingLoad, WorkoutPlan, WorkoutExercise, WorkoutLog, WorkoutSet, WorkoutStats
+from .records import find_stale_records
+from .representation import ValuesRepresentation, get_values_representation
+from .search import search_exercises
+from .serializers import ExerciseSerializer, WorkoutLogSerializer, WorkoutPlanSerializer
+from .stats import find_stale_stats
+from .sync import decode_watermark, encode_watermark
+
+User = get_user_model()
+
+
+class QueryCountTestCase(TestCase):
+    """Asserts that an endpoint issues the same number of queries for small and large data sets"""
+
+    def setUp(self):
+        get_cache().clear()
+        reset_cache_stats()
+        self.user = User.objects.create_user(username='athlete', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def seed(self, plans, exercises_per_plan=3, logs_per_plan=2):
+        for i in range(plans):
+            plan = WorkoutPlan.objects.create(user=self.user, title=f'Plan {i}')
+            for j in range(exercises_per_plan):
+                exercise = Exercise.objects.create(name=f'Exercise {plan.pk}-{j}')
+                WorkoutExercise.objects.create(workout_plan=plan, exercise=exercise)
+            for _ in range(logs_per_plan):
+                WorkoutLog.objects.create(user=self.user, workout_plan=plan)
+
+    def assertConstantQueries(self, expected, url_factory, sizes=(1, 8)):
+        for size in sizes:
+            self.seed(size)
+            url = url_factory()
+            with self.assertNumQueries(expected):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+
+class EndpointQueryCountTests(QueryCountTestCase):
+    # keyset-paginated lists: page query (+ one query per prefetch); exercises add a COUNT
+
+    def test_workout_plan_list(self):
+        self.assertConstantQueries(2, lambda: '/api/workout-plans/')
+
+    def test_workout_plan_detail(self):
+        self.assertConstantQueries(2, lambda: f'/api/workout-plans/{WorkoutPlan.objects.last().pk}/')
+
+    def test_exercise_list(self):
+        self.assertConstantQueries(2, lambda: '/api/exercises/')
+
+    def test_exercise_detail(self):
+        self.assertConstantQueries(1, lambda: f'/api/exercises/{Exercise.objects.last().pk}/')
+
+    def test_workout_log_list(self):
+        self.assertConstantQueries(2, lambda: '/api/workout-logs/')
+
+    def test_workout_log_detail(self):
+        self.assertConstantQueries(2, lambda: f'/api/workout-logs/{WorkoutLog.objects.last().pk}/')
+
+    def test_workout_plan_detail_by_uuid(self):
+        self.assertConstantQueries(2, lambda: f'/api/workout-plans/{WorkoutPlan.objects.last().uuid}/')
+
+    def test_details_by_uuid_match_details_by_id(self):
+        self.seed(1)
+        for url, row in (('/api/workout-plans/', WorkoutPlan.objects.get()), ('/api/workout-logs/', WorkoutLog.objects.last())):
+            by_id = self.client.get(f'{url}{row.pk}/').data
+            self.assertEqual(self.client.get(f'{url}{row.uuid}/').data, by_id)
+            self.assertEqual((by_id['uuid'], by_id['id']), (str(row.uuid), row.pk))
+        response = self.client.patch(f'/api/workout-logs/{row.uuid}/', {'duration': 45})
+        self.assertEqual((response.status_code, response.data['duration']), (200, 45))
+        self.assertEqual(response.data['created_at'], by_id['created_at'])
+
+    def test_plan_list_includes_nested_exercises(self):
+        self.seed(2)
+        response = self.client.get('/api/workout-plans/')
+        self.assertEqual([len(plan['exercises']) for plan in response.data['results']], [3, 3])
+
+
+class WorkoutStatsTests(QueryCountTestCase):
+
+    def get_stats(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_stats_follow_log_and_plan_writes(self):
+        plan = WorkoutPlan.objects.create(user=self.user, title='Push')
+        first = WorkoutLog.objects.create(user=self.user, workout_plan=plan, duration=30)
+        WorkoutLog.objects.create(user=self.user, workout_plan=plan, duration=60)
+        self.assertEqual(self.get_stats(), {
+            'total_workouts': 2,
+            'total_plans': 1,
+            'weekly_workouts': 2,
+            'average_duration': 45.0,
+            'total_duration': 90,
+        })
+
+        first.duration = 50
+        first.save()
+        self.assertEqual(self.get_stats()['total_duration'], 110)
+
+        first.delete()
+        stats = self.get_stats()
+        self.assertEqual((stats['total_workouts'], stats['weekly_workouts'], stats['total_duration']), (1, 1, 60))
+
+        plan.delete()
+        self.assertEqual(self.get_stats(), {
+            'total_workouts': 0,
+            'total_plans': 0,
+            'weekly_workouts': 0,
+            'average_duration': 0,
+            'total_duration': 0,
+        })
+
+    def test_stats_for_user_without_history(self):
+        self.assertEqual(self.get_stats()['total_workouts'], 0)
+
+    def test_rebuild_command_repairs_stale_rows(self):
+        self.seed(3)
+        call_command('rebuild_workout_stats', '--check', stdout=StringIO())
+
+        WorkoutStats.objects.filter(user=self.user).update(total_workouts=99)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_workout_stats', '--check', stdout=StringIO(), stderr=StringIO())
+
+        call_command('rebuild_workout_stats', stdout=StringIO())
+        call_command('rebuild_workout_stats', '--check', stdout=StringIO())
+        self.assertEqual(self.get_stats()['total_workouts'], 6)
+
+
+class BulkWorkoutLogTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.plan = WorkoutPlan.objects.create(user=self.user, title='Pull')
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.foreign_plan = WorkoutPlan.objects.create(user=other, title='Not mine')
+
+    def test_bulk_reports_result_per_item(self):
+        payload = [
+            {'client_key': 'a', 'workout_plan': self.plan.pk, 'duration': 30, 'date': '2024-01-02'},
+            {'client_key': 'b', 'workout_plan': self.foreign_plan.pk},
+            {'client_key': 'c', 'workout_plan': self.plan.pk, 'duration': -5},
+            {'client_key': 'a', 'workout_plan': self.plan.pk, 'duration': 45},
+            {'workout_plan': self.plan.pk, 'duration': 20},
+        ]
+        response = self.client.post('/api/workout-logs/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['duplicates'], response.data['errors']), (2, 1, 2))
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['created', 'error', 'error', 'duplicate', 'created'])
+        self.assertEqual(response.data['results'][3]['id'], response.data['results'][0]['id'])
+        self.assertEqual(str(WorkoutLog.objects.get(client_key='a').date), '2024-01-02')
+        self.assertEqual(WorkoutStats.objects.get(user=self.user).total_duration, 50)
+
+    def test_bulk_is_idempotent_on_client_key(self):
+        payload = [{'client_key': f'k{i}', 'workout_plan': self.plan.pk} for i in range(5)]
+        self.client.post('/api/workout-logs/bulk/', payload, format='json')
+        response = self.client.post('/api/workout-logs/bulk/', payload, format='json')
+        self.assertEqual((response.data['created'], response.data['duplicates']), (0, 5))
+        self.assertEqual(WorkoutLog.objects.filter(user=self.user).count(), 5)
+
+    def test_bulk_accepts_ndjson_stream(self):
+        lines = [f'{{"client_key": "n{i}", "workout_plan": {self.plan.pk}, "duration": 10}}' for i in range(3)]
+        body = '\n'.join(lines + ['not json', ''])
+        response = self.client.post('/api/workout-logs/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['errors']), (3, 1))
+
+    def test_bulk_query_count_does_not_grow_with_batch(self):
+        # plan ids, key lookup, insert, stats row read + write, plus savepoints
+        for size in (5, 50):
+            payload = [{'client_key': f's{size}-{i}', 'workout_plan': self.plan.pk} for i in range(size)]
+            with self.assertNumQueries(9):
+                self.client.post('/api/workout-logs/bulk/', payload, format='json')
+
+    def test_bulk_rejects_non_list_payload(self):
+        response = self.client.post('/api/workout-logs/bulk/', {'workout_plan': self.plan.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class WorkoutPlanNestedWriteTests(QueryCountTestCase):
+
+    def plan_payload(self, count, prefix='Move'):
+        return {
+            'title': 'Full body',
+            'description': '',
+            'exercises': [{'name': f'{prefix} {i}', 'sets': 4, 'reps': 8} for i in range(count)],
+        }
+
+    def test_create_resolves_exercises_in_constant_queries(self):
+        Exercise.objects.create(name='Move 0', description='existing')
+        # insert plan, stats row read + write, look up names, insert missing, re-read them,
+        # insert through rows, the response's exercise fetch, and two savepoint pairs
+        for count in (3, 30):
+            with self.assertNumQueries(12):
+                response = self.client.post('/api/workout-plans/', self.plan_payload(count), format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data['exercises']), count)
+
+        self.assertEqual(Exercise.objects.filter(name='Move 0').count(), 1)
+        self.assertEqual(Exercise.objects.get(name='Move 0').description, 'existing')
+        self.assertEqual(set(WorkoutExercise.objects.values_list('sets', 'reps')), {(4, 8)})
+
+    def test_update_replaces_exercises(self):
+        response = self.client.post('/api/workout-plans/', self.plan_payload(3), format='json')
+        url = f"/api/workout-plans/{response.data['id']}/"
+
+        response = self.client.put(url, self.plan_payload(2, prefix='Lift'), format='json')
+        self.assertEqual(response.status_code, 200)
+        plan = WorkoutPlan.objects.get(pk=response.data['id'])
+        self.assertEqual(sorted(plan.exercises.values_list('name', flat=True)), ['Lift 0', 'Lift 1'])
+
+        response = self.client.patch(url, {'title': 'Renamed'}, format='json')
+        self.assertEqual(len(response.data['exercises']), 2)
+
+
+class KeysetPaginationTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.plan = WorkoutPlan.objects.create(user=self.user, title='Legs')
+
+    def create_logs(self, dates):
+        return [WorkoutLog.objects.create(user=self.user, workout_plan=self.plan, date=date) for date in dates]
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(log['id'] for log in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_follow_date_then_id_without_gaps(self):
+        logs = self.create_logs(['2024-03-01', '2024-03-02', '2024-03-01', '2024-03-03', '2024-03-02'] * 3)
+        expected = [log.pk for log in sorted(logs, key=lambda log: (log.date, log.pk), reverse=True)]
+        self.assertEqual(self.walk('/api/workout-logs/?page_size=4'), expected)
+        self.assertNotIn('count', self.client.get('/api/workout-logs/').data)
+
+    def test_newer_than_returns_only_added_rows(self):
+        self.create_logs(['2024-03-01', '2024-03-02'])
+        newer = self.client.get('/api/workout-logs/').data['newer']
+
+        response = self.client.get(f'/api/workout-logs/?newer_than={newer}')
+        self.assertEqual((response.data['results'], response.data['newer']), ([], newer))
+
+        added = self.create_logs(['2024-03-02', '2024-03-04', '2024-03-05'])
+        self.assertEqual(self.walk(f'/api/workout-logs/?newer_than={newer}&page_size=2'), [log.pk for log in added])
+
+    def test_newer_than_returns_backdated_rows(self):
+        self.create_logs(['2024-03-01', '2024-03-05'])
+        newer = self.client.get('/api/workout-logs/').data['newer']
+
+        backdated = self.create_logs(['2023-12-31', '2024-03-03'])
+        response = self.client.get(f'/api/workout-logs/?newer_than={newer}')
+        self.assertEqual([log['id'] for log in response.data['results']], [log.pk for log in backdated])
+
+        response = self.client.get(f"/api/workout-logs/?newer_than={response.data['newer']}")
+        self.assertEqual(response.data['results'], [])
+
+    def test_plan_list_is_keyset_paginated(self):
+        plans = [WorkoutPlan.objects.create(user=self.user, title=f'Plan {i}') for i in range(5)]
+        expected = [plan.pk for plan in reversed([self.plan] + plans)]
+        self.assertEqual(self.walk('/api/workout-plans/?page_size=2'), expected)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/workout-logs/?cursor=bogus').status_code, 404)
+
+
+class OwnerScopingTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username='rival', password='pass12345')
+        self.own_plan = WorkoutPlan.objects.create(user=self.user, title='Mine')
+        self.other_plan = WorkoutPlan.objects.create(user=self.other, title='Theirs')
+        self.other_log = WorkoutLog.objects.create(user=self.other, workout_plan=self.other_plan)
+
+    def test_lists_and_details_only_show_own_rows(self):
+        plans = self.client.get('/api/workout-plans/').data['results']
+        self.assertEqual([plan['id'] for plan in plans], [self.own_plan.pk])
+        self.assertEqual(self.client.get('/api/workout-logs/').data['results'], [])
+        self.assertEqual(self.client.get(f'/api/workout-plans/{self.other_plan.pk}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/workout-logs/{self.other_log.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/workout-plans/{self.other_plan.uuid}/').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/workout-logs/{self.other_log.uuid}/').status_code, 404)
+
+    def test_log_create_assigns_owner_and_checks_plan(self):
+        response = self.client.post('/api/workout-logs/', {'workout_plan': self.own_plan.pk, 'user': self.other.pk})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['user'], self.user.pk)
+
+        response = self.client.post('/api/workout-logs/', {'workout_plan': self.other_plan.pk})
+        self.assertEqual(response.status_code, 400)
+
+    def test_only_staff_change_the_exercise_catalog(self):
+        exercise = Exercise.objects.create(name='Squat')
+        WorkoutExercise.objects.create(workout_plan=self.other_plan, exercise=exercise)
+        self.assertEqual(self.client.get(f'/api/exercises/{exercise.pk}/').status_code, 200)
+        self.assertEqual(self.client.post('/api/exercises/', {'name': 'Lunge'}).status_code, 403)
+        self.assertEqual(self.client.patch(f'/api/exercises/{exercise.pk}/', {'name': 'Renamed'}).status_code, 403)
+        self.assertEqual(self.client.delete(f'/api/exercises/{exercise.pk}/').status_code, 403)
+        self.assertTrue(WorkoutExercise.objects.filter(exercise=exercise).exists())
+
+    def test_exercise_names_are_unique(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.post('/api/exercises/', {'name': 'Squat'}).status_code, 201)
+        self.assertEqual(self.client.post('/api/exercises/', {'name': 'Squat'}).status_code, 400)
+
+
+class ResponseCacheTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.plan = WorkoutPlan.objects.create(user=self.user, title='Core')
+
+    def test_repeated_reads_are_served_from_cache(self):
+        self.client.get('/api/workout-plans/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/workout-plans/')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get('/api/stats/')['ETag']
+        response = self.client.get('/api/stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_writes_invalidate_only_the_owner(self):
+        other = User.objects.create_user(username='bystander', password='pass12345')
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        other_client.get('/api/workout-logs/')
+        etag = self.client.get('/api/workout-logs/')['ETag']
+
+        self.client.post('/api/workout-logs/', {'workout_plan': self.plan.pk, 'duration': 20})
+        response = self.client.get('/api/workout-logs/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        with self.assertNumQueries(0):
+            other_client.get('/api/workout-logs/')
+
+    def test_bulk_writes_invalidate(self):
+        self.client.get('/api/stats/')
+        self.client.post('/api/workout-logs/bulk/', [{'workout_plan': self.plan.pk}], format='json')
+        self.assertEqual(self.client.get('/api/stats/').data['total_workouts'], 1)
+
+    def test_counters_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/cache/stats/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertIn('hit_ratio', self.client.get('/api/cache/stats/').data)
+
+    def test_cache_is_per_user(self):
+        other = User.objects.create_user(username='snoop', password='pass12345')
+        self.client.get('/api/workout-plans/')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get('/api/workout-plans/').data['results'], [])
+
+
+class AnalyticsTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.plan = WorkoutPlan.objects.create(user=self.user, title='Strength')
+        squat = Exercise.objects.create(name='Squat')
+        bench = Exercise.objects.create(name='Bench')
+        WorkoutExercise.objects.create(workout_plan=self.plan, exercise=squat, sets=5, reps=5)
+        WorkoutExercise.objects.create(workout_plan=self.plan, exercise=bench, sets=3, reps=10)
+        for date, duration in (('2024-01-01', 30), ('2024-01-03', 40), ('2024-01-08', 50), ('2024-02-01', 60)):
+            WorkoutLog.objects.create(user=self.user, workout_plan=self.plan, date=date, duration=duration)
+
+    def get(self, query):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/analytics/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_weekly_buckets(self):
+        data = self.get('period=week&start=2024-01-01&end=2024-01-31')
+        self.assertEqual(
+            [(str(row['bucket']), row['workouts'], row['duration']) for row in data['series']],
+            [('2024-01-01', 2, 70), ('2024-01-08', 1, 50)],
+        )
+        squat = next(exercise for exercise in data['exercises'] if exercise['name'] == 'Squat')
+        self.assertEqual([row['volume'] for row in squat['series']], [50, 25])
+
+    def test_monthly_buckets(self):
+        data = self.get('period=month&start=2024-01-01&end=2024-12-31')
+        self.assertEqual([row['workouts'] for row in data['series']], [3, 1])
+        self.assertEqual([exercise['name'] for exercise in data['exercises']], ['Bench', 'Squat'])
+
+    def test_invalid_range(self):
+        response = self.client.get('/api/analytics/?start=2024-02-01&end=2024-01-01')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/analytics/?period=year').status_code, 400)
+
+
+class AsyncReadViewTests(TransactionTestCase):
+    """The async views read through worker-thread connections, so their data must be committed"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='athlete', password='pass12345')
+        plan = WorkoutPlan.objects.create(user=self.user, title='Strength')
+        WorkoutExercise.objects.create(workout_plan=plan, exercise=Exercise.objects.create(name='Squat'))
+        for day in range(1, 26):
+            WorkoutLog.objects.create(user=self.user, workout_plan=plan, date=f'2024-01-{day:02d}', duration=30)
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.sync_client = APIClient()
+        self.sync_client.credentials(HTTP_AUTHORIZATION=self.auth['Authorization'])
+
+    async def test_responses_match_the_sync_views(self):
+        for name in ('stats/', 'workout-plans/', 'workout-logs/', 'workout-logs/?page_size=5'):
+            response = await self.async_client.get(f'/api/async/{name}', headers=self.auth)
+            self.assertEqual(response.status_code, 200)
+            expected = await sync_to_async(self.sync_client.get)(f'/api/{name}')
+            # only the next links differ, by the /async prefix
+            self.assertJSONEqual(response.content.decode().replace('/api/async/', '/api/'), expected.content.decode())
+
+    async def test_cursor_pages(self):
+        response = await self.async_client.get('/api/async/workout-logs/?page_size=20', headers=self.auth)
+        following = await self.async_client.get(response.json()['next'], headers=self.auth)
+        self.assertEqual(len(following.json()['results']), 5)
+        self.assertIsNone(following.json()['next'])
+        invalid = await self.async_client.get('/api/async/workout-logs/?cursor=bogus', headers=self.auth)
+        self.assertEqual(invalid.status_code, 404)
+
+    async def test_requires_an_active_user(self):
+        response = await self.async_client.get('/api/async/stats/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+
+        await User.objects.filter(pk=self.user.pk).aupdate(is_active=False)
+        response = await self.async_client.get('/api/async/workout-logs/', headers=self.auth)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'user_inactive')
+
+    async def test_get_only(self):
+        response = await self.async_client.post('/api/async/stats/', headers=self.auth)
+        self.assertEqual(response.status_code, 405)
+
+
+class ExportTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.plan = WorkoutPlan.objects.create(user=self.user, title='Strength, heavy')
+        WorkoutLog.objects.create(user=self.user, workout_plan=self.plan, date='2024-01-02', duration=40, intensity=8, notes='felt "good"')
+        WorkoutLog.objects.create(user=self.user, workout_plan=self.plan, date='2024-01-01', duration=30)
+        other = User.objects.create_user(username='other', password='pass12345')
+        WorkoutLog.objects.create(user=other, workout_plan=WorkoutPlan.objects.create(user=other, title='Other'))
+
+    def insert_logs(self, count):
+        # a recursive CTE inserts the rows in one statement, skipping per-row model overhead and signals
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s) '
+                f'INSERT INTO {WorkoutLog._meta.db_table} '
+                f'(user_id, workout_plan_id, date, duration, intensity, notes, uuid, created_at, updated_at) '
+                f"SELECT %s, %s, '2023-06-01', 45, 5, 'bulk', lower(hex(randomblob(16))), "
+                f"'2023-06-01 00:00:00', '2023-06-01 00:00:00' FROM n",
+                [count, self.user.pk, self.plan.pk],
+            )
+
+    def test_csv_export(self):
+        response = self.client.get('/api/workout-logs/export/')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('workout-logs.csv', response['Content-Disposition'])
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['id', 'date', 'workout_plan', 'plan_title', 'duration', 'intensity', 'notes', 'client_key'])
+        self.assertEqual([row[1] for row in rows[1:]], ['2024-01-01', '2024-01-02'])
+        self.assertEqual(rows[2][3:7], ['Strength, heavy', '40', '8', 'felt "good"'])
+
+    def test_ndjson_export(self):
+        response = self.client.get('/api/workout-logs/export/?format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['date'], '2024-01-01')
+        self.assertEqual(rows[0]['plan_title'], 'Strength, heavy')
+
+    def assertMemoryStaysFlat(self, rows):
+        self.insert_logs(rows - 2)
+
+        def peak_while_streaming(limit):
+            response = self.client.get('/api/workout-logs/export/?format=ndjson')
+            tracemalloc.start()
+            try:
+                count = sum(chunk.count(b'\n') for chunk in islice(response.streaming_content, limit))
+                return count, tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+                response.close()
+
+        # chunks hold 500 lines each; the first 20 are 10,000 lines
+        small_count, small_peak = peak_while_streaming(20)
+        full_count, full_peak = peak_while_streaming(None)
+        self.assertEqual(small_count, 10_000)
+        self.assertEqual(full_count, rows)
+        self.assertLess(full_peak, small_peak * 1.5 + 256 * 1024)
+
+    def test_memory_stays_flat_for_a_hundred_thousand_rows(self):
+        self.assertMemoryStaysFlat(100_000)
+
+    @skipUnless(os.environ.get('RUN_SLOW_TESTS'), 'inserts a million rows; set RUN_SLOW_TESTS=1 to run it')
+    def test_memory_stays_flat_for_a_million_rows(self):
+        self.assertMemoryStaysFlat(1_000_000)
+
+
+class ImportCommandTests(QueryCountTestCase):
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def setUp(self):
+        super().setUp()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.tmpdir = tmpdir.name
+
+    def call(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_workouts', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_exercises_resolve_against_the_catalog(self):
+        Exercise.objects.create(name='Squat')
+        path = self.write('catalog.csv', 'name,description\nSquat,x\nDeadlift,"hinge, heavy"\nDeadlift,again\n,\n')
+        out, err = self.call(path, '--kind', 'exercises')
+        self.assertIn('1 created', out)
+        self.assertIn('row 4: name', err)
+        self.assertEqual(Exercise.objects.get(name='Deadlift').description, 'hinge, heavy')
+
+    def test_plans_and_logs_keep_stats_current_and_are_idempotent(self):
+        plans = self.write('plans.json', json.dumps([
+            {'plan': 'Legs', 'exercise': 'Squat', 'sets': 5, 'reps': 5},
+            {'plan': 'Legs', 'exercise': 'Lunge'},
+        ]))
+        logs = self.write('logs.ndjson', '\n'.join(json.dumps(row) for row in [
+            {'plan': 'Legs', 'date': '2024-01-01', 'duration': 30, 'intensity': 8},
+            {'plan': 'Push', 'date': '2024-01-02', 'duration': 40, 'notes': 'new plan'},
+        ]))
+        for _ in range(2):
+            self.call(plans, '--kind', 'plans', '--user', 'athlete')
+            self.call(logs, '--kind', 'logs', '--user', 'athlete')
+
+        legs = WorkoutPlan.objects.get(user=self.user, title='Legs')
+        self.assertEqual(sorted(legs.workoutexercise_set.values_list('exercise__name', 'sets')), [('Lunge', 3), ('Squat', 5)])
+        self.assertEqual(sorted(WorkoutLog.objects.filter(user=self.user).values_list('intensity', flat=True)), [5, 8])
+        self.assertEqual(self.user.workout_stats.total_plans, 2)
+        self.assertEqual(self.user.workout_stats.total_duration, 70)
+        self.assertEqual(find_stale_stats(), [])
+
+    def test_exercises_added_to_an_existing_plan_refresh_the_cached_list(self):
+        plan = WorkoutPlan.objects.create(user=self.user, title='Legs')
+        WorkoutExercise.objects.create(workout_plan=plan, exercise=Exercise.objects.create(name='Squat'))
+        self.assertEqual(len(self.client.get('/api/workout-plans/').data['results'][0]['exercises']), 1)
+
+        self.call(self.write('plans.json', json.dumps([{'plan': 'Legs', 'exercise': 'Lunge'}])), '--kind', 'plans', '--user', 'athlete')
+        self.assertEqual(len(self.client.get('/api/workout-plans/').data['results'][0]['exercises']), 2)
+
+    def test_resume_skips_committed_rows(self):
+        rows = [{'plan': 'Legs', 'date': f'2024-01-{day:02d}', 'duration': day} for day in range(1, 11)]
+        path = self.write('logs.json', json.dumps(rows))
+        with open(f'{path}.import-state', 'w') as state:
+            json.dump({'kind': 'logs', 'rows': 6}, state)
+
+        out, _ = self.call(path, '--kind', 'logs', '--user', 'athlete', '--resume', '--chunk-size', '3')
+        self.assertIn('Imported 4 logs row(s)', out)
+        self.assertEqual(sorted(WorkoutLog.objects.values_list('duration', flat=True)), [7, 8, 9, 10])
+        self.assertFalse(os.path.exists(f'{path}.import-state'))
+
+    def test_json_items_are_read_across_block_boundaries(self):
+        items = [{'name': f'Exercise {i}', 'note': 'x' * i} for i in range(50)]
+        for text in (json.dumps(items), '\n'.join(json.dumps(item) for item in items)):
+            self.assertEqual(list(iter_json_items(StringIO(text), read_size=7)), items)
+        with self.assertRaises(ValueError):
+            list(iter_json_items(StringIO('[{"name": "x"}, {"na'), read_size=7))
+
+
+class ValuesRepresentationTests(QueryCountTestCase):
+
+    class NestedPlanLogSerializer(serializers.ModelSerializer):
+        workout_plan = WorkoutPlanSerializer(read_only=True)
+
+        class Meta:
+            model = WorkoutLog
+            fields = ['id', 'workout_plan', 'date', 'duration', 'notes']
+
+    def setUp(self):
+        super().setUp()
+        self.seed(3)
+        WorkoutLog.objects.filter(pk=WorkoutLog.objects.first().pk).update(client_key='phone-1', notes='ünïcode')
+
+    def assertSameBytes(self, serializer_class, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        representation = ValuesRepresentation(serializer_class)
+        rows = list(queryset.values(*representation.value_names))
+        self.assertEqual(JSONRenderer().render(representation.to_representation(rows)), expected)
+
+    def test_output_is_byte_identical(self):
+        self.assertSameBytes(WorkoutLogSerializer, WorkoutLog.objects.order_by('-date', '-id'))
+        self.assertSameBytes(WorkoutPlanSerializer, WorkoutPlan.objects.order_by('-id'))
+        self.assertSameBytes(ExerciseSerializer, Exercise.objects.order_by('id'))
+        self.assertSameBytes(self.NestedPlanLogSerializer, WorkoutLog.objects.order_by('id'))
+
+    def test_shared_nested_plans_are_built_once(self):
+        representation = ValuesRepresentation(self.NestedPlanLogSerializer)
+        rows = list(WorkoutLog.objects.order_by('id').values(*representation.value_names))
+        # logs, then their 3 distinct plans, then the plans' exercises
+        with self.assertNumQueries(2):
+            data = representation.to_representation(rows)
+        self.assertEqual(len(data), 6)
+        self.assertIs(data[0]['workout_plan'], data[1]['workout_plan'])
+
+    def test_list_endpoints_match_the_serializer(self):
+        for url, serializer_class, queryset in (
+            ('/api/workout-logs/?page_size=100', WorkoutLogSerializer, WorkoutLog.objects.order_by('-date', '-id')),
+            ('/api/workout-plans/?page_size=100', WorkoutPlanSerializer, WorkoutPlan.objects.order_by('-id')),
+        ):
+            results = self.client.get(url).data['results']
+            self.assertEqual(JSONRenderer().render(results), JSONRenderer().render(serializer_class(queryset, many=True).data))
+
+    def test_unsupported_fields_fall_back_to_the_serializer(self):
+        class DottedSerializer(serializers.ModelSerializer):
+            plan_title = serializers.CharField(source='workout_plan.title')
+
+            class Meta:
+                model = WorkoutLog
+                fields = ['id', 'plan_title']
+
+        self.assertIsNone(get_values_representation(DottedSerializer))
+
+
+class ExerciseSearchTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        names = [
+            'Bench Press', 'Bench Press 2', 'Incline Dumbbell Bench Press', 'Dumbbell Bench Press',
+            'Paused Cable Row', 'Paused Cable Row 2', 'Cable Fly', 'Deadlift', 'Romanian Deadlift', 'Décline Squat',
+        ]
+        Exercise.objects.bulk_create(Exercise(name=name) for name in names)
+
+    def names(self, query, limit=10):
+        return [exercise.name for exercise in search_exercises(query, limit)]
+
+    def test_exact_name_then_name_prefix_then_word_prefixes(self):
+        self.assertEqual(
+            self.names('bench press'),
+            ['Bench Press', 'Bench Press 2', 'Dumbbell Bench Press', 'Incline Dumbbell Bench Press'],
+        )
+        self.assertEqual(self.names('dead'), ['Deadlift', 'Romanian Deadlift'])
+        self.assertEqual(self.names('dumb ben pr', limit=1), ['Dumbbell Bench Press'])
+
+    def test_accents_are_folded(self):
+        self.assertEqual(self.names('decline'), ['Décline Squat'])
+
+    def test_misspelled_words_are_corrected(self):
+        self.assertEqual(self.names('pasued cabel row'), ['Paused Cable Row', 'Paused Cable Row 2'])
+        self.assertEqual(self.names('deadlfit'), ['Deadlift', 'Romanian Deadlift'])
+        self.assertEqual(self.names('zxqv'), [])
+        self.assertEqual(self.names('"*( )'), [])
+
+    def test_index_follows_renames_and_deletes(self):
+        Exercise.objects.filter(name='Cable Fly').update(name='Pec Deck')
+        Exercise.objects.filter(name='Deadlift').delete()
+        self.assertEqual(self.names('pec'), ['Pec Deck'])
+        self.assertEqual(self.names('cable fly'), [])
+        self.assertEqual(self.names('deadlift'), ['Romanian Deadlift'])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/exercises/search/', {'q': 'cable', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.data], ['Cable Fly', 'Paused Cable Row'])
+        self.assertEqual(set(response.data[0]), {'id', 'name', 'description'})
+        self.assertEqual(self.client.get('/api/exercises/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/exercises/search/', {'q': 'row', 'limit': 51}).status_code, 400)
+
+
+class PersonalRecordTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.plan = WorkoutPlan.objects.create(user=self.user, title='Strength')
+        self.squat = Exercise.objects.create(name='Squat')
+        self.bench = Exercise.objects.create(name='Bench Press')
+
+    def log(self, *sets):
+        response = self.client.post('/api/workout-logs/', {
+            'workout_plan': self.plan.pk,
+            'sets': [{'exercise': exercise.pk, 'reps': reps, 'weight': weight} for exercise, reps, weight in sets],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def records(self):
+        return {
+            record.exercise_id: (record.max_weight, round(record.estimated_1rm, 2), record.best_volume)
+            for record in PersonalRecord.objects.filter(user=self.user)
+        }
+
+    def test_records_are_raised_by_new_sets(self):
+        self.log((self.squat, 5, 100), (self.squat, 5, 100), (self.bench, 1, 80))
+        self.assertEqual(self.records(), {self.squat.pk: (100, 116.67, 1000), self.bench.pk: (80, 80, 80)})
+        self.log((self.squat, 1, 110), (self.bench, 10, 50))
+        self.assertEqual(self.records(), {self.squat.pk: (110, 116.67, 1000), self.bench.pk: (80, 80, 500)})
+        self.assertEqual(find_stale_records(), [])
+        self.assertEqual(find_stale_training_load(), [])
+
+    def test_log_writes_take_constant_queries(self):
+        for size in (1, 10):
+            for _ in range(size):
+                self.log((self.squat, 5, 100), (self.bench, 5, 60))
+            # one record raised, one untouched
+            with self.assertNumQueries(15):
+                self.log((self.squat, 5, 100 + size), (self.bench, 5, 50))
+
+    def test_deleting_the_record_log_recomputes_it(self):
+        best = self.log((self.squat, 3, 140))
+        self.log((self.squat, 5, 120), (self.bench, 5, 60))
+        self.assertEqual(self.client.delete(f'/api/workout-logs/{best["id"]}/').status_code, 204)
+        self.assertEqual(self.records(), {self.squat.pk: (120, 140, 600), self.bench.pk: (60, 70, 300)})
+
+        self.plan.delete()
+        self.assertEqual(self.records(), {})
+        self.assertEqual(find_stale_records(), [])
+
+    def test_deleting_a_plan_reads_its_sets_once(self):
+        set_reads = []
+        for size in (1, 8):
+            self.plan = WorkoutPlan.objects.create(user=self.user, title=f'Plan of {size}')
+            for _ in range(size):
+                self.log((self.squat, 5, 100), (self.bench, 5, 60))
+            with CaptureQueriesContext(connection) as queries:
+                self.plan.delete()
+            set_reads.append(sum(
+                query['sql'].startswith('SELECT') and 'FROM "api_workoutset"' in query['sql']
+                for query in queries.captured_queries
+            ))
+        self.assertEqual(set_reads[0], set_reads[1])
+        self.assertEqual(self.records(), {})
+        self.assertEqual(find_stale_records(), [])
+
+    def test_replacing_sets_retracts_the_old_ones(self):
+        log = self.log((self.squat, 5, 100))
+        response = self.client.patch(f'/api/workout-logs/{log["id"]}/', {
+            'sets': [{'exercise': self.bench.pk, 'reps': 5, 'weight': 60}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([item['exercise'] for item in response.data['sets']], [self.bench.pk])
+        self.assertEqual(self.records(), {self.bench.pk: (60, 70, 300)})
+
+    def test_bulk_upload_logs_sets(self):
+        response = self.client.post('/api/workout-logs/bulk/', [
+            {'workout_plan': self.plan.pk, 'sets': [{'exercise': self.squat.pk, 'reps': 2, 'weight': 150}]},
+            {'workout_plan': self.plan.pk, 'sets': [{'exercise': 999999, 'reps': 2, 'weight': 150}]},
+        ], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'error'])
+        self.assertEqual(self.records(), {self.squat.pk: (150, 160, 300)})
+        self.assertEqual(WorkoutSet.objects.get().user, self.user)
+
+    def test_unknown_exercises_are_rejected(self):
+        response = self.client.post('/api/workout-logs/', {
+            'workout_plan': self.plan.pk, 'sets': [{'exercise': 999999, 'reps': 5}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WorkoutLog.objects.exists())
+
+    def test_endpoint_lists_own_records(self):
+        self.log((self.squat, 5, 100), (self.bench, 5, 60))
+        other = User.objects.create_user(username='other', password='pass12345')
+        PersonalRecord.objects.create(user=other, exercise=self.squat, max_weight=300)
+        response = self.client.get('/api/records/')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual([record['exercise']['name'] for record in results], ['Bench Press', 'Squat'])
+        self.assertEqual(results[1]['max_weight'], 100)
+
+    def test_check_command_detects_and_rebuild_repairs(self):
+        self.log((self.squat, 5, 100))
+        PersonalRecord.objects.filter(user=self.user).update(max_weight=90)
+        with self.assertRaisesMessage(CommandError, '1 stale personal record(s) found'):
+            call_command('rebuild_personal_records', '--check', stderr=StringIO())
+        call_command('rebuild_personal_records', stdout=StringIO())
+        call_command('rebuild_personal_records', '--check', stdout=StringIO())
+        self.assertEqual(self.records(), {self.squat.pk: (100, 116.67, 500)})
+
+
+class MetricsTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.seed(3)
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/workout-plans/')
+        db, serialize, total = response['Server-Timing'].split(', ')
+        self.assertRegex(db, r'^db;dur=[\d.]+;desc="2 queries"$')
+        self.assertRegex(serialize, r'^serialize;dur=[\d.]+$')
+        self.assertRegex(total, r'^total;dur=[\d.]+$')
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_prometheus_endpoint(self):
+        self.client.get('/api/workout-plans/')
+        self.client.get('/api/workout-plans/')
+        self.client.get('/api/nowhere/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        lines = response.content.decode().splitlines()
+        labels = 'view="workoutplan-list",method="GET"'
+        self.assertIn(f'fittrack_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', lines)
+        self.assertIn(f'fittrack_http_request_duration_seconds_count{{{labels}}} 2', lines)
+        self.assertIn(f'fittrack_http_responses_total{{{labels},status="200"}} 2', lines)
+        # the second request is answered from the response cache
+        self.assertIn(f'fittrack_db_queries_total{{{labels}}} 2', lines)
+        self.assertIn('fittrack_http_responses_total{view="unmatched",method="GET",status="404"} 1', lines)
+        serializer_seconds = next(line for line in lines if line.startswith(f'fittrack_serializer_duration_seconds_total{{{labels}}}'))
+        self.assertGreater(float(serializer_seconds.split()[-1]), 0)
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_unknown_methods_share_one_label(self):
+        for method in ('BREW', 'PROPFIND'):
+            self.client.generic(method, '/api/workout-plans/')
+        self.assertEqual(self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-mf').status_code, 403)
+        lines = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-me').content.decode().splitlines()
+        self.assertIn('fittrack_http_request_duration_seconds_count{view="workoutplan-list",method="OTHER"} 2', lines)
+        self.assertFalse(any('BREW' in line or 'PROPFIND' in line for line in lines))
+
+    def test_no_token_configured_closes_the_endpoint(self):
+        self.assertEqual(self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    @override_settings(METRICS_QUERY_LOG_THRESHOLD=1)
+    def test_requests_over_the_query_threshold_log_their_sql(self):
+        with self.assertLogs('api.metrics', 'WARNING') as logs:
+            self.client.get('/api/workout-plans/')
+        self.assertIn('GET /api/workout-plans/ ran 2 queries (threshold 1)', logs.output[0])
+        self.assertIn('FROM "api_workoutexercise"', logs.output[0])
+
+        with self.assertNoLogs('api.metrics', 'WARNING'):
+            self.client.get(f'/api/exercises/{Exercise.objects.first().pk}/')
+
+    @override_settings(METRICS_QUERY_LOG_THRESHOLD=0)
+    def test_sql_is_not_kept_without_a_threshold(self):
+        with mock.patch.object(registry, 'record') as record:
+            self.client.get('/api/workout-plans/')
+        request_metrics = record.call_args.args[-1]
+        self.assertEqual(request_metrics.queries, 2)
+        self.assertIsNone(request_metrics.statements)
+
+    async def test_async_requests_stay_in_the_event_loop(self):
+        async def view(request):
+            return HttpResponse('ok')
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get('/api/nowhere/'))
+        self.assertTrue(response['Server-Timing'].startswith('db;dur='))
+        self.assertIn('fittrack_http_responses_total{view="unmatched",method="GET",status="200"} 1', registry.render())
+
+    @override_settings(METRICS_QUERY_LOG_THRESHOLD=1)
+    async def test_asgi_requests_count_the_queries_of_sync_views(self):
+        # the sync view runs its queries on a sync_to_async thread, not in the event loop
+        with self.assertLogs('api.metrics', 'WARNING') as logs:
+            response = await self.async_client.get(
+                '/api/exercises/', headers={'Authorization': f'Bearer {AccessToken.for_user(self.user)}'},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="3 queries"')
+        self.assertIn('GET /api/exercises/ ran 3 queries (threshold 1)', logs.output[0])
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTests(QueryCountTestCase):
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_first_sync_is_a_snapshot(self):
+        self.seed(2)
+        data = self.sync()
+        self.assertTrue(data['reset'])
+        self.assertFalse(data['has_more'])
+        self.assertEqual([len(data[name]) for name in ('plans', 'plan_exercises', 'logs')], [2, 6, 4])
+        self.assertEqual(data['deleted'], {'plans': [], 'plan_exercises': [], 'logs': []})
+        self.assertEqual(set(data['plan_exercises'][0]['exercise']), {'id', 'name', 'description'})
+        self.assertIn('sets', data['logs'][0])
+
+    def test_only_changes_since_the_watermark_are_sent(self):
+        self.seed(2)
+        watermark = self.sync()['watermark']
+        plan = WorkoutPlan.objects.first()
+        log = WorkoutLog.objects.last()
+        self.client.patch(f'/api/workout-plans/{plan.pk}/', {'title': 'Renamed'}, format='json')
+        self.client.delete(f'/api/workout-logs/{log.pk}/')
+
+        data = self.sync(watermark)
+        self.assertFalse(data['reset'])
+        self.assertEqual([(item['id'], item['title']) for item in data['plans']], [(plan.pk, 'Renamed')])
+        self.assertEqual(data['plan_exercises'], [])
+        self.assertEqual(data['logs'], [])
+        self.assertEqual(data['deleted']['logs'], [log.pk])
+
+        data = self.sync(data['watermark'])
+        self.assertEqual([data[name] for name in ('plans', 'plan_exercises', 'logs')], [[], [], []])
+        self.assertEqual(data['deleted'], {'plans': [], 'plan_exercises': [], 'logs': []})
+
+    def test_deletions_leave_tombstones_for_cascades_and_replaced_exercises(self):
+        self.seed(2)
+        watermark = self.sync()['watermark']
+        kept, removed = WorkoutPlan.objects.order_by('pk')
+        old_exercises = list(kept.workoutexercise_set.values_list('pk', flat=True))
+        self.client.patch(f'/api/workout-plans/{kept.pk}/', {'exercises': [{'name': 'Squat'}]}, format='json')
+        removed_exercises = list(removed.workoutexercise_set.values_list('pk', flat=True))
+        removed_logs = list(removed.workoutlog_set.values_list('pk', flat=True))
+        self.client.delete(f'/api/workout-plans/{removed.pk}/')
+
+        data = self.sync(watermark)
+        self.assertEqual(data['deleted']['plans'], [removed.pk])
+        self.assertEqual(sorted(data['deleted']['plan_exercises']), sorted(old_exercises + removed_exercises))
+        self.assertEqual(sorted(data['deleted']['logs']), sorted(removed_logs))
+        self.assertEqual([item['exercise']['name'] for item in data['plan_exercises']], ['Squat'])
+
+    def test_deleting_an_exercise_leaves_tombstones_and_resends_its_logs(self):
+        self.seed(1)
+        plan_exercise = WorkoutExercise.objects.first()
+        log = WorkoutLog.objects.first()
+        WorkoutSet.objects.create(log=log, user=self.user, exercise=plan_exercise.exercise, reps=5, weight=60)
+        watermark = self.sync()['watermark']
+        self.assertEqual(len(self.client.get('/api/workout-plans/').data['results'][0]['exercises']), 3)
+
+        plan_exercise.exercise.delete()
+        data = self.sync(watermark)
+        self.assertEqual(data['deleted']['plan_exercises'], [plan_exercise.pk])
+        self.assertEqual([(item['id'], item['sets']) for item in data['logs']], [(log.pk, [])])
+        self.assertEqual(len(self.client.get('/api/workout-plans/').data['results'][0]['exercises']), 2)
+
+    def test_pages_follow_the_watermark(self):
+        self.seed(5)
+        seen, since, pages = [], None, 0
+        while True:
+            data = self.sync(since, limit=2)
+            seen += [log['id'] for log in data['logs']]
+            since, pages = data['watermark'], pages + 1
+            if not data['has_more']:
+                break
+        # the 15 plan exercises are the longest feed
+        self.assertEqual(pages, 8)
+        self.assertEqual(sorted(seen), sorted(WorkoutLog.objects.values_list('pk', flat=True)))
+
+    def test_sync_takes_constant_queries(self):
+        # plans, plan exercises + their exercises, logs + their sets; a snapshot skips the tombstones
+        self.assertConstantQueries(5, lambda: '/api/sync/')
+
+    def test_page_watermarks_stay_behind_the_settle_window(self):
+        self.seed(2)
+        with self.settings(SYNC_SETTLE_SECONDS=60):
+            data = self.sync(limit=2)
+            settled = timezone.now() - timedelta(seconds=60)
+        self.assertTrue(data['has_more'])
+        self.assertTrue(all(moment <= settled for moment, _ in decode_watermark(data['watermark']).values()))
+
+    def test_recent_rows_are_sent_again_within_the_settle_window(self):
+        self.seed(1)
+        with self.settings(SYNC_SETTLE_SECONDS=60):
+            data = self.sync(self.sync()['watermark'])
+        self.assertEqual(len(data['plans']), 1)
+
+    def test_invalid_and_expired_watermarks(self):
+        response = self.client.get('/api/sync/', {'since': 'not-a-watermark'})
+        self.assertEqual(response.status_code, 400)
+
+        old = timezone.now() - timedelta(days=365)
+        expired = encode_watermark({name: (old, 0) for name in ('plans', 'plan_exercises', 'logs', 'deleted')})
+        self.assertTrue(self.sync(expired)['reset'])
+
+    def test_prune_command(self):
+        Tombstone.objects.create(user=self.user, kind=Tombstone.LOG, object_id=1, deleted_at=timezone.now() - timedelta(days=90))
+        Tombstone.objects.create(user=self.user, kind=Tombstone.LOG, object_id=2)
+        call_command('prune_sync_tombstones', stdout=StringIO())
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [2])
+
+
+class AthleteStatsTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.athletes = [User.objects.create_user(username=f'athlete-{n}', password='pass12345') for n in range(8)]
+        Coaching.objects.bulk_create([Coaching(coach=self.user, athlete=athlete) for athlete in self.athletes])
+        for n, athlete in enumerate(self.athletes):
+            plan = WorkoutPlan.objects.create(user=athlete, title='Plan')
+            for _ in range(n):
+                WorkoutLog.objects.create(user=athlete, workout_plan=plan, duration=30)
+
+    def stats(self, athletes):
+        response = self.client.get('/api/stats/athletes/', {'athletes': ','.join(str(athlete.pk) for athlete in athletes)})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['athletes']
+
+    def test_same_stats_as_each_athlete_gets(self):
+        stats = self.stats(self.athletes + [self.user])
+        self.assertEqual([item['user'] for item in stats], [athlete.pk for athlete in self.athletes + [self.user]])
+        for athlete, item in zip(self.athletes, stats):
+            own = APIClient()
+            own.force_authenticate(athlete)
+            self.assertEqual({**own.get('/api/stats/').data, 'user': athlete.pk}, item)
+        self.assertEqual(stats[-1]['total_workouts'], 0)
+
+    def test_constant_queries_whatever_the_roster_size(self):
+        for roster in (self.athletes[:1], self.athletes[:4], self.athletes):
+            get_cache().clear()
+            # the coaching check and the stats rows
+            with self.assertNumQueries(2):
+                self.stats(roster)
+
+    def test_cached_per_athlete(self):
+        self.stats(self.athletes)
+        with self.assertNumQueries(1):
+            self.stats(self.athletes)
+        WorkoutLog.objects.create(user=self.athletes[0], workout_plan=WorkoutPlan.objects.get(user=self.athletes[0]))
+        with CaptureQueriesContext(connection) as queries:
+            stats = self.stats(self.athletes)
+        self.assertEqual(stats[0]['total_workouts'], 1)
+        self.assertIn('IN (%d)' % self.athletes[0].pk, queries[-1]['sql'])
+
+    def test_only_coached_athletes(self):
+        stranger = User.objects.create_user(username='stranger', password='pass12345')
+        response = self.client.get('/api/stats/athletes/', {'athletes': f'{self.athletes[0].pk},{stranger.pk}'})
+        self.assertEqual(response.status_code, 403)
+        with override_settings(MAX_ATHLETES_PER_REQUEST=4):
+            response = self.client.get('/api/stats/athletes/', {'athletes': ','.join(str(a.pk) for a in self.athletes)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([item['user'] for item in self.stats([])], [self.user.pk])
+
+
+class TrainingLoadTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.plan = WorkoutPlan.objects.create(user=self.user, title='Plan')
+        self.today = timezone.localdate()
+
+    def log(self, days_ago, duration=60, intensity=5, user=None):
+        user = user or self.user
+        plan = self.plan if user == self.user else WorkoutPlan.objects.get_or_create(user=user, title='Plan')[0]
+        return WorkoutLog.objects.create(
+            user=user, workout_plan=plan, date=self.today - timedelta(days=days_ago), duration=duration, intensity=intensity,
+        )
+
+    def load(self, **params):
+        response = self.client.get('/api/training-load/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_writes_keep_the_daily_loads_in_step_with_the_logs(self):
+        first = self.log(40, duration=30)
+        second = self.log(3, duration=45, intensity=8)
+        self.log(3, duration=20)
+        self.client.patch(f'/api/workout-logs/{first.pk}/', {'date': str(self.today - timedelta(days=60))})
+        self.client.patch(f'/api/workout-logs/{second.pk}/', {'intensity': 9})
+        self.client.delete(f'/api/workout-logs/{first.pk}/')
+        self.client.post('/api/workout-logs/bulk/', [
+            {'workout_plan': self.plan.pk, 'duration': 50, 'intensity': 6, 'date': str(self.today - timedelta(days=n))}
+            for n in (0, 1, 100)
+        ], format='json')
+        self.assertEqual(find_stale_training_load(), [])
+
+        out = StringIO()
+        TrainingLoad.objects.filter(user=self.user).delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_training_load', '--check', stdout=out, stderr=StringIO())
+        call_command('rebuild_training_load', stdout=out)
+        self.assertIn('1 user', out.getvalue())
+        self.assertEqual(find_stale_training_load(), [])
+
+    @override_settings(WORKOUT_LOG_MAX_AGE_DAYS=30)
+    def test_log_dates_and_load_arrays_stay_in_the_window(self):
+        for date in ('0001-01-01', '9999-12-31', str(self.today - timedelta(days=31)), str(self.today + timedelta(days=2))):
+            response = self.client.post('/api/workout-logs/', {'workout_plan': self.plan.pk, 'date': date})
+            self.assertEqual(response.status_code, 400, date)
+            response = self.client.post('/api/workout-logs/bulk/', [{'workout_plan': self.plan.pk, 'date': date}], format='json')
+            self.assertEqual(response.data['results'][0]['status'], 'error', date)
+        self.assertFalse(WorkoutLog.objects.exists())
+
+        # a log that aged out of the window is dropped from the array by the next write
+        self.log(29)
+        with mock.patch('api.load.timezone.localdate', return_value=self.today + timedelta(days=10)):
+            self.log(-10)
+            row = TrainingLoad.objects.get(user=self.user)
+            self.assertEqual((row.start, len(row.loads)), (self.today - timedelta(days=20), 31 * 8))
+            self.assertEqual(find_stale_training_load(), [])
+
+    def test_rolling_averages(self):
+        # 300 a day for the last four weeks, 600 a day in the last week
+        for days_ago in range(28):
+            self.log(days_ago, duration=60 if days_ago < 7 else 30, intensity=10)
+        today = self.load()['athletes'][0]['series'][-1]
+        self.assertEqual((today['date'], today['load']), (self.today, 600))
+        self.assertEqual((today['acute'], today['chronic']), (600, 375))
+        self.assertEqual(today['ratio'], 1.6)
+
+        series = self.load(start=str(self.today - timedelta(days=40)))['athletes'][0]['series']
+        self.assertEqual(len(series), 41)
+        self.assertEqual((series[0]['chronic'], series[0]['ratio']), (0, None))
+
+    def test_series_windows_outside_the_history(self):
+        self.log(10, duration=70, intensity=2)
+        row = TrainingLoad.objects.get(user=self.user)
+        before = rolling_series(row, self.today - timedelta(days=200), self.today - timedelta(days=100))
+        self.assertTrue(all(day['load'] == day['acute'] == 0 for day in before))
+        after = rolling_series(row, self.today + timedelta(days=30), self.today + timedelta(days=31))
+        self.assertEqual([day['chronic'] for day in after], [0, 0])
+        self.assertEqual(rolling_series(row, self.today - timedelta(days=4), self.today - timedelta(days=4))[0]['acute'], 20)
+
+    def test_coaches_read_their_athletes_in_constant_queries(self):
+        athletes = [User.objects.create_user(username=f'athlete-{n}', password='pass12345') for n in range(6)]
+        Coaching.objects.bulk_create([Coaching(coach=self.user, athlete=athlete) for athlete in athletes])
+        for n, athlete in enumerate(athletes):
+            self.log(n, user=athlete)
+
+        for roster in (athletes[:1], athletes):
+            ids = ','.join(str(athlete.pk) for athlete in roster)
+            get_cache().clear()
+            # the coaching check and the load rows
+            with self.assertNumQueries(2):
+                data = self.load(athletes=ids)
+            self.assertEqual([item['user'] for item in data['athletes']], [athlete.pk for athlete in roster])
+        self.assertEqual([item['series'][-1 - n]['load'] for n, item in enumerate(data['athletes'])], [300] * 6)
+
+        with self.assertNumQueries(1):
+            self.load(athletes=ids)
+        # a write recomputes only the writer's series
+        self.log(0, duration=10, user=athletes[0])
+        with CaptureQueriesContext(connection) as queries:
+            data = self.load(athletes=ids)
+        self.assertEqual(data['athletes'][0]['series'][-1]['load'], 350)
+        self.assertIn('IN (%d)' % athletes[0].pk, queries[-1]['sql'])
+
+    def test_only_coached_athletes_can_be_read(self):
+        stranger = User.objects.create_user(username='stranger', password='pass12345')
+        response = self.client.get('/api/training-load/', {'athletes': f'{self.user.pk},{stranger.pk}'})
+        self.assertEqual(response.status_code, 403)
+        self.assertIn(str(stranger.pk), response.data['detail'])
+        Coaching.objects.create(coach=stranger, athlete=self.user)
+        self.assertEqual(self.client.get('/api/training-load/', {'athletes': stranger.pk}).status_code, 403)
+        self.assertEqual(self.client.get('/api/training-load/', {'athletes': 'one,two'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/training-load/', {'start': '2020-01-01'}).status_code, 400)
+
+
+class UserDeletionTests(QueryCountTestCase):
+
+    def test_deleting_a_user_with_plans_logs_and_sets(self):
+        self.seed(2)
+        log = WorkoutLog.objects.first()
+        WorkoutSet.objects.create(log=log, user=self.user, exercise=Exercise.objects.first(), reps=5, weight=60)
+        Tombstone.record(self.user.pk, Tombstone.LOG, [999])
+        other = User.objects.create_user(username='other', password='pass12345')
+        other_plan = WorkoutPlan.objects.create(user=other, title='Other')
+
+        self.user.delete()
+        self.assertFalse(Tombstone.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(WorkoutLog.objects.filter(user_id=self.user.pk).exists())
+        # other users' deletions are still recorded
+        other_plan.delete()
+        self.assertEqual(list(Tombstone.objects.values_list('user', 'kind')), [(other.pk, Tombstone.PLAN)])
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generate_data_is_deterministic_and_consistent(self):
+        out = StringIO()
+        call_command('generate_data', '--users', '4', '--days', '60', '--seed', '7', '--prefix', 'first', stdout=out)
+        self.assertIn('4 users', out.getvalue())
+        call_command('generate_data', '--users', '4', '--days', '60', '--seed', '7', '--prefix', 'second', stdout=StringIO())
+
+        def history(prefix):
+            logs = WorkoutLog.objects.filter(user__username__startswith=prefix).order_by('id')
+            return [(row['date'], row['duration'], row['sets']) for row in logs.values('date', 'duration').annotate(sets=Count('sets'))]
+
+        self.assertTrue(history('first-'))
+        self.assertEqual(history('first-'), history('second-'))
+        self.assertEqual(find_stale_stats(), [])
+        self.assertEqual(find_stale_records(), [])
+
+        with self.assertRaises(CommandError):
+            call_command('generate_data', '--users', '1', '--prefix', 'first', stdout=StringIO())
+
+    def test_compare_results(self):
+        baseline = {'routes': {'GET stats': {'p50_ms': 10.0, 'p95_ms': 12.0, 'queries': 2}}, 'ingest': {'writes_per_s': 100.0}}
+        current = {'routes': {'GET stats': {'p50_ms': 11.0, 'p95_ms': 40.0, 'queries': 3}}, 'ingest': {'writes_per_s': 150.0}}
+        self.assertEqual(compare_results(baseline, current, tolerance=0.2), [
+            ('ingest.writes_per_s', 100.0, 150.0, False),
+            ('routes.GET stats.queries', 2, 3, True),
+        ])
+        current['routes']['GET stats']['p50_ms'] = 13.0
+        self.assertIn(('routes.GET stats.p50_ms', 10.0, 13.0, True), compare_results(baseline, current))
+
+
+class RouteBenchmarkTests(TransactionTestCase):
+    """The async views read through worker-thread connections, so the benchmark data must be committed"""
+
+    def test_every_route_is_benchmarked(self):
+        results = routes(size=200, repeat=1, warmup=0)
+        self.assertEqual(results['uncovered'], [])
+        self.assertEqual(results['unmounted'], [])
+        self.assertEqual(len(results['routes']), sum(len(requests) for requests in ROUTE_REQUESTS.values()))
+
+
+@override_settings(JOB_RETRY_DELAY=10)
+class JobQueueTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        self.enterContext(self.settings(JOB_EXPORT_DIR=export_dir.name))
+        self.worker = Worker(name='test')
+
+    def test_identical_pending_jobs_are_deduplicated(self):
+        first, created = enqueue('ping', user=self.user, n=1)
+        self.assertTrue(created)
+        self.assertEqual(enqueue('ping', user=self.user, n=1), (first, False))
+        self.assertTrue(enqueue('ping', user=self.user, n=2)[1])
+        # a higher priority is carried over to the pending job
+        self.assertEqual(enqueue('ping', user=self.user, priority=5, n=1)[0].priority, 5)
+        self.assertEqual(Job.objects.count(), 2)
+
+        # once the job runs, the same work can be queued again
+        run_job(claim('test'))
+        self.assertTrue(enqueue('ping', user=self.user, n=1)[1])
+
+    def test_higher_priority_runs_first(self):
+        low = enqueue('ping', n='low', priority=0)[0]
+        high = enqueue('ping', n='high', priority=10)[0]
+        later = enqueue('ping', n='later', priority=20)[0]
+        Job.objects.filter(pk=later.pk).update(run_after=timezone.now() + timedelta(hours=1))
+        self.assertEqual([claim('test').pk, claim('test').pk, claim('test')], [high.pk, low.pk, None])
+
+    def test_failing_jobs_are_retried_with_backoff(self):
+        calls = []
+
+        def flaky(user_id):
+            calls.append(user_id)
+            if len(calls) < 3:
+                raise RuntimeError('database went away')
+            return 'ok'
+
+        with mock.patch.dict(TASKS, flaky=Task(flaky, 0, 3)), self.assertLogs('api.jobs', 'ERROR'):
+            job = enqueue('flaky', user=self.user)[0]
+            run_job(claim('test'))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+            self.assertIn('database went away', job.error)
+            self.assertIsNone(claim('test'))
+
+            run_job(claim('test', now=timezone.now() + timedelta(seconds=11)))
+            job.refresh_from_db()
+            # the second retry waits twice as long
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=19))
+            run_job(claim('test', now=timezone.now() + timedelta(seconds=21)))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.result), (Job.DONE, 3, 'ok'))
+
+            job = enqueue('flaky', user=self.user)[0]
+            Job.objects.filter(pk=job.pk).update(max_attempts=1)
+            calls.clear()
+            run_job(claim('test'))
+            job.refresh_from_db()
+            self.assertEqual(job.status, Job.FAILED)
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = enqueue('ping', n=1)[0]
+        claim('test')
+        Job.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale(), (1, 0))
+        self.assertEqual(claim('test').pk, job.pk)
+
+    def test_a_job_is_claimed_by_one_worker(self):
+        first, second = enqueue('ping', n=1)[0], enqueue('ping', n=2)[0]
+        self.assertEqual(claim('fast').pk, first.pk)
+        # a worker that saw both jobs pending before the other one claimed the first
+        with mock.patch('django.db.models.QuerySet.values_list', return_value=[first.pk, second.pk]):
+            self.assertEqual(claim('slow').pk, second.pk)
+        with mock.patch('django.db.models.QuerySet.values_list', return_value=[first.pk, second.pk]):
+            self.assertIsNone(claim('slowest'))
+
+    def test_queries_per_job_are_constant(self):
+        counts = []
+        for size in (10, 40):
+            for i in range(size):
+                enqueue('ping', n=f'{size}-{i}')
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(Worker().run(burst=True), size)
+            counts.append(len(queries))
+        # select the due jobs, claim one, load it, save the result
+        self.assertEqual(counts[1] - counts[0], 4 * 30)
+
+    def test_recompute_stats_job(self):
+        self.seed(2)
+        WorkoutStats.objects.filter(user=self.user).update(total_workouts=99)
+        response = self.client.post('/api/jobs/', {'task': 'recompute_stats'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(self.worker.run(burst=True), 1)
+
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.data['status'], 'done')
+        self.assertEqual(self.client.get('/api/stats/').data['total_workouts'], 4)
+        self.assertEqual(find_stale_stats(), [])
+
+    def test_export_job_and_download(self):
+        self.seed(1, logs_per_plan=3)
+        job_id = self.client.post('/api/jobs/', {'task': 'export_logs', 'format': 'ndjson'}, format='json').data['id']
+        response = self.client.get(f'/api/jobs/{job_id}/download/')
+        self.assertEqual(response.status_code, 409)
+
+        self.worker.run(burst=True)
+        self.assertEqual(self.client.get(f'/api/jobs/{job_id}/').data['result']['rows'], 3)
+        response = self.client.get(f'/api/jobs/{job_id}/download/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='pass12345'))
+        self.assertEqual(other.get(f'/api/jobs/{job_id}/download/').status_code, 404)
+        self.assertEqual(self.client.post('/api/jobs/', {'task': 'ping'}, format='json').status_code, 400)
@@ -1,12 +1,38 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WorkoutPlanViewSet, ExerciseViewSet, WorkoutLogViewSet
+from . import async_views
+from .views import (
+    WorkoutPlanViewSet,
+    ExerciseViewSet,
+    JobViewSet,
+    PersonalRecordViewSet,
+    WorkoutLogViewSet,
+    athlete_stats,
+    metrics,
+    response_cache_stats,
+    training_load,
+    workout_analytics,
+    workout_stats,
+    workout_sync,
+)
 
 router = DefaultRouter()
 router.register(r'workout-plans', WorkoutPlanViewSet, basename='workoutplan')
 router.register(r'exercises', ExerciseViewSet, basename='exercise')
 router.register(r'workout-logs', WorkoutLogViewSet, basename='workoutlog')
+router.register(r'records', PersonalRecordViewSet, basename='personalrecord')
+router.register(r'jobs', JobViewSet, basename='job')
 
 urlpatterns = [
+    path('stats/', workout_stats, name='workout-stats'),
+    path('stats/athletes/', athlete_stats, name='athlete-stats'),
+    path('analytics/', workout_analytics, name='workout-analytics'),
+    path('sync/', workout_sync, name='workout-sync'),
+    path('training-load/', training_load, name='training-load'),
+    path('cache/stats/', response_cache_stats, name='response-cache-stats'),
+    path('metrics/', metrics, name='metrics'),
+    path('async/stats/', async_views.workout_stats, name='async-workout-stats'),
+    path('async/workout-plans/', async_views.workout_plans, name='async-workout-plans'),
+    path('async/workout-logs/', async_views.workout_logs, name='async-workout-logs'),
     path('', include(router.urls)),
 ]
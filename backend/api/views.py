@@ -1,24 +1,212 @@
-from rest_framework import viewsets, permissions
-from .models import WorkoutPlan, Exercise, WorkoutLog
-from .serializers import WorkoutPlanSerializer, ExerciseSerializer, WorkoutLogSerializer
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import mixins, viewsets, permissions, status
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes, renderer_classes
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from accounts.throttling import BUCKET_THROTTLES
+from .analytics import workout_series
+from .bulk import WorkoutLogIngest
+from .export import export_rows, stream_csv, stream_ndjson
+from .jobs import enqueue, export_path
+from .load import training_load_series
+from .metrics import HasMetricsToken, registry
+from .cache import ResponseCacheMixin, cache_per_user, cache_stats
+from .mixins import OwnerQuerysetMixin, SerializerQuerysetMixin, UUIDLookupMixin
+from .pagination import WorkoutLogPagination, WorkoutPlanPagination
+from .permissions import IsStaffOrReadOnly
+from .parsers import NDJSONParser
+from .renderers import CSVRenderer, NDJSONRenderer, PrometheusRenderer
+from .representation import ValuesListMixin
+from .search import search_exercises
+from .stats import batch_stats
+from .sync import changes_since
+from .models import Coaching, WorkoutPlan, Exercise, Job, PersonalRecord, WorkoutLog, WorkoutStats
+from .serializers import (
+    AnalyticsQuerySerializer,
+    AthleteStatsQuerySerializer,
+    ExerciseSearchQuerySerializer,
+    ExerciseSerializer,
+    JobRequestSerializer,
+    JobSerializer,
+    PersonalRecordSerializer,
+    SyncQuerySerializer,
+    TrainingLoadQuerySerializer,
+    WorkoutLogSerializer,
+    WorkoutPlanSerializer,
+)
 
-class WorkoutPlanViewSet(viewsets.ModelViewSet):
+class WorkoutPlanViewSet(ResponseCacheMixin, ValuesListMixin, UUIDLookupMixin, SerializerQuerysetMixin, OwnerQuerysetMixin, viewsets.ModelViewSet):
     queryset = WorkoutPlan.objects.all()
     serializer_class = WorkoutPlanSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = WorkoutPlanPagination
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-
-class ExerciseViewSet(viewsets.ModelViewSet):
+class ExerciseViewSet(ValuesListMixin, SerializerQuerysetMixin, viewsets.ModelViewSet):
+    # the exercise catalog is shared between users, so it is not owner-scoped and only staff edit it
     queryset = Exercise.objects.all()
     serializer_class = ExerciseSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    permission_classes = [IsStaffOrReadOnly]
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Ranked name search over the catalog, tolerant of typos, for autocompletion"""
+        query = ExerciseSearchQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        exercises = search_exercises(query.validated_data['q'], limit=query.validated_data['limit'])
+        return Response(self.get_serializer(exercises, many=True).data)
 
-class WorkoutLogViewSet(viewsets.ModelViewSet):
+class WorkoutLogViewSet(ResponseCacheMixin, ValuesListMixin, UUIDLookupMixin, SerializerQuerysetMixin, OwnerQuerysetMixin, viewsets.ModelViewSet):
     queryset = WorkoutLog.objects.all()
     serializer_class = WorkoutLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = WorkoutLogPagination
+    bulk_chunk_size = 500
+    bulk_max_items = 10000
+    # only the bulk action has throttle classes
+    throttle_scope = 'bulk'
+    export_chunk_size = 2000
+
+    @action(
+        detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser],
+        throttle_classes=BUCKET_THROTTLES,
+    )
+    def bulk(self, request):
+        """Create many logs from a JSON array or an NDJSON stream, reporting a result per item"""
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get('logs')
+        if isinstance(items, (str, bytes)) or not hasattr(items, '__iter__'):
+            return Response(
+                {'detail': 'Expected a list of workout logs.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        ingest = WorkoutLogIngest(request.user, chunk_size=self.bulk_chunk_size, max_items=self.bulk_max_items)
+        return Response(ingest.run(items))
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """Stream the user's whole history as CSV (default) or NDJSON, in constant memory"""
+        renderer = request.accepted_renderer
+        stream = stream_csv if renderer.format == 'csv' else stream_ndjson
+        response = StreamingHttpResponse(
+            stream(export_rows(request.user, chunk_size=self.export_chunk_size)),
+            content_type=f'{renderer.media_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="workout-logs.{renderer.format}"'
+        return response
+
+class PersonalRecordViewSet(ResponseCacheMixin, ValuesListMixin, SerializerQuerysetMixin, OwnerQuerysetMixin, viewsets.ReadOnlyModelViewSet):
+    """The user's best max weight, estimated 1RM and single-workout volume per exercise, maintained by api.records"""
+    queryset = PersonalRecord.objects.order_by('exercise__name', 'id')
+    serializer_class = PersonalRecordSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+class JobViewSet(OwnerQuerysetMixin, mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """Queue a stats recomputation or a history export, then poll the job until it is done"""
+    queryset = Job.objects.order_by('-id')
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    export_renderers = {'csv': CSVRenderer, 'ndjson': NDJSONRenderer}
+
+    def create(self, request, *args, **kwargs):
+        query = JobRequestSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        args = dict(query.validated_data)
+        # an identical job that is still pending is returned instead of queueing another
+        job, _ = enqueue(args.pop('task'), user=request.user, **args)
+        headers = {'Location': reverse('job-detail', kwargs={'pk': job.pk}, request=request)}
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED, headers=headers)
+
+    @action(detail=True)
+    def download(self, request, pk=None):
+        """The file of a finished export job"""
+        job = self.get_object()
+        if job.task != 'export_logs' or job.status != Job.DONE:
+            return Response({'detail': 'This job has no file to download.'}, status=status.HTTP_409_CONFLICT)
+        file_format = job.result['format']
+        try:
+            handle = open(export_path(job.result['file']), 'rb')
+        except FileNotFoundError:
+            return Response({'detail': 'The export file has expired.'}, status=status.HTTP_410_GONE)
+        return FileResponse(
+            handle, as_attachment=True, filename=f'workout-logs.{file_format}',
+            content_type=f'{self.export_renderers[file_format].media_type}; charset=utf-8',
+        )
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@cache_per_user
+def workout_stats(request):
+    """Get workout statistics for the current user from the materialized stats row"""
+    stats = WorkoutStats.objects.filter(pk=request.user.pk).first() or WorkoutStats(user=request.user)
+    return Response(stats.as_dict(timezone.now().date()))
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@cache_per_user
+def workout_analytics(request):
+    """Workout counts, durations and per-exercise volume bucketed by day, week or month"""
+    query = AnalyticsQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    return Response(workout_series(request.user, **query.validated_data))
+
+def authorized_athletes(request, athletes):
+    """The requested athletes, or the user alone; PermissionDenied when they include anyone the user does not coach"""
+    athletes = athletes or [request.user.pk]
+    forbidden = Coaching.forbidden_athletes(request.user, athletes)
+    if forbidden:
+        raise PermissionDenied(f"You do not coach user(s) {', '.join(map(str, sorted(forbidden)))}.")
+    return athletes
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def athlete_stats(request):
+    """Workout statistics of many athletes the user coaches in one call, each as /api/stats/ would return it"""
+    query = AthleteStatsQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    athletes = authorized_athletes(request, query.validated_data['athletes'])
+    # cached per athlete, so a coach's request reuses stats cached for any other request
+    stats = batch_stats(athletes, timezone.now().date())
+    return Response({'athletes': [{'user': athlete, **stats[athlete]} for athlete in athletes]})
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def training_load(request):
+    """Daily load with its 7-day (acute) and 28-day (chronic) averages and their ratio, for the user or athletes they coach"""
+    query = TrainingLoadQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    athletes = authorized_athletes(request, query.validated_data['athletes'])
+    start, end = query.validated_data['start'], query.validated_data['end']
+    series = training_load_series(athletes, start, end)
+    return Response({
+        'start': start,
+        'end': end,
+        'athletes': [{'user': athlete, 'series': series[athlete]} for athlete in athletes],
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@cache_per_user
+def workout_sync(request):
+    """Plans, plan exercises and logs changed or deleted since the client's watermark"""
+    query = SyncQuerySerializer(data=request.query_params)
+    query.is_valid(raise_exception=True)
+    return Response(changes_since(request.user, **query.validated_data))
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def response_cache_stats(request):
+    """Hit/miss counters of the per-user response cache in this process"""
+    return Response(cache_stats())
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([HasMetricsToken])
+@renderer_classes([PrometheusRenderer])
+def metrics(request):
+    """Request metrics of this process in the Prometheus text format"""
+    return Response(registry.render())
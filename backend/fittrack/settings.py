@@ -24,11 +24,11 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'corsheaders',
     'accounts',
-    'workouts',
     'api',
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -60,13 +60,62 @@ TEMPLATES = [
 WSGI_APPLICATION = 'fittrack.wsgi.application'
 
 # Database
+# Configured from the environment; defaults to the local SQLite file through
+# the tuned backend in fittrack/sqlite3. For PostgreSQL set e.g.
+# DB_ENGINE=django.db.backends.postgresql, DB_NAME, DB_USER, DB_PASSWORD,
+# DB_HOST and DB_PORT.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': os.environ.get('DB_ENGINE', 'fittrack.sqlite3'),
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'USER': os.environ.get('DB_USER', ''),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', ''),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # keep connections open between requests, and check them before reuse
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Applied to every new connection by the fittrack.sqlite3 backend. WAL lets
+# readers run alongside a writer, busy_timeout makes contended writers wait
+# instead of failing with "database is locked", and synchronous=NORMAL is
+# safe under WAL.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'temp_store': 'memory',
+    'cache_size': -20000,
+    'mmap_size': 134217728,
+}
+
+# Start atomic blocks with BEGIN IMMEDIATE so concurrent writers queue on
+# busy_timeout rather than failing on a read-to-write lock upgrade.
+SQLITE_IMMEDIATE_TRANSACTIONS = True
+
+# Caches
+# The 'responses' cache holds per-user API responses (see api.cache). The
+# default local-memory backend is a size-bounded LRU per process; point
+# RESPONSE_CACHE_BACKEND at FileBasedCache or DatabaseCache to share it
+# between workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': os.environ.get('RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'fittrack-responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -98,13 +147,24 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # proxies in front of the app whose X-Forwarded-For entries are trusted; with 0 the
+    # throttles key on REMOTE_ADDR, since a client can put anything in that header
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # token buckets of accounts.throttling, per <scope>_ip and <scope>_user; empty turns one off
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('THROTTLE_LOGIN_IP_RATE', '20/min'),
+        'login_user': os.environ.get('THROTTLE_LOGIN_USER_RATE', '10/min'),
+        'register_ip': os.environ.get('THROTTLE_REGISTER_IP_RATE', '10/hour'),
+        'bulk_ip': os.environ.get('THROTTLE_BULK_IP_RATE', '120/min'),
+        'bulk_user': os.environ.get('THROTTLE_BULK_USER_RATE', '60/min'),
+    },
 }
 
 # JWT settings
@@ -125,6 +185,64 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# In-process cache of authenticated users, so a request with a valid token
+# does not have to load its user row. Saves in this process invalidate an
+# entry at once; other processes and QuerySet.update() calls are picked up
+# within the TTL (seconds).
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 10000))
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 60))
+
+# Revoked refresh tokens (accounts.revocation): an in-process Bloom filter,
+# sized for REVOKED_TOKEN_FILTER_CAPACITY tokens and rebuilt larger when full,
+# answers most checks without a query, and picks up the tokens revoked by
+# other processes every REVOKED_TOKEN_SYNC_SECONDS. Run purge_revoked_tokens
+# periodically to drop the rows of expired tokens.
+REVOKED_TOKEN_FILTER_CAPACITY = int(os.environ.get('REVOKED_TOKEN_FILTER_CAPACITY', 1000000))
+REVOKED_TOKEN_SYNC_SECONDS = float(os.environ.get('REVOKED_TOKEN_SYNC_SECONDS', 5))
+
+# Throttle buckets (accounts.throttling) are kept per process, or in the
+# CACHES entry named by THROTTLE_CACHE_ALIAS so all processes share them.
+# In-process buckets beyond THROTTLE_LOCAL_MAX_KEYS drop the least recent.
+THROTTLE_CACHE_ALIAS = os.environ.get('THROTTLE_CACHE_ALIAS', '')
+THROTTLE_LOCAL_MAX_KEYS = int(os.environ.get('THROTTLE_LOCAL_MAX_KEYS', 100000))
+
+# Request metrics (api.metrics): latency, query and serializer timings per view,
+# a Server-Timing header, and /api/metrics/ for Prometheus, which must send
+# "Authorization: Bearer $METRICS_TOKEN" (the endpoint is closed without one).
+# Requests running more than METRICS_QUERY_LOG_THRESHOLD queries have their
+# SQL logged to the api.metrics logger; 0 turns that off.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_QUERY_LOG_THRESHOLD = int(os.environ.get('METRICS_QUERY_LOG_THRESHOLD', 50))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Delta sync (api.sync): watermarks stay this many seconds behind the clock,
+# so rows from transactions still committing are not skipped, and deletion
+# tombstones are kept this many days (prune_sync_tombstones removes older
+# ones; clients with an older watermark get a full snapshot).
+SYNC_SETTLE_SECONDS = int(os.environ.get('SYNC_SETTLE_SECONDS', 5))
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Coach endpoints (batch stats, training load) take up to
+# MAX_ATHLETES_PER_REQUEST athletes per request; a training load series
+# spans at most TRAINING_LOAD_MAX_DAYS.
+MAX_ATHLETES_PER_REQUEST = int(os.environ.get('MAX_ATHLETES_PER_REQUEST', 500))
+TRAINING_LOAD_MAX_DAYS = int(os.environ.get('TRAINING_LOAD_MAX_DAYS', 366))
+
+# Logs may be dated at most WORKOUT_LOG_MAX_AGE_DAYS back and one day ahead
+# (for clients in time zones ahead of the server). The daily training load
+# arrays keep the same window, so their size stays bounded.
+WORKOUT_LOG_MAX_AGE_DAYS = int(os.environ.get('WORKOUT_LOG_MAX_AGE_DAYS', 3650))
+
+# Background jobs (api.jobs), run by "manage.py run_jobs". A failed job is
+# retried after JOB_RETRY_DELAY seconds, doubling with every attempt; a job
+# still running after JOB_TIMEOUT seconds is assumed lost and requeued.
+# Export files are written to JOB_EXPORT_DIR. Finished jobs, and their
+# files, are deleted after JOB_RETENTION_DAYS.
+JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 10))
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 600))
+JOB_EXPORT_DIR = os.environ.get('JOB_EXPORT_DIR', str(BASE_DIR / 'exports'))
+JOB_RETENTION_DAYS = int(os.environ.get('JOB_RETENTION_DAYS', 7))
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
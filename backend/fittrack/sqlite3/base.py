@@ -0,0 +1,26 @@
+"""
+SQLite backend tuned for several concurrent gunicorn workers.
+
+Every new connection gets settings.SQLITE_PRAGMAS applied, and, with
+settings.SQLITE_IMMEDIATE_TRANSACTIONS, atomic blocks start with BEGIN
+IMMEDIATE. A deferred transaction that reads before it writes cannot be
+upgraded to a write lock while another writer is active, so SQLite fails
+it at once with "database is locked" instead of waiting on busy_timeout.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if getattr(settings, 'SQLITE_IMMEDIATE_TRANSACTIONS', False):
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -6,5 +6,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),   # Authentication
     path('api/', include('api.urls')),             # Workout-related API
-    path('', lambda request: JsonResponse({"message": "Welcome to the FitTrack API!"})),
+    path('', lambda request: JsonResponse({"message": "Welcome to the FitTrack API!"}), name='index'),
 ]
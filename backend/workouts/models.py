@@ -1 +0,0 @@
-# models
@@ -0,0 +1,93 @@
+import axios from 'axios';
+
+const SYNC_URL = 'http://localhost:8000/api/sync/';
+
+export interface SyncedPlan {
+  id: number;
+  title: string;
+  description: string;
+  updated_at: string;
+}
+
+export interface SyncedPlanExercise {
+  id: number;
+  workout_plan: number;
+  exercise: { id: number; name: string; description: string };
+  sets: number;
+  reps: number;
+  updated_at: string;
+}
+
+export interface SyncedLog {
+  id: number;
+  workout_plan: number;
+  date: string;
+  duration: number;
+  notes: string;
+  sets: { id: number; exercise: number; reps: number; weight: number }[];
+  updated_at: string;
+}
+
+export interface WorkoutCache {
+  watermark: string | null;
+  plans: Record<number, SyncedPlan>;
+  planExercises: Record<number, SyncedPlanExercise>;
+  logs: Record<number, SyncedLog>;
+}
+
+const emptyCache = (): WorkoutCache => ({ watermark: null, plans: {}, planExercises: {}, logs: {} });
+
+const storageKey = (username: string) => `fittrack_sync_${username}`;
+
+const loadCache = (username: string): WorkoutCache => {
+  try {
+    const stored = localStorage.getItem(storageKey(username));
+    return stored ? JSON.parse(stored) : emptyCache();
+  } catch {
+    return emptyCache();
+  }
+};
+
+const apply = <T extends { id: number }>(rows: Record<number, T>, changed: T[], deleted: number[]) => {
+  changed.forEach((row) => {
+    rows[row.id] = row;
+  });
+  deleted.forEach((id) => {
+    delete rows[id];
+  });
+};
+
+// Brings the locally stored copy of the user's plans and logs up to date with
+// /api/sync/, which only returns what changed since the stored watermark.
+export const syncWorkouts = async (user: { username: string; access: string }): Promise<WorkoutCache> => {
+  let cache = loadCache(user.username);
+  let since = cache.watermark;
+  for (;;) {
+    const { data } = await axios.get(SYNC_URL, {
+      params: since ? { since } : {},
+      headers: { Authorization: `Bearer ${user.access}` }
+    });
+    if (data.reset) {
+      cache = emptyCache();
+    }
+    apply(cache.plans, data.plans, data.deleted.plans);
+    apply(cache.planExercises, data.plan_exercises, data.deleted.plan_exercises);
+    apply(cache.logs, data.logs, data.deleted.logs);
+    since = data.watermark;
+    if (!data.has_more) {
+      break;
+    }
+  }
+  cache.watermark = since;
+  try {
+    localStorage.setItem(storageKey(user.username), JSON.stringify(cache));
+  } catch {
+    // storage full or unavailable: the next sync starts from a snapshot again
+  }
+  return cache;
+};
+
+export const planExercises = (cache: WorkoutCache, planId: number): SyncedPlanExercise[] =>
+  Object.values(cache.planExercises)
+    .filter((row) => row.workout_plan === planId)
+    .sort((a, b) => a.id - b.id);
@@ -17,7 +17,7 @@ import {
   Legend,
 } from 'chart.js';
 import axios from 'axios';
-import { format, startOfWeek, endOfWeek } from 'date-fns';
+import { format, startOfWeek, endOfWeek, subDays } from 'date-fns';
 
 ChartJS.register(
   CategoryScale,
@@ -46,6 +46,16 @@ interface WorkoutLog {
   exercises: any[];
 }
 
+interface AnalyticsBucket {
+  bucket: string;
+  workouts: number;
+  duration: number;
+}
+
+// The last seven days, oldest first, as the yyyy-MM-dd keys the analytics endpoint uses
+const lastSevenDays = () =>
+  Array.from({ length: 7 }, (_, i) => format(subDays(new Date(), 6 - i), 'yyyy-MM-dd'));
+
 const Dashboard: React.FC = () => {
   const { user } = useAuth();
   const [workoutPlans, setWorkoutPlans] = useState<WorkoutPlan[]>([]);
@@ -56,6 +66,7 @@ const Dashboard: React.FC = () => {
     weeklyWorkouts: 0,
     averageDuration: 0
   });
+  const [dailyWorkouts, setDailyWorkouts] = useState<number[]>(Array(7).fill(0));
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -66,15 +77,25 @@ const Dashboard: React.FC = () => {
     try {
       const token = user?.access;
 
-      const [plansRes, logsRes] = await Promise.all([
+      const days = lastSevenDays();
+      const [plansRes, logsRes, analyticsRes] = await Promise.all([
         axios.get('http://localhost:8000/api/workout-plans/', {
           headers: { Authorization: `Bearer ${token}` }
         }),
         axios.get('http://localhost:8000/api/workout-logs/', {
           headers: { Authorization: `Bearer ${token}` }
+        }),
+        axios.get('http://localhost:8000/api/analytics/', {
+          headers: { Authorization: `Bearer ${token}` },
+          params: { period: 'day', start: days[0], end: days[6] }
         })
       ]);
 
+      const workoutsByDay = new Map<string, number>(
+        analyticsRes.data.series.map((row: AnalyticsBucket) => [row.bucket, row.workouts])
+      );
+      setDailyWorkouts(days.map(day => workoutsByDay.get(day) ?? 0));
+
       const plans = Array.isArray(plansRes.data) ? plansRes.data : plansRes.data.results;
       const logs = Array.isArray(logsRes.data) ? logsRes.data : logsRes.data.results;
 
@@ -107,10 +128,10 @@ const Dashboard: React.FC = () => {
   };
 
   const workoutFrequencyData = {
-    labels: ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'],
+    labels: lastSevenDays().map(day => format(new Date(`${day}T00:00:00`), 'EEE')),
     datasets: [{
       label: 'Workouts',
-      data: [2, 1, 3, 2, 1, 2, 1],
+      data: dailyWorkouts,
       borderColor: 'rgb(99, 102, 241)',
       backgroundColor: 'rgba(99, 102, 241, 0.1)',
       tension: 0.4
@@ -31,6 +31,8 @@ const WorkoutForm: React.FC = () => {
     description: '',
     exercises: []
   });
+  const [exerciseQuery, setExerciseQuery] = useState('');
+  const [suggestions, setSuggestions] = useState<string[]>([]);
 
   useEffect(() => {
     if (id) {
@@ -38,6 +40,35 @@ const WorkoutForm: React.FC = () => {
     }
   }, [id]);
 
+  useEffect(() => {
+    const query = exerciseQuery.trim();
+    if (!query) {
+      setSuggestions([]);
+      return;
+    }
+    // wait for a pause in typing, and drop answers to queries that have since changed
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const response = await axios.get('http://localhost:8000/api/exercises/search/', {
+          params: { q: query },
+          headers: { Authorization: `Bearer ${user?.access}` }
+        });
+        if (!cancelled) {
+          setSuggestions(response.data.map((exercise: { name: string }) => exercise.name));
+        }
+      } catch (error) {
+        if (!cancelled) {
+          setSuggestions([]);
+        }
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [exerciseQuery]);
+
   const fetchWorkoutPlan = async () => {
     try {
       const response = await axios.get(`http://localhost:8000/api/workout-plans/${id}/`, {
@@ -177,7 +208,12 @@ const WorkoutForm: React.FC = () => {
                           type="text"
                           className="form-control"
                           value={exercise.name}
-                          onChange={(e) => updateExercise(index, 'name', e.target.value)}
+                          onChange={(e) => {
+                            updateExercise(index, 'name', e.target.value);
+                            setExerciseQuery(e.target.value);
+                          }}
+                          list="exercise-suggestions"
+                          autoComplete="off"
                           required
                           placeholder="e.g., Push-ups"
                         />
@@ -261,6 +297,11 @@ const WorkoutForm: React.FC = () => {
                     {id ? 'Update Plan' : 'Create Plan'}
                   </button>
                 </div>
+                <datalist id="exercise-suggestions">
+                  {suggestions.map((name) => (
+                    <option key={name} value={name} />
+                  ))}
+                </datalist>
               </form>
             </div>
           </div>
@@ -28,10 +28,21 @@ interface WorkoutLog {
   created_at: string;
 }
 
+interface WorkoutLogPage {
+  next: string | null;
+  newer: string | null;
+  results: WorkoutLog[];
+}
+
+const WORKOUT_LOGS_URL = 'http://localhost:8000/api/workout-logs/';
+
 const WorkoutHistory: React.FC = () => {
   const [workoutLogs, setWorkoutLogs] = useState<WorkoutLog[]>([]);
   const [filteredLogs, setFilteredLogs] = useState<WorkoutLog[]>([]);
   const [loading, setLoading] = useState(true);
+  const [nextUrl, setNextUrl] = useState<string | null>(null);
+  const [newerCursor, setNewerCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
   const [dateFilter, setDateFilter] = useState('');
   const { showToast } = useToast();
@@ -41,18 +52,30 @@ const WorkoutHistory: React.FC = () => {
     fetchWorkoutLogs();
   }, []);
 
+  useEffect(() => {
+    window.addEventListener('focus', refreshWorkoutLogs);
+    return () => window.removeEventListener('focus', refreshWorkoutLogs);
+  }, [newerCursor]);
+
   useEffect(() => {
     filterLogs();
   }, [workoutLogs, searchTerm, dateFilter]);
 
+  const fetchPage = async (url: string): Promise<WorkoutLogPage> => {
+    const response = await axios.get<WorkoutLogPage>(url, {
+      headers: {
+        Authorization: `Bearer ${user?.access}`,
+      },
+    });
+    return response.data;
+  };
+
   const fetchWorkoutLogs = async () => {
     try {
-      const response = await axios.get('http://localhost:8000/api/workout-logs/', {
-        headers: {
-          Authorization: `Bearer ${user?.access}`,
-        },
-      });
-      setWorkoutLogs(response.data);
+      const page = await fetchPage(WORKOUT_LOGS_URL);
+      setWorkoutLogs(page.results);
+      setNextUrl(page.next);
+      setNewerCursor(page.newer);
     } catch (error) {
       showToast('Error fetching workout history', 'error');
     } finally {
@@ -60,6 +83,43 @@ const WorkoutHistory: React.FC = () => {
     }
   };
 
+  // Older pages are fetched with the keyset cursor the API hands back
+  const loadMoreWorkoutLogs = async () => {
+    if (!nextUrl) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchPage(nextUrl);
+      setWorkoutLogs(logs => [...logs, ...page.results]);
+      setNextUrl(page.next);
+    } catch (error) {
+      showToast('Error fetching workout history', 'error');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // Only logs added since the newest one we hold are fetched; they arrive oldest first
+  const refreshWorkoutLogs = async () => {
+    if (!newerCursor) return;
+    try {
+      let url: string | null = `${WORKOUT_LOGS_URL}?newer_than=${encodeURIComponent(newerCursor)}`;
+      let cursor = newerCursor;
+      const added: WorkoutLog[] = [];
+      while (url) {
+        const page = await fetchPage(url);
+        added.push(...page.results);
+        cursor = page.newer ?? cursor;
+        url = page.next;
+      }
+      if (added.length > 0) {
+        setWorkoutLogs(logs => [...added.reverse(), ...logs]);
+      }
+      setNewerCursor(cursor);
+    } catch (error) {
+      showToast('Error refreshing workout history', 'error');
+    }
+  };
+
   const filterLogs = () => {
     let filtered = [...workoutLogs];
 
@@ -255,6 +315,18 @@ const WorkoutHistory: React.FC = () => {
           ))}
         </div>
       )}
+
+      {nextUrl && (
+        <div className="text-center mb-4">
+          <button
+            className="btn btn-outline-primary"
+            onClick={loadMoreWorkoutLogs}
+            disabled={loadingMore}
+          >
+            {loadingMore ? 'Loading...' : 'Load more'}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
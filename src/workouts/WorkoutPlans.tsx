@@ -4,6 +4,7 @@ import { Plus, Edit, Trash2, Calendar, Target } from 'lucide-react';
 import { useToast } from '../contexts/ToastContext';
 import { useAuth } from '../auth/AuthContext';
 import axios from 'axios';
+import { planExercises, syncWorkouts } from '../api/sync';
 
 interface Exercise {
   name: string;
@@ -14,11 +15,11 @@ interface Exercise {
 }
 
 interface WorkoutPlan {
-  id: string;
+  id: number;
   title: string;
   description: string;
   exercises: Exercise[];
-  created_at: string;
+  updated_at: string;
 }
 
 const WorkoutPlans: React.FC = () => {
@@ -31,14 +32,21 @@ const WorkoutPlans: React.FC = () => {
     fetchWorkoutPlans();
   }, []);
 
+  // Only the changes since the last visit are downloaded; the rest comes from the local copy
   const fetchWorkoutPlans = async () => {
     try {
-      const response = await axios.get('http://localhost:8000/api/workout-plans/', {
-        headers: {
-          Authorization: `Bearer ${user?.access}`,
-        },
-      });
-      setWorkoutPlans(response.data);
+      const cache = await syncWorkouts(user);
+      const plans = Object.values(cache.plans)
+        .sort((a, b) => b.id - a.id)
+        .map((plan) => ({
+          ...plan,
+          exercises: planExercises(cache, plan.id).map((row) => ({
+            name: row.exercise.name,
+            sets: row.sets,
+            reps: row.reps
+          }))
+        }));
+      setWorkoutPlans(plans);
     } catch (error) {
       showToast('Error fetching workout plans', 'error');
     } finally {
@@ -46,7 +54,7 @@ const WorkoutPlans: React.FC = () => {
     }
   };
 
-  const handleDelete = async (id: string) => {
+  const handleDelete = async (id: number) => {
     if (window.confirm('Are you sure you want to delete this workout plan?')) {
       try {
         await axios.delete(`http://localhost:8000/api/workout-plans/${id}/`, {
@@ -54,7 +62,7 @@ const WorkoutPlans: React.FC = () => {
             Authorization: `Bearer ${user?.access}`,
           },
         });
-        setWorkoutPlans(workoutPlans.filter(plan => plan.id !== id));
+        await fetchWorkoutPlans();
         showToast('Workout plan deleted successfully', 'success');
       } catch (error) {
         showToast('Error deleting workout plan', 'error');
@@ -149,7 +157,7 @@ const WorkoutPlans: React.FC = () => {
                     </div>
                     <div className="d-flex align-items-center text-muted">
                       <Calendar size={16} className="me-2" />
-                      <span>Created {new Date(plan.created_at).toLocaleDateString()}</span>
+                      <span>Updated {new Date(plan.updated_at).toLocaleDateString()}</span>
                     </div>
                   </div>
 